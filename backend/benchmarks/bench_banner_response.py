@@ -0,0 +1,123 @@
+# benchmarks/bench_banner_response.py
+"""
+/api/generate-banner 응답 경로 벤치마크 (기본 2048 px): base64 JSON vs 이미지 바이트 스트리밍(png/webp/jpeg).
+생성 단계(Gemini)는 미리 만든 PNG를 바로 돌려주도록 바꿔서 응답 변환/전송 비용만 잰다.
+- total_ms: httpx ASGITransport로 본문 전체를 받을 때까지 (중앙값, 네트워크 없음.
+  ASGITransport는 본문을 모아서 넘기므로 첫 바이트 시간은 따로 재지 않는다)
+- py_peak_mb: tracemalloc 피크 (base64 문자열, JSON 직렬화 등 Python 할당. PIL 인코더 내부 버퍼는 제외)
+- rss_extra_mb: 요청 직전 RSS 대비 피크 RSS 증가량 (PIL 포함, 측정마다 새 프로세스)
+
+    PYTHONPATH=src python benchmarks/bench_banner_response.py --size 2048
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from PIL import Image
+
+FORMATS = ("base64", "png", "webp", "jpeg")
+
+
+def _generated_png(size: int) -> bytes:
+    # Gemini 결과처럼 사진에 가까운 입력 (노이즈 + 그라데이션), 응답 MIME은 image/png
+    noise = Image.effect_noise((size, size), 32).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+    buf = io.BytesIO()
+    Image.blend(noise, gradient, 0.6).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _product_png() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 120, 80)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+async def _request(client, fmt: str, product: bytes) -> tuple[float, int]:
+    started = time.perf_counter()
+    size = 0
+    async with client.stream("POST", "/api/generate-banner", params={"format": fmt},
+                             files={"file_product": ("product.png", product, "image/png")}) as response:
+        assert response.status_code == 200, await response.aread()
+        async for chunk in response.aiter_raw():
+            size += len(chunk)
+    return time.perf_counter() - started, size
+
+
+def run_case(fmt: str, size: int, repeat: int) -> dict:
+    import httpx
+    import main
+
+    generated = _generated_png(size)
+
+    async def fake_generate_banner_image(**kwargs):
+        return generated, "image/png"
+
+    main.generate_banner_image = fake_generate_banner_image
+    product = _product_png()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # 메모리는 첫 요청에서 (ru_maxrss는 프로세스 전체 피크라 앞선 요청이 있으면 가려진다)
+            before = _rss_bytes()
+            tracemalloc.start()
+            _, body_bytes = await _request(client, fmt, product)
+            py_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            rss_extra = max(0, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - before)
+
+            await _request(client, fmt, product)  # 시간은 warm-up 뒤에
+            samples = [await _request(client, fmt, product) for _ in range(repeat)]
+            return body_bytes, py_peak, rss_extra, samples
+
+    body_bytes, py_peak, rss_extra, samples = asyncio.run(scenario())
+    return {
+        "format": fmt,
+        "body_kb": body_bytes / 1024,
+        "total_ms": statistics.median(s[0] for s in samples) * 1000,
+        "py_peak_mb": py_peak / 2**20,
+        "rss_extra_mb": rss_extra / 2**20,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--case", choices=FORMATS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.size, args.repeat)))
+        return
+
+    env = {**os.environ, "MALLOC_MMAP_THRESHOLD_": "65536"}
+    print(f"{args.size}px, Gemini 결과 PNG {len(_generated_png(args.size)) / 1024:.0f} KB")
+    print(f"{'format':>7} {'body_kb':>9} {'total_ms':>9} {'py_peak_mb':>11} {'rss_extra_mb':>13}")
+    for fmt in FORMATS:
+        cmd = [sys.executable, __file__, "--case", fmt, "--size", str(args.size), "--repeat", str(args.repeat)]
+        result = subprocess.run(cmd, capture_output=True, text=True, env=env)
+        if result.returncode != 0:
+            print(f"{fmt:>7}: 실패\n{result.stderr[-1500:]}")
+            continue
+        r = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{r['format']:>7} {r['body_kb']:>9.0f} {r['total_ms']:>9.1f} "
+              f"{r['py_peak_mb']:>11.1f} {r['rss_extra_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# benchmarks/bench_image_ops.py
+"""
+pipeline/image_ops 마이크로 벤치마크: 예전 코드(legacy) vs NumPy 연산(current), 512 / 1024 / 4096 px.
+- cutout:    SAM 마스크로 RGBA 컷아웃 (예전: cv2.cvtColor + 채널별 곱셈 + mask // 255 임시 배열)
+- threshold: 알파 → 인페인팅 마스크 (예전: split() + Python lambda point)
+- compose:   N px 오브젝트를 512 px 배경에 합성 (예전: convert + resize + alpha_composite)
+
+메모리는 측정마다 새 프로세스에서 (연산 직전 RSS 대비 피크 RSS 증가량, PIL 내부 할당 포함).
+큰 버퍼가 해제 즉시 RSS에서 빠지도록 자식 프로세스는 MALLOC_MMAP_THRESHOLD_=65536으로 실행한다.
+"planes"는 그 증가량을 N×N uint8 한 장 크기로 나눈 값 = 결과 + 중간 버퍼가 몇 장인지의 근사치
+(cutout 결과만 4장, threshold 결과 1장, compose 결과는 512 px 배경 크기라 N이 크면 0에 가깝다).
+
+    PYTHONPATH=src python benchmarks/bench_image_ops.py
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+from pipeline.image_ops import apply_mask, threshold_mask, compose_over
+
+SIZES = (512, 1024, 4096)
+OPS = ("cutout", "threshold", "compose")
+
+
+def _disc_alpha(size: int) -> Image.Image:
+    alpha = Image.new("L", (size, size), 0)
+    ImageDraw.Draw(alpha).ellipse((size // 8, size // 8, size * 7 // 8, size * 7 // 8), fill=255)
+    return alpha
+
+
+def _inputs(op: str, size: int):
+    rng = np.random.default_rng(0)
+    rgb = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    alpha = _disc_alpha(size)
+    if op == "cutout":
+        return rgb, np.asarray(alpha) > 0
+    rgba = Image.fromarray(rgb, "RGB")
+    rgba.putalpha(alpha)
+    if op == "threshold":
+        return (rgba,)
+    bg = Image.fromarray(rng.integers(0, 256, (512, 512, 3), dtype=np.uint8), "RGB")
+    return bg, rgba
+
+
+# ---- 예전 코드 (기준선) ----
+
+def legacy_cutout(rgb: np.ndarray, mask_bool: np.ndarray) -> np.ndarray:
+    mask = mask_bool.astype(np.uint8) * 255
+    rgba = cv2.cvtColor(rgb, cv2.COLOR_RGB2RGBA)
+    rgba[:, :, 3] = mask
+    rgba[:, :, 0] = rgba[:, :, 0] * (mask // 255)
+    rgba[:, :, 1] = rgba[:, :, 1] * (mask // 255)
+    rgba[:, :, 2] = rgba[:, :, 2] * (mask // 255)
+    return rgba
+
+
+def legacy_threshold(rgba: Image.Image, threshold: int = 0) -> Image.Image:
+    alpha = rgba.split()[-1]
+    return alpha.point(lambda p: 0 if p > threshold else 255, mode="L")
+
+
+def legacy_compose(bg: Image.Image, obj: Image.Image) -> Image.Image:
+    bg = bg.convert("RGBA")
+    obj = obj.convert("RGBA").resize(bg.size)
+    return Image.alpha_composite(bg, obj)
+
+
+# ---- 현재 코드 ----
+
+def current_cutout(rgb: np.ndarray, mask_bool: np.ndarray) -> np.ndarray:
+    return apply_mask(rgb, mask_bool)
+
+
+def current_threshold(rgba: Image.Image, threshold: int = 0) -> np.ndarray:
+    return threshold_mask(np.asarray(rgba.getchannel("A")), threshold)
+
+
+def current_compose(bg: Image.Image, obj: Image.Image) -> Image.Image:
+    return compose_over(bg, obj)
+
+
+FUNCS = {
+    ("legacy", "cutout"): legacy_cutout, ("current", "cutout"): current_cutout,
+    ("legacy", "threshold"): legacy_threshold, ("current", "threshold"): current_threshold,
+    ("legacy", "compose"): legacy_compose, ("current", "compose"): current_compose,
+}
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+def run_case(impl: str, op: str, size: int, repeat: int) -> dict:
+    fn = FUNCS[impl, op]
+    args = _inputs(op, size)
+
+    before = _rss_bytes()
+    fn(*args)
+    extra = max(0, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - before)
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - started)
+    return {"impl": impl, "op": op, "size": size, "best_ms": min(samples) * 1000,
+            "extra_mb": extra / 2**20, "planes": extra / (size * size)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--case", nargs=3, metavar=("IMPL", "OP", "SIZE"))
+    args = parser.parse_args()
+
+    if args.case:
+        impl, op, size = args.case
+        print(json.dumps(run_case(impl, op, int(size), args.repeat)))
+        return
+
+    env = {**os.environ, "MALLOC_MMAP_THRESHOLD_": "65536"}
+    print(f"{'op':>9} {'size':>5} {'legacy_ms':>10} {'current_ms':>11} {'legacy_planes':>14} {'current_planes':>15}")
+    for op in OPS:
+        for size in SIZES:
+            rows = {}
+            for impl in ("legacy", "current"):
+                cmd = [sys.executable, __file__, "--repeat", str(args.repeat), "--case", impl, op, str(size)]
+                result = subprocess.run(cmd, capture_output=True, text=True, check=True, env=env)
+                rows[impl] = json.loads(result.stdout.strip().splitlines()[-1])
+            legacy, current = rows["legacy"], rows["current"]
+            print(f"{op:>9} {size:>5} {legacy['best_ms']:>10.1f} {current['best_ms']:>11.1f} "
+                  f"{legacy['planes']:>14.1f} {current['planes']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
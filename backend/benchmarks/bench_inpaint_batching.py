@@ -0,0 +1,103 @@
+# benchmarks/bench_inpaint_batching.py
+"""
+인페인팅 마이크로 배칭 벤치마크 (CPU, 랜덤 가중치의 작은 SD 인페인팅 모델).
+배치 크기 1~8에서 같은 수의 요청을 동시에 넣고 처리량과 요청별 지연 시간을 비교한다.
+
+    PYTHONPATH=src python benchmarks/bench_inpaint_batching.py --requests 16 --steps 4
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import wait
+
+from PIL import Image
+
+from pipeline import diffusion
+from pipeline.batching import MicroBatcher
+from pipeline.model_registry import registry
+
+
+def load_tiny_inpaint_pipeline():
+    """diffusers 테스트와 같은 구성의 작은 인페인팅 파이프라인 (토크나이저만 내려받음)"""
+    import torch
+    from diffusers import AutoencoderKL, PNDMScheduler, StableDiffusionInpaintPipeline, UNet2DConditionModel
+    from transformers import CLIPTextConfig, CLIPTextModel, CLIPTokenizer
+
+    torch.manual_seed(0)
+    unet = UNet2DConditionModel(
+        block_out_channels=(32, 64), layers_per_block=2, sample_size=32, in_channels=9, out_channels=4,
+        down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+        up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"), cross_attention_dim=32,
+    )
+    vae = AutoencoderKL(
+        block_out_channels=[32, 64], in_channels=3, out_channels=3, latent_channels=4,
+        down_block_types=["DownEncoderBlock2D", "DownEncoderBlock2D"],
+        up_block_types=["UpDecoderBlock2D", "UpDecoderBlock2D"],
+    )
+    text_encoder = CLIPTextModel(CLIPTextConfig(
+        bos_token_id=0, eos_token_id=2, hidden_size=32, intermediate_size=37, layer_norm_eps=1e-05,
+        num_attention_heads=4, num_hidden_layers=5, pad_token_id=1, vocab_size=1000,
+    ))
+    tokenizer = CLIPTokenizer.from_pretrained("hf-internal-testing/tiny-random-clip")
+    tokenizer.model_max_length = 77
+    pipe = StableDiffusionInpaintPipeline(
+        unet=unet, vae=vae, text_encoder=text_encoder, tokenizer=tokenizer,
+        scheduler=PNDMScheduler(skip_prk_steps=True),
+        safety_checker=None, feature_extractor=None, requires_safety_checker=False,
+    )
+    pipe.set_progress_bar_config(disable=True)
+    return pipe
+
+
+def run(batch_size: int, requests: int, steps: int, size: int, max_wait: float) -> dict:
+    batcher = MicroBatcher(diffusion._run_inpaint_batch, max_batch=batch_size, max_wait=max_wait,
+                           name=f"bench-batch-{batch_size}")
+    product = Image.new("RGB", (size, size), (200, 120, 80))
+    mask = Image.new("L", (size, size), 255)
+    key = (False, steps, product.size)
+
+    latencies: list[float] = []
+    started = time.perf_counter()
+    futures = []
+    for i in range(requests):
+        submitted = time.perf_counter()
+        future = batcher.submit(key, (product, mask, f"restaurant interior {i}"))
+        future.add_done_callback(lambda _f, t=submitted: latencies.append(time.perf_counter() - t))
+        futures.append(future)
+    wait(futures)
+    elapsed = time.perf_counter() - started
+    for f in futures:
+        f.result()
+
+    latencies.sort()
+    return {
+        "batch": batch_size,
+        "wall_s": elapsed,
+        "images_per_s": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        "batches": batcher.batches,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--steps", type=int, default=4)
+    parser.add_argument("--size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    registry.register("sd_inpaint", load_tiny_inpaint_pipeline, 0.01, "benchmark tiny model")
+    registry.get("sd_inpaint")
+    run(1, 2, args.steps, args.size, 0)  # warm-up
+
+    print(f"{'batch':>5} {'wall_s':>8} {'img/s':>8} {'p50_ms':>9} {'p95_ms':>9} {'batches':>8}")
+    for batch_size in range(1, 9):
+        r = run(batch_size, args.requests, args.steps, args.size, args.max_wait_ms / 1000)
+        print(f"{r['batch']:>5} {r['wall_s']:>8.2f} {r['images_per_s']:>8.2f} "
+              f"{r['p50_ms']:>9.0f} {r['p95_ms']:>9.0f} {r['batches']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/bench_instagram_jpeg.py
+"""
+Instagram 게시용 JPEG 준비 벤치마크: 예전 경로(legacy: 디코딩 → RGB → quality 85) vs storage.prepare_instagram_jpeg.
+1) 입력별 인코딩 시간(중앙값)과 출력 크기
+   - compliant: 조건에 맞는 1080x1080 JPEG (통과 대상)
+   - camera:    12MP 4000x3000 JPEG
+   - rgba_png:  2048x2048 투명 배경 PNG
+   - tall_png:  1080x1920 (9:16, 허용 비율 밖) PNG
+2) 동시에 준비하는 장 수별 스레드 풀(run_cpu) vs 프로세스 풀(run_process) wall time
+   (PUBLISH_PROCESS_POOL_MIN 기준을 정하는 용도. 프로세스 풀은 미리 띄워서 기동 시간은 제외)
+
+    PYTHONPATH=src python benchmarks/bench_instagram_jpeg.py
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import time
+
+from PIL import Image, ImageDraw
+
+from pipeline.executors import run_cpu, run_process, get_process_executor
+from services.storage import prepare_instagram_jpeg
+from config import CPU_WORKERS, PROCESS_WORKERS, PUBLISH_PROCESS_POOL_MIN
+
+
+def _photo(size: tuple[int, int]) -> Image.Image:
+    # 사진에 가까운 합성 이미지 (약한 노이즈 + 그라데이션)
+    noise = Image.effect_noise(size, 24).convert("RGB")
+    gradient = Image.linear_gradient("L").resize(size).convert("RGB")
+    return Image.blend(noise, gradient, 0.7)
+
+
+def _encode(image: Image.Image, fmt: str, **kwargs) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format=fmt, **kwargs)
+    return buf.getvalue()
+
+
+def make_inputs() -> dict[str, bytes]:
+    rgba = _photo((2048, 2048)).convert("RGBA")
+    alpha = Image.new("L", rgba.size, 0)
+    ImageDraw.Draw(alpha).ellipse((256, 256, 1792, 1792), fill=255)
+    rgba.putalpha(alpha)
+    return {
+        "compliant": _encode(_photo((1080, 1080)), "JPEG", quality=90),
+        "camera": _encode(_photo((4000, 3000)), "JPEG", quality=92),
+        "rgba_png": _encode(rgba, "PNG"),
+        "tall_png": _encode(_photo((1080, 1920)), "PNG"),
+    }
+
+
+def legacy_to_jpeg(file_bytes: bytes) -> bytes:
+    """예전 storage._to_jpeg: 항상 디코딩 → RGB → quality 85"""
+    image = Image.open(io.BytesIO(file_bytes)).convert("RGB")
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+def current_to_jpeg(file_bytes: bytes) -> bytes:
+    return prepare_instagram_jpeg(file_bytes).data
+
+
+def _median_ms(fn, data: bytes, repeat: int) -> tuple[float, bytes]:
+    samples, out = [], b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn(data)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, out
+
+
+def bench_inputs(inputs: dict[str, bytes], repeat: int) -> None:
+    print(f"{'input':>10} {'in_kb':>7} {'legacy_ms':>10} {'legacy_kb':>10} {'current_ms':>11} {'current_kb':>11} {'size':>10}")
+    for name, data in inputs.items():
+        legacy_ms, legacy_out = _median_ms(legacy_to_jpeg, data, repeat)
+        current_ms, current_out = _median_ms(current_to_jpeg, data, repeat)
+        size = "x".join(map(str, Image.open(io.BytesIO(current_out)).size))
+        print(f"{name:>10} {len(data) / 1024:>7.0f} {legacy_ms:>10.1f} {len(legacy_out) / 1024:>10.0f} "
+              f"{current_ms:>11.1f} {len(current_out) / 1024:>11.0f} {size:>10}")
+
+
+async def _prepare_many(run, items: list[bytes]) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(run(prepare_instagram_jpeg, data) for data in items))
+    return time.perf_counter() - started
+
+
+async def bench_pools(data: bytes, counts: list[int]) -> None:
+    # spawn 프로세스 기동/모듈 import는 제외 (서버에서는 첫 대량 예약 한 번만 부담)
+    await asyncio.gather(*(run_process(prepare_instagram_jpeg, data) for _ in range(PROCESS_WORKERS)))
+    print(f"\nCPU_WORKERS={CPU_WORKERS}, PROCESS_WORKERS={PROCESS_WORKERS}, "
+          f"PUBLISH_PROCESS_POOL_MIN={PUBLISH_PROCESS_POOL_MIN}, cores={os.cpu_count()}")
+    print(f"{'images':>6} {'thread_s':>9} {'process_s':>10} {'faster':>8}")
+    for n in counts:
+        thread_s = await _prepare_many(run_cpu, [data] * n)
+        process_s = await _prepare_many(run_process, [data] * n)
+        print(f"{n:>6} {thread_s:>9.2f} {process_s:>10.2f} {'process' if process_s < thread_s else 'thread':>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--counts", default="1,2,3,4,8,12")
+    args = parser.parse_args()
+
+    inputs = make_inputs()
+    bench_inputs(inputs, args.repeat)
+    try:
+        asyncio.run(bench_pools(inputs["camera"], [int(c) for c in args.counts.split(",")]))
+    finally:
+        get_process_executor().shutdown()
+
+
+if __name__ == "__main__":
+    main()
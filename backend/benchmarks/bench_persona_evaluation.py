@@ -0,0 +1,104 @@
+# benchmarks/bench_persona_evaluation.py
+"""
+페르소나 평가 wall time 비교: single(한 프롬프트) vs sharded(페르소나별 병렬), 1/4/10명.
+
+기본은 오프라인 가짜 모델: 응답 길이(= 페르소나 수)에 비례해서 지연되도록 흉내 낸다
+(첫 토큰 --base-ms + 페르소나 1명분 출력 --per-persona-ms). --backend openai면 실제 모델 호출.
+
+    PYTHONPATH=src python benchmarks/bench_persona_evaluation.py
+    PYTHONPATH=src python benchmarks/bench_persona_evaluation.py --backend openai --repeat 3
+"""
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import time
+
+from models import Persona, PersonaEvaluationPayload
+from services.llm_gateway import llm_gateway
+from services.persona_evaluation import evaluate_personas
+from config import PERSONA_SHARD_SIZE, PERSONA_MAX_CONCURRENCY
+
+
+def build_length_aware_fake(base_ms: float, per_persona_ms: float):
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    def respond(messages) -> tuple[str, int]:
+        ids = re.findall(r"^- ([^:]+):", messages[-1].content, re.MULTILINE)
+        item = lambda pid: {
+            "personaId": pid, "personaName": pid, "overall_score": 7, "feedback": "fake",
+            "captionFeedback": {"score": 7, "comment": "fake"},
+            "oneLinerFeedback": {"score": 7, "comment": "fake"},
+            "hashtagsFeedback": {"score": 7, "comment": "fake"},
+            "breakdown": {k: {"score": 7, "reason": "fake"} for k in ("emotion", "offer", "cta", "local", "trend")},
+        }
+        body = {"results": [item(pid) for pid in ids], "notes": ["fake note"],
+                "summary": {"bestPersonaId": ids[0], "averageScore": 7, "notes": ["fake note"]}}
+        return json.dumps(body, ensure_ascii=False), len(ids)
+
+    class LengthAwareFakeChatModel(BaseChatModel):
+        @property
+        def _llm_type(self) -> str:
+            return "length-aware-fake"
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+            content, count = respond(messages)
+            time.sleep((base_ms + per_persona_ms * count) / 1000)
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+            content, count = respond(messages)
+            await asyncio.sleep((base_ms + per_persona_ms * count) / 1000)
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    return LengthAwareFakeChatModel()
+
+
+def make_payload(count: int) -> PersonaEvaluationPayload:
+    personas = [
+        Persona(id=f"p{i}", name=f"페르소나 {i}", description="20대 직장인",
+                weights={"emotion": 2, "offer": 1, "cta": 1, "local": 1, "trend": 1})
+        for i in range(count)
+    ]
+    return PersonaEvaluationPayload(selectedPersonas=personas, caption="따뜻한 우동 한 그릇",
+                                    one_liner="오늘 저녁은 우동", hashtags=["#우동", "#저녁"])
+
+
+async def measure(count: int, mode: str, repeat: int) -> float:
+    payload = make_payload(count)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await evaluate_personas(payload, mode)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+async def run(args) -> None:
+    print(f"shard size={PERSONA_SHARD_SIZE}, concurrency={PERSONA_MAX_CONCURRENCY}, backend={args.backend}")
+    print(f"{'personas':>8} {'single_s':>9} {'sharded_s':>10} {'speedup':>8}")
+    for count in (1, 4, 10):
+        single = await measure(count, "single", args.repeat)
+        sharded = await measure(count, "sharded", args.repeat)
+        print(f"{count:>8} {single:>9.2f} {sharded:>10.2f} {single / sharded:>7.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=("fake", "openai"), default="fake")
+    parser.add_argument("--base-ms", type=float, default=800)
+    parser.add_argument("--per-persona-ms", type=float, default=1500)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.backend == "fake":
+        fake = build_length_aware_fake(args.base_ms, args.per_persona_ms)
+        llm_gateway._build_model = lambda model, temperature: fake
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_upscaler.py
+"""
+Real-ESRGAN 업스케일 벤치마크: 피크 RSS와 wall time, 512→1024 / 512→1536.
+- legacy: 예전 경로 (항상 x4 모델로 키운 뒤 LANCZOS로 축소, 타일링 없음)
+- current: pipeline.upscaler.upscale_image (배율에 맞는 네이티브 모델, 메모리 기준 타일링)
+측정마다 새 프로세스에서 실행해서 피크 RSS가 서로 섞이지 않게 한다.
+
+    PYTHONPATH=src python benchmarks/bench_upscaler.py
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+CASES = (("legacy", 2), ("current", 2), ("legacy", 3), ("current", 3))
+
+
+def _test_image(size: int) -> Image.Image:
+    # 평평한 색보다 실제 사진에 가까운 입력 (노이즈 + 그라데이션)
+    noise = Image.effect_noise((size, size), 48).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+    return Image.blend(noise, gradient, 0.5)
+
+
+def _legacy_upscale(img: Image.Image, scale: int, half: bool) -> tuple[Image.Image, float]:
+    """예전 upscaler.py와 같은 처리: x4plus 고정, tile 없음, 결과를 LANCZOS로 축소"""
+    import torch
+    from basicsr.archs.rrdbnet_arch import RRDBNet
+    from realesrgan import RealESRGANer
+
+    from pipeline.upscaler import WEIGHTS, _download
+
+    weights_path, url = WEIGHTS[4]
+    if not os.path.exists(weights_path):
+        os.makedirs(os.path.dirname(weights_path), exist_ok=True)
+        _download(url, weights_path)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    rrdbnet = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32, scale=4)
+    model = RealESRGANer(scale=4, model_path=weights_path, dni_weight=None, model=rrdbnet,
+                         device=device, half=half)
+    started = time.perf_counter()
+    sr_img, _ = model.enhance(np.array(img), outscale=4)
+    out = Image.fromarray(sr_img)
+    out = out.resize((img.width * scale, img.height * scale), Image.LANCZOS)
+    return out, time.perf_counter() - started
+
+
+def _current_upscale(img: Image.Image, scale: int) -> tuple[Image.Image, float]:
+    from pipeline.model_registry import registry
+    from pipeline.upscaler import upscale_image
+
+    registry.get("realesrgan_x2" if scale <= 2 else "realesrgan_x4")  # 로드 시간은 제외
+    started = time.perf_counter()
+    out = upscale_image(img, scale=scale)
+    return out, time.perf_counter() - started
+
+
+def run_case(case: str, scale: int, size: int, legacy_half: bool) -> dict:
+    img = _test_image(size)
+    if case == "legacy":
+        out, seconds = _legacy_upscale(img, scale, legacy_half)
+    else:
+        out, seconds = _current_upscale(img, scale)
+    return {
+        "case": case,
+        "target": f"{size}->{out.width}",
+        "wall_s": round(seconds, 2),
+        # Linux ru_maxrss 단위는 KB
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--legacy-half", action="store_true",
+                        help="예전 코드처럼 half=True로 실행 (CPU에서는 실패하거나 매우 느림)")
+    parser.add_argument("--case", choices=("legacy", "current"))
+    parser.add_argument("--scale", type=int)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.scale, args.size, args.legacy_half)))
+        return
+
+    print(f"{'case':>8} {'target':>10} {'wall_s':>8} {'peak_rss_mb':>12}")
+    for case, scale in CASES:
+        cmd = [sys.executable, __file__, "--case", case, "--scale", str(scale), "--size", str(args.size)]
+        if args.legacy_half:
+            cmd.append("--legacy-half")
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{case:>8} x{scale}: 실패\n{result.stderr[-1500:]}")
+            continue
+        r = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{r['case']:>8} {r['target']:>10} {r['wall_s']:>8.2f} {r['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# artifacts.py
+import io
+import os
+import re
+import time
+import shutil
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from PIL import Image
+
+from config import (
+    ARTIFACT_MAX_SCOPES,
+    ARTIFACT_MAX_MB,
+    ARTIFACT_TTL_SECONDS,
+    ARTIFACT_PERSIST_DIR,
+    ARTIFACT_PERSIST_RETENTION_HOURS,
+    ARTIFACT_PERSIST_MAX_PENDING,
+)
+from telemetry import get_logger
+
+logger = get_logger("artifacts")
+
+# 파이프라인 중간 결과를 요청(작업)별로 메모리에 보관.
+# - PIL 이미지는 참조만 보관하고, 조회하거나 디스크에 저장할 때만 PNG로 인코딩 (요청 경로에서 인코딩/파일 쓰기 없음)
+# - 범위(scope)는 작업이면 job id, 아니면 요청마다 서버가 만든 id → 동시 요청이 서로의 결과를 덮어쓰지 않음
+#   (클라이언트가 보내는 X-Request-ID는 쓰지 않는다: 다른 요청의 결과를 조회/덮어쓸 수 있으므로)
+# - 디스크 저장은 ARTIFACT_PERSIST_DIR를 지정했을 때만, 전용 스레드 1개에서
+
+_scope: contextvars.ContextVar[str | None] = contextvars.ContextVar("artifact_scope", default=None)
+
+_EXTENSIONS = {"image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp"}
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]")
+
+# 디스크 보관 기간 정리는 이 간격으로만
+_CLEANUP_INTERVAL = 600.0
+
+
+@contextmanager
+def artifact_scope(scope_id: str):
+    """이 범위 안에서 put()한 결과를 scope_id로 묶는다 (요청 미들웨어와 작업 큐가 감싼다)"""
+    token = _scope.set(scope_id)
+    try:
+        yield scope_id
+    finally:
+        _scope.reset(token)
+
+
+def current_scope() -> str | None:
+    return _scope.get()
+
+
+@dataclass
+class Artifact:
+    name: str
+    value: Image.Image | bytes
+    mime_type: str
+    nbytes: int
+    created_at: float = field(default_factory=time.time)
+
+    def encode(self) -> bytes:
+        if isinstance(self.value, bytes):
+            return self.value
+        buf = io.BytesIO()
+        self.value.save(buf, format="PNG")
+        return buf.getvalue()
+
+    def to_dict(self) -> dict:
+        data = {"name": self.name, "mime_type": self.mime_type, "bytes": self.nbytes, "created_at": self.created_at}
+        if isinstance(self.value, Image.Image):
+            data.update(width=self.value.width, height=self.value.height, mode=self.value.mode)
+        return data
+
+
+@dataclass
+class _Scope:
+    artifacts: dict[str, Artifact] = field(default_factory=dict)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.artifacts.values())
+
+
+class ArtifactStore:
+    """
+    요청/작업별 중간 결과 저장소 (프로세스 전역 1개).
+    - 오래된 범위부터 삭제: max_scopes개, 전체 max_bytes, ttl_seconds 기준
+    - persist_dir가 있으면 put()할 때 디스크 저장을 예약만 하고 바로 반환 (대기 중인 저장이
+      max_pending개를 넘으면 버린다), retention_seconds가 지난 요청 폴더는 정리
+    """
+
+    def __init__(self, max_scopes: int, max_bytes: int, ttl_seconds: float,
+                 persist_dir: str = "", retention_seconds: float = 0.0, max_pending: int = 64):
+        self.max_scopes = max_scopes
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.persist_dir = persist_dir
+        self.retention_seconds = retention_seconds
+        self.max_pending = max_pending
+        self._scopes: "OrderedDict[str, _Scope]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writer: ThreadPoolExecutor | None = None
+        self._pending = 0
+        self._last_cleanup = 0.0
+        self._stats = {"puts": 0, "evicted_scopes": 0, "persisted": 0, "persist_dropped": 0, "persist_errors": 0}
+
+    def put(self, name: str, value: Image.Image | bytes, *, mime_type: str = "image/png",
+            scope: str | None = None, copy: bool = False) -> Artifact:
+        """
+        결과 보관. 이미지는 인코딩하지 않고 참조만 보관하므로, 이후 단계가 제자리에서 수정하는
+        이미지는 copy=True로 넘긴다. 요청/작업 밖에서 호출하면 "local" 범위에 보관.
+        """
+        scope = scope or current_scope() or "local"
+        if copy and isinstance(value, Image.Image):
+            value = value.copy()
+        if isinstance(value, bytes):
+            nbytes = len(value)
+        else:
+            nbytes = value.width * value.height * len(value.getbands())
+        artifact = Artifact(name, value, mime_type, nbytes)
+
+        with self._lock:
+            entry = self._scopes.get(scope)
+            if entry is None:
+                entry = self._scopes[scope] = _Scope()
+            entry.artifacts[name] = artifact
+            entry.updated_at = artifact.created_at
+            self._scopes.move_to_end(scope)
+            self._stats["puts"] += 1
+            self._evict()
+
+        if self.persist_dir:
+            self._schedule_persist(scope, artifact)
+        return artifact
+
+    def get(self, scope: str, name: str) -> Artifact | None:
+        with self._lock:
+            entry = self._scopes.get(scope)
+            if entry is None or self._expired(entry):
+                return None
+            return entry.artifacts.get(name)
+
+    def list_artifacts(self, scope: str) -> list[Artifact] | None:
+        with self._lock:
+            entry = self._scopes.get(scope)
+            if entry is None or self._expired(entry):
+                return None
+            return list(entry.artifacts.values())
+
+    def drop(self, scope: str) -> bool:
+        with self._lock:
+            return self._scopes.pop(scope, None) is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._evict()
+            return {
+                "scopes": len(self._scopes),
+                "artifacts": sum(len(e.artifacts) for e in self._scopes.values()),
+                "bytes": sum(e.nbytes for e in self._scopes.values()),
+                "max_scopes": self.max_scopes,
+                "max_bytes": self.max_bytes,
+                "persist_dir": self.persist_dir or None,
+                "persist_pending": self._pending,
+                **self._stats,
+            }
+
+    def close(self) -> None:
+        """대기 중인 디스크 저장을 마저 끝내고 writer 스레드 종료"""
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.shutdown(wait=True)
+
+    # ---- 내부 함수 ----
+
+    def _expired(self, entry: _Scope) -> bool:
+        return time.time() - entry.updated_at > self.ttl_seconds
+
+    def _evict(self) -> None:
+        # 호출하는 쪽에서 _lock을 잡고 있어야 함. 가장 최근 범위(방금 put한 요청)는 남긴다
+        total = sum(e.nbytes for e in self._scopes.values())
+        while len(self._scopes) > 1:
+            oldest = next(iter(self._scopes.values()))
+            if (len(self._scopes) <= self.max_scopes and total <= self.max_bytes
+                    and not self._expired(oldest)):
+                break
+            _, entry = self._scopes.popitem(last=False)
+            total -= entry.nbytes
+            self._stats["evicted_scopes"] += 1
+
+    def _schedule_persist(self, scope: str, artifact: Artifact) -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats["persist_dropped"] += 1
+                return
+            self._pending += 1
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifacts")
+            writer = self._writer
+        writer.submit(self._persist, scope, artifact)
+
+    def _persist(self, scope: str, artifact: Artifact) -> None:
+        try:
+            directory = os.path.join(self.persist_dir, _safe_name(scope))
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, _safe_name(artifact.name) + _EXTENSIONS.get(artifact.mime_type, ".bin"))
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(artifact.encode())
+            os.replace(tmp, path)
+            with self._lock:
+                self._stats["persisted"] += 1
+        except Exception as e:
+            logger.warning(f"artifact 저장 실패 ({scope}/{artifact.name}): {e}")
+            with self._lock:
+                self._stats["persist_errors"] += 1
+        finally:
+            with self._lock:
+                self._pending -= 1
+        self._cleanup_persisted()
+
+    def _cleanup_persisted(self) -> None:
+        now = time.time()
+        if self.retention_seconds <= 0 or now - self._last_cleanup < _CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = now
+        try:
+            entries = list(os.scandir(self.persist_dir))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_dir() and now - entry.stat().st_mtime > self.retention_seconds:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except OSError:
+                pass
+
+
+def _safe_name(name: str) -> str:
+    # artifact 이름은 호출하는 쪽이 정하므로 경로로 쓰기 전에 정리
+    return _UNSAFE.sub("_", name).lstrip(".")[:64] or "_"
+
+
+artifact_store = ArtifactStore(
+    max_scopes=ARTIFACT_MAX_SCOPES,
+    max_bytes=int(ARTIFACT_MAX_MB * 1024 * 1024),
+    ttl_seconds=ARTIFACT_TTL_SECONDS,
+    persist_dir=ARTIFACT_PERSIST_DIR,
+    retention_seconds=ARTIFACT_PERSIST_RETENTION_HOURS * 3600,
+    max_pending=ARTIFACT_PERSIST_MAX_PENDING,
+)
@@ -15,8 +15,189 @@ SDXL_INPAINT_MODEL = os.getenv("SDXL_INPAINT_MODEL", "diffusers/stable-diffusion
 # 업스케일 배율 (2, 3, 4)
 UPSCALE_FACTOR = int(os.getenv("UPSCALE_FACTOR", "2"))
 
+# Real-ESRGAN 실행 설정
+# - UPSCALE_PRECISION: "auto"(GPU fp16 / CPU fp32), "fp16", "fp32"
+# - UPSCALE_TILE: 타일 크기 (-1이면 남은 메모리 기준 자동, 0이면 타일링 없음)
+# - UPSCALE_TILE_PAD: 타일 경계 겹침 픽셀 수
+UPSCALE_PRECISION = os.getenv("UPSCALE_PRECISION", "auto")
+UPSCALE_TILE = int(os.getenv("UPSCALE_TILE", "-1"))
+UPSCALE_TILE_PAD = int(os.getenv("UPSCALE_TILE_PAD", "10"))
+
 # 배경 생성 해상도
 BG_SIZE = os.getenv("BG_SIZE", "768x768")  # "512x512" 또는 "768x768"
 
 # OpenAI 키 등 다른 키도 여기에
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# 로깅 / 트레이싱
+# - LOG_LEVEL: DEBUG이면 프롬프트/응답 본문도 (샘플링된 요청만) 기록
+# - LOG_FORMAT: "json" 또는 "text"
+# - LOG_PAYLOAD_SAMPLE_RATE: 프롬프트/응답 본문을 기록할 요청 비율 (0~1)
+# - TRACE_EXPORT: "none", "file"(OTLP JSON을 한 줄씩 파일에 기록), "otlp"(OTLP/HTTP 수집기로 전송)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "none")
+TRACE_FILE = os.getenv("TRACE_FILE", "logs/traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+SERVICE_NAME = os.getenv("SERVICE_NAME", "daily-story-editor")
+
+# 모델 레지스트리
+# - MODEL_WARMUP: 서버 시작 시 미리 로드할 모델 (쉼표 구분, 예: "sam,rembg,realesrgan_x2")
+# - MODEL_MEMORY_BUDGET_GB: 상주 모델 메모리 예산 (0이면 무제한), 초과 시 유휴 모델부터 LRU로 해제
+MODEL_WARMUP = [m.strip() for m in os.getenv("MODEL_WARMUP", "").split(",") if m.strip()]
+MODEL_MEMORY_BUDGET_GB = float(os.getenv("MODEL_MEMORY_BUDGET_GB", "0"))
+
+# SAM 체크포인트
+SAM_CHECKPOINT = os.getenv("SAM_CHECKPOINT", "weights/sam_vit_h_4b8939.pth")
+
+# SAM 이미지 임베딩 캐시 크기 (같은 제품 사진 재업로드 시 인코더 생략, 0이면 비활성)
+SAM_EMBEDDING_CACHE_SIZE = int(os.getenv("SAM_EMBEDDING_CACHE_SIZE", "16"))
+
+# 배너 결과 캐시 (같은 이미지 + 같은 프롬프트 재요청 시 Gemini 호출 생략)
+BANNER_CACHE_DIR = os.getenv("BANNER_CACHE_DIR", "cache/banner")
+BANNER_CACHE_MAX_MB = int(os.getenv("BANNER_CACHE_MAX_MB", "512"))
+BANNER_CACHE_TTL_HOURS = float(os.getenv("BANNER_CACHE_TTL_HOURS", "168"))
+
+# 번역 (ko → en)
+# - TRANSLATION_BACKEND: "google" (deep-translator) 또는 "dictionary" (오프라인 사전, 테스트용)
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "google")
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "2048"))
+TRANSLATION_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", "cache/translations.json")
+TRANSLATION_DICTIONARY_PATH = os.getenv("TRANSLATION_DICTIONARY_PATH", "")
+
+# 동기 파이프라인 실행용 executor 크기
+# - GPU_WORKERS: GPU 모델 단계(SAM, 인페인팅, 업스케일) 동시 실행 수
+# - CPU_WORKERS: 이미지 인코딩/합성 등 CPU 단계 동시 실행 수
+GPU_WORKERS = int(os.getenv("GPU_WORKERS", "1"))
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(8, os.cpu_count() or 4))))
+# - PROCESS_WORKERS: GIL을 오래 잡는 CPU 작업(게시물 여러 장 JPEG 인코딩)용 프로세스 풀 크기
+PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", str(min(4, os.cpu_count() or 2))))
+
+# 배너 작업 큐
+# - JOB_WORKERS개 작업을 동시에 실행, 나머지는 대기열 (대기 중인 작업이 JOB_MAX_QUEUE 이상이면 429)
+# - 작업을 GPU별로 나누지는 않는다: 모델 단계의 GPU 동시 실행 수는 GPU_WORKERS가 정한다
+# - JOB_CLEANUP_INTERVAL_SECONDS마다 JOB_RESULT_TTL_SECONDS가 지난 완료 작업을 정리
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "32"))
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+JOB_CLEANUP_INTERVAL_SECONDS = float(os.getenv("JOB_CLEANUP_INTERVAL_SECONDS", "60"))
+
+# 인페인팅 마이크로 배칭 (같은 모델/step/해상도 요청을 최대 대기시간 동안 모아서 한 번에 실행)
+INPAINT_MAX_BATCH = int(os.getenv("INPAINT_MAX_BATCH", "4"))
+INPAINT_MAX_WAIT_MS = float(os.getenv("INPAINT_MAX_WAIT_MS", "50"))
+
+# LLM 게이트웨이 (text/evaluation/persona 서비스 공용)
+# - LLM_BACKEND: "openai" 또는 "fake" (오프라인 부하 테스트용 가짜 모델)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))     # 호출 1회 제한
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "120"))  # 재시도 포함 전체 제한
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))       # 모델별 동시 호출 수
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "10"))     # 모델별 초당 요청 수 (0이면 무제한)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "300"))
+# 구조화 출력 모드: "json_schema"(pydantic 모델 스키마 강제), "json_object", "none"(프롬프트만 사용)
+LLM_STRUCTURED_MODE = os.getenv("LLM_STRUCTURED_MODE", "json_schema")
+
+# 프롬프트 레지스트리
+# - PROMPT_VERSIONS: 템플릿별 사용할 버전 (예: "generate_text=v2,evaluate_content=v1"), 없으면 마지막 등록 버전
+# - PROMPT_TOKENIZER: 토큰 수 집계용 로컬 tiktoken 인코딩 (로드 실패 시 글자 수 기반 추정)
+PROMPT_VERSIONS = {
+    k.strip(): v.strip()
+    for k, v in (item.split("=", 1) for item in os.getenv("PROMPT_VERSIONS", "").split(",") if "=" in item)
+}
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", "o200k_base")
+
+# 캡션 일괄 생성 (/api/generate/batch): 요청당 최대 항목 수, 동시 생성 수
+GENERATE_BATCH_MAX_ITEMS = int(os.getenv("GENERATE_BATCH_MAX_ITEMS", "100"))
+GENERATE_BATCH_CONCURRENCY = int(os.getenv("GENERATE_BATCH_CONCURRENCY", "8"))
+
+# LLM 응답 캐시 (캡션 생성/평가)
+# - RESPONSE_CACHE_VARIANTS: 키당 보관할 응답 수 (다 모이면 재생성 시 순환)
+# - RESPONSE_CACHE_SIMILARITY: 로컬 임베딩 유사 일치 임계값 (0이면 정확 일치만)
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_VARIANTS = int(os.getenv("RESPONSE_CACHE_VARIANTS", "3"))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+
+# 페르소나 평가
+# - PERSONA_EVAL_MODE: "sharded"(페르소나 묶음별 병렬 호출) 또는 "single"(한 프롬프트에 모두 포함)
+# - PERSONA_SHARD_TIMEOUT_SECONDS: 묶음 하나의 제한 시간 (초과한 묶음만 빼고 부분 결과 반환)
+PERSONA_EVAL_MODE = os.getenv("PERSONA_EVAL_MODE", "sharded")
+PERSONA_SHARD_SIZE = int(os.getenv("PERSONA_SHARD_SIZE", "1"))
+PERSONA_MAX_CONCURRENCY = int(os.getenv("PERSONA_MAX_CONCURRENCY", "4"))
+PERSONA_SHARD_TIMEOUT_SECONDS = float(os.getenv("PERSONA_SHARD_TIMEOUT_SECONDS", "45"))
+
+# Gemini 이미지 생성 (services/gemini.py)
+# - GEMINI_INPUT_MAX_SIDE: 업로드 전 입력 이미지 긴 변 최대 픽셀 (0이면 축소하지 않음)
+# - GEMINI_INPUT_MAX_BYTES: 이 크기 이하이고 축소가 필요 없는 PNG/JPEG/WebP는 재인코딩 없이 그대로 전송
+# - GEMINI_TIMEOUT_SECONDS: 호출 1회 제한, GEMINI_DEADLINE_SECONDS: 재시도 포함 전체 제한
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+GEMINI_IMAGE_MODEL = os.getenv("GEMINI_IMAGE_MODEL", "gemini-3-pro-image-preview")
+GEMINI_INPUT_MAX_SIDE = int(os.getenv("GEMINI_INPUT_MAX_SIDE", "1536"))
+GEMINI_INPUT_MAX_BYTES = int(os.getenv("GEMINI_INPUT_MAX_BYTES", str(1024 * 1024)))
+GEMINI_INPUT_JPEG_QUALITY = int(os.getenv("GEMINI_INPUT_JPEG_QUALITY", "90"))
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "120"))
+GEMINI_DEADLINE_SECONDS = float(os.getenv("GEMINI_DEADLINE_SECONDS", "240"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "2"))
+
+# 업로드 제한 (이미지 엔드포인트)
+# - UPLOAD_MAX_FILE_MB / UPLOAD_MAX_REQUEST_MB: 파일 1개 / 요청 전체 최대 크기 (초과 시 413)
+# - UPLOAD_MAX_PIXELS: 헤더에서 읽은 해상도가 이보다 크면 디코딩 전에 거부 (decompression bomb 방지)
+# - UPLOAD_MAX_SIDE: 긴 변이 이보다 크면 파이프라인에 넘기기 전에 축소 (0이면 축소하지 않음)
+UPLOAD_MAX_FILE_MB = float(os.getenv("UPLOAD_MAX_FILE_MB", "15"))
+UPLOAD_MAX_REQUEST_MB = float(os.getenv("UPLOAD_MAX_REQUEST_MB", "40"))
+UPLOAD_MAX_PIXELS = int(os.getenv("UPLOAD_MAX_PIXELS", "50000000"))
+UPLOAD_MAX_SIDE = int(os.getenv("UPLOAD_MAX_SIDE", "4096"))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+
+# Instagram 게시 (GCS 임시 업로드 → Graph API 컨테이너 생성 → 상태 확인 → 게시)
+# - INSTAGRAM_GRAPH_URL: Graph API 기본 URL (로컬 대역 서버로 바꿔서 테스트 가능)
+# - GCS는 STORAGE_EMULATOR_HOST 환경변수를 지정하면 google-cloud-storage가 에뮬레이터로 접속
+# - PUBLISH_QUEUE_PATH: 게시 대기열 SQLite 파일 (서버 재시작 후에도 예약/재시도 게시 유지)
+# - PUBLISH_CONTAINER_TIMEOUT_SECONDS: 컨테이너가 FINISHED가 될 때까지 기다리는 최대 시간
+# - PUBLISH_WAIT_SECONDS: /api/upload-instagram이 게시 결과를 기다리는 시간 (넘으면 pending 응답)
+IG_USER_ID = os.getenv("IG_USER_ID")
+ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
+STORAGE_BUCKET = os.getenv("STORAGE_BUCKET")
+STORAGE_ENDPOINT = os.getenv("STORAGE_ENDPOINT")
+INSTAGRAM_GRAPH_URL = os.getenv("INSTAGRAM_GRAPH_URL", "https://graph.facebook.com/v24.0")
+INSTAGRAM_MAX_CONNECTIONS = int(os.getenv("INSTAGRAM_MAX_CONNECTIONS", "16"))
+PUBLISH_QUEUE_PATH = os.getenv("PUBLISH_QUEUE_PATH", "cache/publish_queue.sqlite3")
+PUBLISH_MEDIA_DIR = os.getenv("PUBLISH_MEDIA_DIR", "cache/publish_media")
+PUBLISH_CONCURRENCY = int(os.getenv("PUBLISH_CONCURRENCY", "2"))
+PUBLISH_MAX_ATTEMPTS = int(os.getenv("PUBLISH_MAX_ATTEMPTS", "5"))
+PUBLISH_CONTAINER_TIMEOUT_SECONDS = float(os.getenv("PUBLISH_CONTAINER_TIMEOUT_SECONDS", "300"))
+PUBLISH_WAIT_SECONDS = float(os.getenv("PUBLISH_WAIT_SECONDS", "120"))
+PUBLISH_BULK_MAX_ITEMS = int(os.getenv("PUBLISH_BULK_MAX_ITEMS", "25"))
+
+# Instagram 게시용 JPEG 준비 (이미 조건에 맞는 JPEG는 재인코딩하지 않고 그대로 업로드)
+# - INSTAGRAM_MAX_WIDTH: 가로 최대 (Instagram은 1440px보다 크면 어차피 축소)
+# - INSTAGRAM_MAX_MB: 이미지 파일 최대 크기 MB (Instagram 제한 8MB, 코드에서는 INSTAGRAM_MAX_BYTES로 바이트 단위)
+# - INSTAGRAM_JPEG_QUALITY: 재인코딩 품질 (항상 optimize, INSTAGRAM_JPEG_PROGRESSIVE면 progressive)
+# - INSTAGRAM_ASPECT_MODE: 허용 비율(4:5 ~ 1.91:1) 밖일 때 "pad"(흰 여백 추가) 또는 "crop"(가운데 자르기)
+# - PUBLISH_PROCESS_POOL_MIN: 동시에 준비 중인 게시물이 이 수 이상이면 프로세스 풀에서 인코딩
+INSTAGRAM_MAX_WIDTH = int(os.getenv("INSTAGRAM_MAX_WIDTH", "1440"))
+INSTAGRAM_MAX_BYTES = int(float(os.getenv("INSTAGRAM_MAX_MB", "8")) * 1024 * 1024)
+INSTAGRAM_JPEG_QUALITY = int(os.getenv("INSTAGRAM_JPEG_QUALITY", "85"))
+INSTAGRAM_JPEG_PROGRESSIVE = os.getenv("INSTAGRAM_JPEG_PROGRESSIVE", "true").lower() in ("1", "true", "yes")
+INSTAGRAM_ASPECT_MODE = os.getenv("INSTAGRAM_ASPECT_MODE", "pad")
+PUBLISH_PROCESS_POOL_MIN = int(os.getenv("PUBLISH_PROCESS_POOL_MIN", "3"))
+
+# 파이프라인 중간 결과(컷아웃/마스크/생성 이미지) 보관
+# - 서버가 만든 id별로 메모리에 보관 (작업이면 job id, 아니면 요청마다 새로 만든 id → 응답의 X-Artifact-Scope)
+# - ARTIFACT_DEBUG: true일 때만 GET /api/artifacts/* 조회 가능 (기본은 404)
+# - ARTIFACT_DEBUG_TOKEN: 지정하면 조회 시 X-Debug-Token 헤더가 일치해야 함
+# - ARTIFACT_MAX_SCOPES / ARTIFACT_MAX_MB / ARTIFACT_TTL_SECONDS: 보관할 요청 수 / 전체 크기 / 보관 시간
+# - ARTIFACT_PERSIST_DIR: 지정하면 디버그용으로 디스크에도 저장 (백그라운드 스레드, 기본은 저장 안 함)
+# - ARTIFACT_PERSIST_RETENTION_HOURS: 디스크에 저장한 결과 보관 기간 (지나면 요청 폴더째 삭제)
+ARTIFACT_MAX_SCOPES = int(os.getenv("ARTIFACT_MAX_SCOPES", "16"))
+ARTIFACT_MAX_MB = float(os.getenv("ARTIFACT_MAX_MB", "256"))
+ARTIFACT_TTL_SECONDS = float(os.getenv("ARTIFACT_TTL_SECONDS", "900"))
+ARTIFACT_PERSIST_DIR = os.getenv("ARTIFACT_PERSIST_DIR", "")
+ARTIFACT_PERSIST_RETENTION_HOURS = float(os.getenv("ARTIFACT_PERSIST_RETENTION_HOURS", "24"))
+ARTIFACT_PERSIST_MAX_PENDING = int(os.getenv("ARTIFACT_PERSIST_MAX_PENDING", "64"))
+ARTIFACT_DEBUG = os.getenv("ARTIFACT_DEBUG", "false").lower() in ("1", "true", "yes")
+ARTIFACT_DEBUG_TOKEN = os.getenv("ARTIFACT_DEBUG_TOKEN", "")
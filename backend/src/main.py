@@ -1,37 +1,130 @@
-import os
+import json
+import uuid
 import base64
-import requests
-from PIL import Image
+import time
+import secrets
+import asyncio
+from datetime import datetime
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response, JSONResponse
 from models import GeneratePayload, GenerateResult, FactorResult, EvaluationPayload, EvaluationResult, BannerResult
 from models import PersonaEvaluationPayload, PersonaEvaluationResponse
-from services.storage import upload_to_gcs_and_instagram
-from services.text import generate_text
-from services.evaluation import evaluate_content
-from services.persona_evaluation import evaluate_personas
-from services.banner import generate_banner
+from services.storage import close_http_client
+from services.publisher import publish_queue, upload_to_gcs_and_instagram
+from services.text import generate_text, stream_generate_text, generate_text_batch, text_cache
+from services.evaluation import evaluate_content, stream_evaluate_content, evaluation_cache
+from services.persona_evaluation import evaluate_personas, PERSONA_EVAL_MODES
+from services.banner import generate_banner, generate_banner_image, encode_image_bytes
+from services.banner_cache import banner_cache
+from services import banner_sd2
+from services.translation import get_translator
+from services.jobs import job_manager, QueueFullError
+from services.llm_gateway import llm_gateway
+from services.structured_output import structured_output, StructuredOutputError
+from services.prompts import prompt_registry
+from services.gemini import gemini_client
+from services.uploads import read_image, UploadBudget, UploadError, UPLOAD_MAX_REQUEST_BYTES
 #from services.banner import generate_banner_mock as generate_banner
+from pipeline.model_registry import registry
+from pipeline.executors import run_cpu, shutdown_executors
+from config import MODEL_WARMUP, GENERATE_BATCH_MAX_ITEMS, PUBLISH_BULK_MAX_ITEMS, ARTIFACT_DEBUG, ARTIFACT_DEBUG_TOKEN
+from telemetry import get_logger, request_scope, span, start_telemetry, shutdown_telemetry
+from metrics import metrics, http_requests_in_flight
+from artifacts import artifact_store, artifact_scope
 
 
 load_dotenv()
-app = FastAPI()
+
+logger = get_logger("main")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 로그 출력/span 내보내기 스레드는 import가 아니라 서버 시작 시에
+    start_telemetry()
+    # MODEL_WARMUP에 지정된 모델은 첫 요청 전에 미리 로드
+    if MODEL_WARMUP:
+        logger.info(f"Warm-up models: {MODEL_WARMUP}")
+        await asyncio.to_thread(registry.warmup, MODEL_WARMUP)
+    # 프롬프트 템플릿 검증 + 토크나이저 로드
+    await asyncio.to_thread(prompt_registry.validate)
+    await job_manager.start()
+    await publish_queue.start()
+    yield
+    await job_manager.stop()
+    await publish_queue.stop()
+    await close_http_client()
+    await llm_gateway.aclose()
+    await gemini_client.aclose()
+    shutdown_executors()
+    await asyncio.to_thread(artifact_store.close)
+    shutdown_telemetry()
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Artifact-Scope"],
 )
 
+# multipart 필드/경계 문자열 여유분
+UPLOAD_FORM_OVERHEAD = 1024 * 1024
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Content-Length가 요청 업로드 제한을 넘는 multipart 요청은 본문을 받기 전에 413"""
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        length = request.headers.get("content-length", "")
+        if length.isdigit() and int(length) > UPLOAD_MAX_REQUEST_BYTES + UPLOAD_FORM_OVERHEAD:
+            return JSONResponse(status_code=413, content={
+                "detail": f"요청 전체 업로드 크기가 최대 {UPLOAD_MAX_REQUEST_BYTES // (1024 * 1024)}MB를 넘었습니다."
+            })
+    return await call_next(request)
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """
+    요청마다 request id(X-Request-ID 헤더 또는 새로 생성) + 서버 span + 처리 중 요청 수.
+    중간 결과 보관 범위는 헤더와 무관하게 서버에서 새로 만든다 (로그 상관용 id와 분리).
+    """
+    http_requests_in_flight.inc()
+    try:
+        with request_scope(request.headers.get("x-request-id")) as request_id, \
+                artifact_scope(uuid.uuid4().hex) as artifact_id:
+            with span(f"{request.method} {request.url.path}", kind="server", method=request.method) as s:
+                try:
+                    response = await call_next(request)
+                    s.set("status_code", response.status_code)
+                finally:
+                    # 경로 파라미터가 들어간 URL 대신 라우트 템플릿으로 (예: /api/jobs/{job_id})
+                    # 매칭되는 라우트가 없으면 하나로 묶어서 메트릭 레이블이 늘어나지 않게 한다
+                    route = request.scope.get("route")
+                    s.set("route", route.path if route is not None else "unmatched")
+                    if route is not None:
+                        s.name = f"{request.method} {route.path}"
+    finally:
+        http_requests_in_flight.dec()
+    response.headers["X-Request-ID"] = request_id
+    if ARTIFACT_DEBUG:
+        response.headers["X-Artifact-Scope"] = artifact_id
+    return response
+
 @app.post("/api/generate", response_model=GenerateResult)
 async def generate(payload: GeneratePayload):
     try:
-        result = generate_text(payload)
+        result = await generate_text(payload)
         return result
+    except StructuredOutputError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
-        print(e)
+        logger.exception(f"캡션 생성 실패: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     # 임시 Mock 데이터
     # return GenerateResult(
@@ -47,7 +140,9 @@ async def generate(payload: GeneratePayload):
 @app.post("/api/evaluate-content", response_model=EvaluationResult)
 async def evaluate_content_api(payload: EvaluationPayload):
     try:
-        return evaluate_content(payload)
+        return await evaluate_content(payload)
+    except StructuredOutputError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     # return EvaluationResult(
@@ -71,16 +166,111 @@ async def evaluate_content_api(payload: EvaluationPayload):
     #     )
     # )
 
+def stream_response(events, request: Request, format: str | None) -> StreamingResponse:
+    """
+    이벤트(dict) 스트림을 NDJSON(기본) 또는 SSE로 전송.
+    ?format=sse 또는 Accept: text/event-stream이면 SSE.
+    """
+    use_sse = format == "sse" or "text/event-stream" in request.headers.get("accept", "")
+
+    async def body():
+        async for event in events:
+            data = json.dumps(event, ensure_ascii=False)
+            yield f"event: {event['type']}\ndata: {data}\n\n" if use_sse else f"{data}\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/api/generate/stream")
+async def generate_stream(payload: GeneratePayload, request: Request, format: str | None = Query(None)):
+    """캡션/한 줄 광고/해시태그를 완성되는 즉시 스트리밍 (기존 /api/generate는 그대로 유지)"""
+    return stream_response(stream_generate_text(payload), request, format)
+
+@app.post("/api/generate/batch")
+async def generate_batch(payloads: list[GeneratePayload], request: Request, format: str | None = Query(None)):
+    """
+    여러 GeneratePayload를 동시에 생성하고 끝나는 순서대로 스트리밍 (item/error 이벤트에 원래 index 포함).
+    마지막 summary 이벤트에 항목별 지연 시간과 처리량.
+    """
+    if not payloads:
+        raise HTTPException(status_code=400, detail="생성할 항목이 없습니다.")
+    if len(payloads) > GENERATE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"한 번에 최대 {GENERATE_BATCH_MAX_ITEMS}개까지 생성할 수 있습니다.")
+    return stream_response(generate_text_batch(payloads), request, format)
+
+@app.post("/api/evaluate-content/stream")
+async def evaluate_content_stream(payload: EvaluationPayload, request: Request, format: str | None = Query(None)):
+    return stream_response(stream_evaluate_content(payload), request, format)
+
 @app.post("/api/evaluate-personas", response_model=PersonaEvaluationResponse)
-async def evaluate_personas_api(payload: PersonaEvaluationPayload):
+async def evaluate_personas_api(payload: PersonaEvaluationPayload, mode: str | None = Query(None)):
+    """mode: sharded(페르소나별 병렬 평가, 부분 결과 허용) | single(한 번에 평가). 기본값은 PERSONA_EVAL_MODE"""
+    if mode is not None and mode not in PERSONA_EVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 mode입니다: {mode}")
     try:
-        return evaluate_personas(payload)
+        return await evaluate_personas(payload, mode)
+    except StructuredOutputError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# 바이너리 응답 형식 (format 쿼리 또는 Accept 헤더로 선택)
+IMAGE_FORMATS = {"png": "png", "webp": "webp", "jpeg": "jpeg", "jpg": "jpeg"}
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def negotiate_banner_format(format: str | None, accept: str | None) -> str:
+    """
+    'base64' | 'png' | 'webp' | 'jpeg' 중 하나 반환.
+    명시적으로 이미지 형식을 요청하지 않으면 기존 base64 JSON 응답을 유지한다.
+    """
+    if format:
+        fmt = format.lower()
+        if fmt == "base64" or fmt == "json":
+            return "base64"
+        if fmt not in IMAGE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"지원하지 않는 format입니다: {format}")
+        return IMAGE_FORMATS[fmt]
+
+    for media in (accept or "").split(","):
+        media = media.split(";")[0].strip().lower()
+        if media == "application/json":
+            return "base64"
+        if media.startswith("image/") and media[6:] in IMAGE_FORMATS:
+            return IMAGE_FORMATS[media[6:]]
+    return "base64"
+
+
+async def read_banner_uploads(
+    file_product: UploadFile,
+    file_person: UploadFile | None,
+    file_background: UploadFile | None,
+) -> tuple[bytes, bytes | None, bytes | None]:
+    """배너 입력 이미지 3개를 요청 단위 크기 제한 안에서 읽기 (제한 초과/이미지 아님 → 413/415)"""
+    budget = UploadBudget()
+    try:
+        product = await read_image(file_product, budget)
+        person = await read_image(file_person, budget) if file_person else None
+        background = await read_image(file_background, budget) if file_background else None
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return product.data, person.data if person else None, background.data if background else None
+
+
+def stream_bytes(data: bytes):
+    # 복사 없이 memoryview 조각으로 전송
+    view = memoryview(data)
+    for i in range(0, len(view), STREAM_CHUNK_SIZE):
+        yield view[i:i + STREAM_CHUNK_SIZE]
+
+
 @app.post("/api/generate-banner", response_model=BannerResult)
 async def generate_banner_api(
+    request: Request,
     file_product: UploadFile = File(...),
     file_person: UploadFile | None = File(None),
     file_background: UploadFile | None = File(None),
@@ -88,15 +278,17 @@ async def generate_banner_api(
     text_overlay: str = Form(""),
     overlay_position: str = Form("auto"),
     overlay_description: str = Form(""),
+    force_regenerate: bool = Form(False),
+    format: str | None = Query(None, description="base64(기본) | png | webp | jpeg"),
 ):
+    output_format = negotiate_banner_format(format, request.headers.get("accept"))
+    product_bytes, person_bytes, background_bytes = await read_banner_uploads(
+        file_product, file_person, file_background
+    )
     try:
-        print("Generate banner..")
-
-        product_bytes = await file_product.read()
-        person_bytes = await file_person.read() if file_person else None
-        background_bytes = await file_background.read() if file_background else None
+        logger.info("Generate banner..")
 
-        b64 = generate_banner(
+        img_bytes, mime_type = await generate_banner_image(
             product_bytes=product_bytes,
             person_bytes=person_bytes,
             background_bytes=background_bytes,
@@ -104,20 +296,292 @@ async def generate_banner_api(
             text_overlay=text_overlay,
             overlay_position=overlay_position,
             overlay_description=overlay_description,
+            force_regenerate=force_regenerate,
+        )
+
+        # base64(JSON)는 프론트엔드가 data:image/png로 표시하므로 PNG로 맞춘다
+        target_format = "png" if output_format == "base64" else output_format
+        with span("image.encode", format=target_format):
+            img_bytes, mime_type = await run_cpu(encode_image_bytes, img_bytes, mime_type, target_format)
+        if output_format == "base64":
+            return BannerResult(image_base64=base64.b64encode(img_bytes).decode("utf-8"))
+
+        # 이미지 바이트를 그대로 스트리밍 (base64/JSON 변환 없음)
+        return StreamingResponse(
+            stream_bytes(img_bytes),
+            media_type=mime_type,
+            headers={"Content-Length": str(len(img_bytes)), "Vary": "Accept"},
         )
-        return BannerResult(image_base64=b64)
     except Exception as e:
-        print(e)
+        logger.exception(f"배너 생성 실패: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/jobs/banner", status_code=202)
+async def submit_banner_job(
+    file_product: UploadFile = File(...),
+    file_person: UploadFile | None = File(None),
+    file_background: UploadFile | None = File(None),
+    background_prompt: str = Form(""),
+    text_overlay: str = Form(""),
+    overlay_position: str = Form("auto"),
+    overlay_description: str = Form(""),
+    force_regenerate: bool = Form(False),
+    pipeline: str = Form("gemini"),
+    menu: str = Form(""),
+    context: str = Form(""),
+    tone: str = Form(""),
+    channel: str = Form(""),
+    required_words: str = Form(""),
+    banned_words: str = Form(""),
+):
+    """
+    배너 생성 작업 제출 → job id 반환 (결과는 polling 또는 SSE로 확인)
+    - pipeline="gemini"(기본): Gemini 이미지 API (진행 단계: prompt → gemini → encode)
+    - pipeline="sd2": 로컬 SD2 파이프라인, 제품 이미지 + menu/context/tone/channel 사용
+      (진행 단계: background_removal → padding → mask → inpaint → composite → text → upscale → encode)
+    """
+    if pipeline not in ("gemini", "sd2"):
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 pipeline입니다: {pipeline}")
+    product_bytes, person_bytes, background_bytes = await read_banner_uploads(
+        file_product, file_person, file_background
+    )
+
+    async def run_sd2(progress):
+        b64 = await banner_sd2.generate_banner(
+            product_bytes, menu, context, tone, channel, required_words, banned_words,
+            text_overlay, progress=progress,
+        )
+        return BannerResult(image_base64=b64).model_dump()
+
+    async def run(progress):
+        b64 = await generate_banner(
+            product_bytes=product_bytes,
+            person_bytes=person_bytes,
+            background_bytes=background_bytes,
+            background_prompt=background_prompt,
+            text_overlay=text_overlay,
+            overlay_position=overlay_position,
+            overlay_description=overlay_description,
+            force_regenerate=force_regenerate,
+            progress=progress,
+        )
+        return BannerResult(image_base64=b64).model_dump()
+
+    try:
+        job = job_manager.submit("banner", run_sd2 if pipeline == "sd2" else run)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "10"})
+    return job.to_dict()
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return job.to_dict()
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events로 진행 상황 전달 (마지막 이벤트는 succeeded/failed/cancelled)"""
+    if job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+
+    async def event_stream():
+        async for event in job_manager.subscribe(job_id):
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    if job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return {"cancelled": job_manager.cancel(job_id)}
+
+@app.get("/api/jobs")
+async def jobs_status():
+    return job_manager.stats()
+
 @app.post("/api/upload-instagram")
 async def upload_instagram(
     caption: str = Form(...),
     file: UploadFile = File(...),
 ):
     try:
-        file_bytes = await file.read()
-        result = upload_to_gcs_and_instagram(file_bytes, file.filename, caption)
-        return result
+        upload = await read_image(file)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    try:
+        result = await upload_to_gcs_and_instagram(upload.data, upload.filename, caption)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if result.get("pending"):
+        # 대기열에서 계속 재시도 중 → 다시 올리지 말고 /api/instagram/posts/{post_id}로 확인
+        return JSONResponse(status_code=202, content=result)
+    return result
+
+def parse_schedule(value: str) -> float | None:
+    """scheduled_at 폼 값: 비어 있으면 바로, unix time(초) 또는 ISO 8601 (시간대가 없으면 서버 로컬 시간)"""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"scheduled_at 형식이 올바르지 않습니다: {value}")
+
+@app.post("/api/instagram/posts", status_code=202)
+async def submit_instagram_post(
+    caption: str = Form(...),
+    file: UploadFile = File(...),
+    scheduled_at: str = Form(""),
+):
+    """게시 대기열에 추가 → post id 반환 (scheduled_at 이후 게시, 결과는 GET /api/instagram/posts/{post_id})"""
+    when = parse_schedule(scheduled_at)
+    try:
+        upload = await read_image(file)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    try:
+        post = await publish_queue.submit(upload.data, upload.filename, caption, scheduled_at=when)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return post.to_dict()
+
+@app.post("/api/instagram/posts/bulk", status_code=202)
+async def submit_instagram_posts(
+    files: list[UploadFile] = File(...),
+    captions: list[str] = Form(...),
+    scheduled_at: str = Form(""),
+    interval_minutes: float = Form(0.0),
+):
+    """
+    여러 게시물을 한 번에 대기열에 추가 (files[i] ↔ captions[i]).
+    scheduled_at부터 interval_minutes 간격으로 예약 (0이면 모두 같은 시간).
+    """
+    if len(files) != len(captions):
+        raise HTTPException(status_code=400, detail="files와 captions 개수가 다릅니다.")
+    if len(files) > PUBLISH_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"한 번에 최대 {PUBLISH_BULK_MAX_ITEMS}개까지 예약할 수 있습니다.")
+    start = parse_schedule(scheduled_at)
+    budget = UploadBudget()
+    try:
+        uploads = [await read_image(file, budget) for file in files]
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    def schedule(i: int) -> float | None:
+        if start is None and interval_minutes <= 0:
+            return None
+        return (start or time.time()) + i * interval_minutes * 60
+
+    # JPEG 준비를 동시에 (여러 장이면 프로세스 풀에서 병렬 인코딩)
+    results = await asyncio.gather(*(
+        publish_queue.submit(upload.data, upload.filename, caption, scheduled_at=schedule(i))
+        for i, (upload, caption) in enumerate(zip(uploads, captions))
+    ), return_exceptions=True)
+    failed = [(upload.filename, r) for upload, r in zip(uploads, results) if isinstance(r, BaseException)]
+    if failed:
+        # 일부만 들어간 경우 넣은 게시물은 취소하고 전체 실패로
+        await asyncio.gather(*(publish_queue.cancel(r.id) for r in results if not isinstance(r, BaseException)))
+        filename, error = failed[0]
+        raise HTTPException(status_code=500, detail=f"{filename}: {error}")
+    return {"posts": [post.to_dict() for post in results]}
+
+@app.get("/api/instagram/posts")
+async def list_instagram_posts(status: str | None = Query(None), limit: int = Query(50, ge=1, le=500)):
+    posts = await publish_queue.recent(status, limit)
+    return {**(await asyncio.to_thread(publish_queue.stats)), "recent": [post.to_dict() for post in posts]}
+
+@app.get("/api/instagram/posts/{post_id}")
+async def get_instagram_post(post_id: str):
+    post = await publish_queue.get(post_id)
+    if post is None:
+        raise HTTPException(status_code=404, detail="게시물을 찾을 수 없습니다.")
+    return post.to_dict()
+
+@app.delete("/api/instagram/posts/{post_id}")
+async def cancel_instagram_post(post_id: str):
+    """컨테이너를 만들기 전이고 처리 중이 아닌 게시물만 취소"""
+    if await publish_queue.get(post_id) is None:
+        raise HTTPException(status_code=404, detail="게시물을 찾을 수 없습니다.")
+    return {"cancelled": await publish_queue.cancel(post_id)}
+
+def check_artifact_access(request: Request) -> None:
+    """중간 결과 조회는 디버그용: ARTIFACT_DEBUG가 아니면 404, 토큰을 지정했으면 X-Debug-Token 확인"""
+    if not ARTIFACT_DEBUG:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if ARTIFACT_DEBUG_TOKEN and not secrets.compare_digest(
+        request.headers.get("x-debug-token", ""), ARTIFACT_DEBUG_TOKEN
+    ):
+        raise HTTPException(status_code=403, detail="디버그 토큰이 올바르지 않습니다.")
+
+@app.get("/api/artifacts")
+async def artifacts_status(request: Request):
+    check_artifact_access(request)
+    return artifact_store.stats()
+
+@app.get("/api/artifacts/{scope_id}")
+async def list_artifacts(scope_id: str, request: Request):
+    """요청/작업의 중간 결과 목록 (scope_id: 배너 작업이면 job id, 아니면 응답의 X-Artifact-Scope)"""
+    check_artifact_access(request)
+    artifacts = artifact_store.list_artifacts(scope_id)
+    if artifacts is None:
+        raise HTTPException(status_code=404, detail="보관된 결과가 없습니다.")
+    return {"scope_id": scope_id, "artifacts": [a.to_dict() for a in artifacts]}
+
+@app.get("/api/artifacts/{scope_id}/{name}")
+async def get_artifact(scope_id: str, name: str, request: Request):
+    check_artifact_access(request)
+    artifact = artifact_store.get(scope_id, name)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="보관된 결과가 없습니다.")
+    # PIL 이미지는 조회할 때만 PNG로 인코딩
+    data = await run_cpu(artifact.encode)
+    return Response(data, media_type=artifact.mime_type)
+
+@app.get("/api/models")
+async def models_status():
+    return registry.status()
+
+@app.get("/api/cache/banner")
+async def banner_cache_status():
+    return banner_cache.stats()
+
+@app.get("/api/cache/translation")
+async def translation_cache_status():
+    return get_translator().stats()
+
+@app.get("/api/llm")
+async def llm_status():
+    return {**llm_gateway.stats(), "structured_output": structured_output.stats()}
+
+@app.get("/api/gemini")
+async def gemini_status():
+    """Gemini 이미지 호출 수/재시도/지연 시간, 입력 정규화 전후 업로드 크기"""
+    return gemini_client.stats()
+
+@app.get("/api/prompts")
+async def prompts_status():
+    """템플릿별 버전, 렌더링 시간, 토큰 수 (프롬프트 크기 추적용)"""
+    return prompt_registry.stats()
+
+@app.get("/metrics")
+async def metrics_endpoint(request: Request, format: str | None = Query(None)):
+    """
+    Prometheus 텍스트 형식 (라우트/파이프라인 단계별 지연 히스토그램, 오류/재시도/캐시 카운터,
+    작업·메모리 게이지, 모델 로드 시간). ?format=json 또는 Accept: application/json이면 같은 데이터를 JSON으로.
+    """
+    if format == "json" or "application/json" in request.headers.get("accept", ""):
+        return await asyncio.to_thread(metrics.to_dict)
+    body = await asyncio.to_thread(metrics.to_prometheus)
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/cache/responses")
+async def response_cache_status():
+    return {"generate": text_cache.stats(), "evaluate": evaluation_cache.stats()}
@@ -0,0 +1,410 @@
+# metrics.py
+import os
+import sys
+import bisect
+import resource
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+from telemetry import Span, add_span_listener, get_logger
+from pipeline.model_registry import registry
+from services.jobs import job_manager
+from services.llm_gateway import llm_gateway
+from services.structured_output import structured_output
+from services.banner_cache import banner_cache
+from services.gemini import gemini_client
+from services.publisher import publish_queue
+from artifacts import artifact_store
+from services.translation import current_translator
+from services.text import text_cache
+from services.evaluation import evaluation_cache
+
+logger = get_logger("metrics")
+
+# 초 단위 버킷: LLM/번역(수백 ms)부터 인페인팅·모델 로드(수십 초~분)까지
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+@dataclass
+class MetricFamily:
+    """수집 결과 한 묶음 (Prometheus의 # HELP / # TYPE 단위)"""
+    name: str
+    type: str                                      # counter | gauge | histogram
+    help: str
+    samples: list[tuple[str, dict, float]] = field(default_factory=list)  # (이름 접미사, 레이블, 값)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _labels(self, key: tuple) -> dict:
+        return dict(zip(self.labelnames, key))
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            samples = [("", self._labels(k), v) for k, v in self._values.items()]
+        return MetricFamily(self.name, self.type, self.help, samples)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            samples = [("", self._labels(k), v) for k, v in self._values.items()]
+        return MetricFamily(self.name, self.type, self.help, samples)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [버킷별 개수 (+Inf 포함), 합계, 개수]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def collect(self) -> MetricFamily:
+        family = MetricFamily(self.name, self.type, self.help)
+        with self._lock:
+            items = [(k, list(s[0]), s[1], s[2]) for k, s in self._values.items()]
+        for key, counts, total, count in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                family.samples.append(("_bucket", {**labels, "le": _format_bound(bound)}, cumulative))
+            family.samples.append(("_sum", labels, total))
+            family.samples.append(("_count", labels, count))
+        return family
+
+
+class MetricsRegistry:
+    """
+    의존성 없는 메트릭 레지스트리.
+    - 직접 갱신하는 Counter / Gauge / Histogram
+    - 수집 시점에 기존 stats()에서 값을 읽어오는 collector 함수
+    Prometheus 텍스트 형식과 JSON 두 가지로 내보낸다.
+    """
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], Iterable[MetricFamily]]] = []
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        self._collectors.append(collector)
+
+    def collect(self) -> list[MetricFamily]:
+        families = [m.collect() for m in self._metrics]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logger.warning(f"메트릭 수집 실패 ({getattr(collector, '__name__', collector)}): {e}")
+        return families
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format 0.0.4"""
+        lines = []
+        for f in self.collect():
+            lines.append(f"# HELP {f.name} {f.help}")
+            lines.append(f"# TYPE {f.name} {f.type}")
+            for suffix, labels, value in f.samples:
+                lines.append(f"{f.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        """Prometheus 없이 확인할 때 쓰는 같은 데이터의 JSON 형태"""
+        result = {}
+        for f in self.collect():
+            if f.type == "histogram":
+                series: dict[tuple, dict] = {}
+                for suffix, labels, value in f.samples:
+                    base = {k: v for k, v in labels.items() if k != "le"}
+                    s = series.setdefault(tuple(sorted(base.items())),
+                                          {"labels": base, "buckets": {}, "sum": 0.0, "count": 0})
+                    if suffix == "_bucket":
+                        s["buckets"][labels["le"]] = value
+                    else:
+                        s[suffix[1:]] = value
+                for s in series.values():
+                    s["avg"] = s["sum"] / s["count"] if s["count"] else 0.0
+                samples = list(series.values())
+            else:
+                samples = [{"labels": labels, "value": value} for _, labels, value in f.samples]
+            result[f.name] = {"type": f.type, "help": f.help, "samples": samples}
+        return result
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+# 전역 레지스트리
+metrics = MetricsRegistry()
+
+http_requests_in_flight = metrics.gauge(
+    "http_requests_in_flight", "처리 중인 HTTP 요청 수")
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "라우트별 HTTP 요청 처리 시간 (스트리밍 응답은 헤더 전송까지)",
+    ("method", "route", "status"))
+stage_duration = metrics.histogram(
+    "pipeline_stage_duration_seconds", "배너 파이프라인 단계별 소요 시간", ("pipeline", "stage"))
+span_duration = metrics.histogram(
+    "span_duration_seconds", "외부 호출/모델 실행 span 소요 시간 (llm.call, translation, sam.segment 등)",
+    ("span",))
+model_load_duration = metrics.histogram(
+    "model_load_duration_seconds", "모델 로드 소요 시간", ("model",),
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0, 600.0))
+span_errors = metrics.counter(
+    "span_errors_total", "예외로 끝난 span 수", ("span",))
+span_cache = metrics.counter(
+    "span_cache_requests_total", "span 단위로 기록되는 캐시 조회 (SAM 임베딩 캐시)", ("cache", "result"))
+
+
+def _observe_span(s: Span) -> None:
+    """telemetry span 종료 시 호출: 종류에 따라 알맞은 히스토그램에 기록"""
+    seconds = s.duration_seconds
+    if s.error:
+        span_errors.inc(span=s.name)
+    if s.kind == "server":
+        http_request_duration.observe(seconds, method=s.attributes.get("method", ""),
+                                      route=s.attributes.get("route", ""),
+                                      status=s.attributes.get("status_code", "error" if s.error else ""))
+    elif "stage" in s.attributes:
+        stage_duration.observe(seconds, pipeline=s.attributes.get("pipeline", ""), stage=s.attributes["stage"])
+    elif s.name == "model.load":
+        model_load_duration.observe(seconds, model=s.attributes.get("model", ""))
+    else:
+        span_duration.observe(seconds, span=s.name)
+    if "embedding_cached" in s.attributes:
+        span_cache.inc(cache="sam_embedding", result="hit" if s.attributes["embedding_cached"] else "miss")
+
+
+add_span_listener(_observe_span)
+
+
+# ---- 수집 시점 collector (기존 stats()를 그대로 읽음) ----
+
+def _collect_process() -> Iterable[MetricFamily]:
+    rss = MetricFamily("process_resident_memory_bytes", "gauge", "프로세스 RSS")
+    try:
+        with open("/proc/self/statm") as f:
+            rss.samples.append(("", {}, int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")))
+    except (OSError, ValueError, IndexError):
+        pass
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss: Linux는 KB, macOS는 bytes
+    max_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    yield rss
+    yield MetricFamily("process_max_resident_memory_bytes", "gauge", "프로세스 최대 RSS", [("", {}, max_rss)])
+    yield MetricFamily("process_cpu_seconds_total", "counter", "사용한 CPU 시간 (user + system)",
+                       [("", {}, usage.ru_utime + usage.ru_stime)])
+    yield MetricFamily("process_threads", "gauge", "Python 스레드 수", [("", {}, threading.active_count())])
+
+
+def _collect_gpu() -> Iterable[MetricFamily]:
+    # torch를 새로 import하지 않는다 (GPU 모델을 한 번도 안 쓴 프로세스에서는 비어 있음)
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_available():
+        return
+    allocated = MetricFamily("gpu_memory_allocated_bytes", "gauge", "torch가 할당한 GPU 메모리")
+    reserved = MetricFamily("gpu_memory_reserved_bytes", "gauge", "torch 캐싱 할당자가 잡아둔 GPU 메모리")
+    peak = MetricFamily("gpu_memory_max_allocated_bytes", "gauge", "프로세스 시작 이후 최대 GPU 할당량")
+    for i in range(torch.cuda.device_count()):
+        labels = {"device": str(i)}
+        allocated.samples.append(("", labels, torch.cuda.memory_allocated(i)))
+        reserved.samples.append(("", labels, torch.cuda.memory_reserved(i)))
+        peak.samples.append(("", labels, torch.cuda.max_memory_allocated(i)))
+    yield from (allocated, reserved, peak)
+
+
+def _collect_models() -> Iterable[MetricFamily]:
+    status = registry.status()
+    resident = MetricFamily("model_resident", "gauge", "모델 상주 여부 (1=메모리에 있음)")
+    in_use = MetricFamily("model_in_use", "gauge", "모델을 사용 중인 작업 수")
+    loads = MetricFamily("model_loads_total", "counter", "모델 로드 횟수 (eviction 후 재로드 포함)")
+    for m in status["models"]:
+        labels = {"model": m["name"]}
+        resident.samples.append(("", labels, int(m["resident"])))
+        in_use.samples.append(("", labels, m["in_use"]))
+        loads.samples.append(("", labels, m["load_count"]))
+    yield from (resident, in_use, loads)
+    yield MetricFamily("model_resident_gb", "gauge", "상주 모델 크기 합계 (등록 시 추정값 기준)",
+                       [("", {}, status["resident_gb"])])
+
+
+def _collect_jobs() -> Iterable[MetricFamily]:
+    stats = job_manager.stats()
+    jobs = stats["jobs"]
+    yield MetricFamily("jobs_in_flight", "gauge", "대기/실행 중인 배너 작업 수", [
+        ("", {"status": "queued"}, jobs.get("queued", 0)),
+        ("", {"status": "running"}, jobs.get("running", 0)),
+    ])
+    yield MetricFamily("jobs_queue_depth", "gauge", "작업 대기열 길이", [("", {}, stats["queue_depth"])])
+    yield MetricFamily("jobs_workers", "gauge", "작업 워커 수", [("", {}, stats["workers"])])
+
+
+def _collect_llm() -> Iterable[MetricFamily]:
+    models = llm_gateway.stats()["models"]
+    for key, help in (("calls", "LLM 호출 시도 수 (재시도 포함)"), ("retries", "LLM 재시도 수"),
+                      ("timeouts", "LLM 호출 시간 초과 수"), ("errors", "재시도 후에도 실패한 LLM 호출 수")):
+        yield MetricFamily(f"llm_{key}_total", "counter", help,
+                           [("", {"model": model}, s[key]) for model, s in models.items()])
+
+    outcomes = MetricFamily("llm_structured_output_total", "counter",
+                            "구조화 출력 해석 결과 (direct/extracted/repaired/failed)")
+    repairs = MetricFamily("llm_structured_repair_calls_total", "counter", "형식 교정 호출 수")
+    for schema, s in structured_output.stats()["schemas"].items():
+        for outcome in ("direct", "extracted", "repaired", "failed"):
+            outcomes.samples.append(("", {"schema": schema, "outcome": outcome}, s[outcome]))
+        repairs.samples.append(("", {"schema": schema}, s["repair_calls"]))
+    yield from (outcomes, repairs)
+
+
+def _collect_gemini() -> Iterable[MetricFamily]:
+    s = gemini_client.stats()
+    labels = {"model": s["model"]}
+    for key, help in (("calls", "Gemini 이미지 호출 시도 수 (재시도 포함)"), ("retries", "Gemini 재시도 수"),
+                      ("timeouts", "Gemini 호출 시간 초과 수"), ("errors", "재시도 후에도 실패한 Gemini 호출 수")):
+        yield MetricFamily(f"gemini_{key}_total", "counter", help, [("", labels, s[key])])
+    yield MetricFamily("gemini_input_bytes_total", "counter", "정규화 전 입력 이미지 크기 합계",
+                       [("", labels, s["input_bytes"])])
+    yield MetricFamily("gemini_upload_bytes_total", "counter", "실제 업로드한 입력 이미지 크기 합계",
+                       [("", labels, s["upload_bytes"])])
+
+
+def _collect_publish() -> Iterable[MetricFamily]:
+    stats = publish_queue.stats()
+    yield MetricFamily("instagram_posts", "gauge", "게시 대기열의 상태별 게시물 수", [
+        ("", {"status": status}, count) for status, count in sorted(stats["posts"].items())
+    ])
+    yield MetricFamily("instagram_posts_active", "gauge", "처리 중인 게시물 수", [("", {}, stats["active"])])
+    media = stats["media"]
+    yield MetricFamily("instagram_media_prepared_total", "counter", "게시용 JPEG 준비 수 (reencoded: 재인코딩 여부)", [
+        ("", {"reencoded": "true"}, media["reencoded"]),
+        ("", {"reencoded": "false"}, media["prepared"] - media["reencoded"]),
+    ])
+    yield MetricFamily("instagram_media_bytes_total", "counter", "게시용 JPEG 준비 전후 크기 합계", [
+        ("", {"stage": "input"}, media["input_bytes"]),
+        ("", {"stage": "output"}, media["output_bytes"]),
+    ])
+
+
+def _collect_artifacts() -> Iterable[MetricFamily]:
+    s = artifact_store.stats()
+    yield MetricFamily("artifact_store_bytes", "gauge", "메모리에 보관 중인 중간 결과 크기 (디코딩된 픽셀 기준)",
+                       [("", {}, s["bytes"])])
+    yield MetricFamily("artifact_store_scopes", "gauge", "중간 결과를 보관 중인 요청/작업 수", [("", {}, s["scopes"])])
+    yield MetricFamily("artifact_persist_total", "counter", "중간 결과 디스크 저장 수", [
+        ("", {"result": "persisted"}, s["persisted"]),
+        ("", {"result": "dropped"}, s["persist_dropped"]),
+        ("", {"result": "error"}, s["persist_errors"]),
+    ])
+
+
+def _collect_caches() -> Iterable[MetricFamily]:
+    family = MetricFamily("cache_requests_total", "counter",
+                          "캐시 조회 수 (hit/miss, fill: 키는 있지만 variant를 더 모으려고 새로 생성, "
+                          "coalesced: 같은 키를 생성 중인 요청의 결과를 같이 받음)")
+    family.samples += [
+        ("", {"cache": "banner", "result": "hit"}, banner_cache.hits),
+        ("", {"cache": "banner", "result": "miss"}, banner_cache.misses),
+    ]
+    # 스크레이프가 번역 백엔드를 만들지 않도록, 이미 쓰인 경우에만
+    translator = current_translator()
+    if translator is not None:
+        translation = translator.stats()
+        family.samples += [
+            ("", {"cache": "translation", "result": "hit"}, translation["hits"]),
+            ("", {"cache": "translation", "result": "miss"}, translation["misses"]),
+        ]
+    for cache in (text_cache, evaluation_cache):
+        c = cache.counters
+        family.samples += [
+            ("", {"cache": cache.name, "result": "hit"}, c["exact_hits"] + c["similar_hits"]),
+            ("", {"cache": cache.name, "result": "miss"}, c["misses"]),
+            ("", {"cache": cache.name, "result": "fill"}, c["fills"]),
+            ("", {"cache": cache.name, "result": "coalesced"}, c["coalesced"]),
+        ]
+    yield family
+
+
+for _collector in (_collect_process, _collect_gpu, _collect_models, _collect_jobs, _collect_llm, _collect_gemini,
+                   _collect_publish, _collect_artifacts, _collect_caches):
+    metrics.add_collector(_collector)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 class GeneratePayload(BaseModel):
@@ -54,11 +54,15 @@ class PersonaEvaluationResult(BaseModel):
     breakdown: dict[str, PersonaBreakdownItem]
 
 class PersonaEvaluationPayload(BaseModel):
-    selectedPersonas: list[Persona]
+    selectedPersonas: list[Persona] = Field(min_length=1)  # 비어 있으면 422
     caption: str
     one_liner: str
     hashtags: list[str]
 
+class PersonaEvaluationShard(BaseModel):
+    results: list[PersonaEvaluationResult]
+    notes: list[str] = []
+
 class PersonaEvaluationResponse(BaseModel):
     results: list[PersonaEvaluationResult]
     summary: dict
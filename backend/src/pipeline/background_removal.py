@@ -2,107 +2,168 @@
 import io
 import numpy as np
 from PIL import Image
-from rembg import remove
-from segment_anything import sam_model_registry, SamPredictor
-import torch
-import os
-import cv2
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
 
-def remove_background(file_bytes, method="rembg", save_original_path="temp/original.png"):
-    """
-    배경 제거 후 RGBA 이미지 반환.
-    - rembg: U2Net 기반, 빠르고 간단
-    - sam: SAM 기반, 오브젝트 중심 마스크 추출
-    - sam 방식일 경우 오브젝트만 따로 떼어낸 이미지를 save_original_path에 저장
-    """
-    if method == "rembg":
-        product_rgba = Image.open(io.BytesIO(remove(file_bytes))).convert("RGBA")
-        # 저장
-        os.makedirs(os.path.dirname(save_original_path), exist_ok=True)
-        product_rgba.save(save_original_path)
-        return product_rgba
+from config import SAM_CHECKPOINT, SAM_EMBEDDING_CACHE_SIZE
+from pipeline.model_registry import registry
+from pipeline.image_ops import apply_mask, invert_mask
+from artifacts import artifact_store
+from telemetry import span
 
-    elif method == "sam":
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        sam = sam_model_registry["vit_h"](checkpoint="weights/sam_vit_h_4b8939.pth")
-        sam.to(device=device)
-        predictor = SamPredictor(sam)
+# torch, segment_anything, rembg는 무거우므로 실제로 사용할 때 import
 
-        image = Image.open(io.BytesIO(file_bytes)).convert("RGB")
-        np_img = np.array(image)
-        predictor.set_image(np_img)
+# SamPredictor는 set_image 상태를 내부에 들고 있으므로 동시에 한 요청만 사용
+_sam_lock = threading.Lock()
 
-        h, w, _ = np_img.shape
-        input_point = np.array([[w // 2, h // 2]])
-        input_label = np.array([1])
+# 이미지 내용 해시 → SAM 이미지 임베딩 (LRU)
+_embedding_cache: "OrderedDict[str, dict]" = OrderedDict()
+_embedding_lock = threading.Lock()
 
-        masks, _, _ = predictor.predict(
-            point_coords=input_point,
-            point_labels=input_label,
-            multimask_output=False,
-        )
 
-        mask = masks[0].astype(np.uint8) * 255
+@dataclass
+class SegmentationResult:
+    cutout: Image.Image        # 배경이 제거된 RGBA 오브젝트
+    raw_mask: np.ndarray       # 오브젝트=True (H, W) bool
+    inpaint_mask: Image.Image  # 인페인팅용 L 마스크 (배경=255, 오브젝트=0)
+    image_hash: str
+    embedding_cached: bool
+
 
-        # RGBA 변환
-        rgba = cv2.cvtColor(np_img, cv2.COLOR_RGB2RGBA)
+def load_sam_predictor():
+    """SAM ViT-H 체크포인트 로드 (model_registry에서 한 번만 호출)"""
+    import torch
+    from segment_anything import sam_model_registry, SamPredictor
 
-        # 알파 채널 적용
-        rgba[:, :, 3] = mask
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    sam = sam_model_registry["vit_h"](checkpoint=SAM_CHECKPOINT)
+    sam.to(device=device)
+    return SamPredictor(sam)
 
-        # 배경 제거: RGB 채널에도 마스크 곱하기
-        rgba[:, :, 0] = rgba[:, :, 0] * (mask // 255)
-        rgba[:, :, 1] = rgba[:, :, 1] * (mask // 255)
-        rgba[:, :, 2] = rgba[:, :, 2] * (mask // 255)
 
-        product_rgba = Image.fromarray(rgba)
+def load_rembg_session():
+    """rembg U2Net 세션 (model_registry에서 한 번만 호출)"""
+    from rembg import new_session
+    return new_session("u2net")
 
-        # 오브젝트만 따로 저장
-        os.makedirs(os.path.dirname(save_original_path), exist_ok=True)
-        product_rgba.save(save_original_path)
 
+def remove_background(file_bytes, method="rembg", keep_artifacts=True):
+    """
+    배경 제거 후 RGBA 이미지 반환.
+    - rembg: U2Net 기반, 빠르고 간단
+    - sam: SAM 기반, 오브젝트 중심 마스크 추출
+    - keep_artifacts=True면 오브젝트만 떼어낸 이미지를 artifact_store에 "original"로 보관
+    """
+    if method == "rembg":
+        from rembg import remove
+        with registry.use("rembg") as session:
+            product_rgba = Image.open(io.BytesIO(remove(file_bytes, session=session))).convert("RGBA")
+        if keep_artifacts:
+            artifact_store.put("original", product_rgba, copy=True)
         return product_rgba
 
+    elif method == "sam":
+        result = segment_with_sam(file_bytes, keep_artifacts=keep_artifacts)
+        return result.cutout
+
     else:
         raise ValueError("지원하지 않는 방식입니다. 'rembg' 또는 'sam'을 선택하세요.")
 
 
-def get_sam_mask(file_bytes, invert=True, save_path="temp/mask.png"):
+def get_sam_mask(file_bytes, invert=True, keep_artifacts=True):
     """
     SAM 마스크만 추출해서 반환.
     - 기본: 오브젝트 영역이 1(True)
     - 인페인팅용으로 쓰려면 invert=True로 반전 (배경=255, 오브젝트=0)
-    - 생성된 마스크 이미지를 save_path에 저장
+    - keep_artifacts=True면 마스크 이미지를 artifact_store에 "mask"로 보관
     """
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    sam = sam_model_registry["vit_h"](checkpoint="weights/sam_vit_h_4b8939.pth")
-    sam.to(device=device)
-    predictor = SamPredictor(sam)
+    result = segment_with_sam(file_bytes)
+    if invert:
+        mask_img = result.inpaint_mask
+    else:
+        mask_img = Image.fromarray(np.multiply(result.raw_mask.view(np.uint8), 255, dtype=np.uint8))
 
+    if keep_artifacts:
+        artifact_store.put("mask", mask_img)
+
+    return mask_img
+
+
+def segment_with_sam(file_bytes, keep_artifacts=False) -> SegmentationResult:
+    """
+    SAM 인코더를 한 번만 돌려서 컷아웃과 마스크를 함께 만든다.
+    - 같은 이미지(내용 해시 기준)는 캐시된 임베딩을 재사용해 인코더를 건너뜀
+    - cutout: 배경이 제거된 RGBA, raw_mask: 오브젝트=True, inpaint_mask: 배경=255/오브젝트=0
+    - keep_artifacts=True면 cutout/inpaint_mask를 artifact_store에 "original"/"mask"로 보관
+    """
     image = Image.open(io.BytesIO(file_bytes)).convert("RGB")
     np_img = np.array(image)
-    predictor.set_image(np_img)
+    image_hash = hashlib.sha256(file_bytes).hexdigest()
 
     h, w, _ = np_img.shape
     input_point = np.array([[w // 2, h // 2]])
     input_label = np.array([1])
 
-    masks, _, _ = predictor.predict(
-        point_coords=input_point,
-        point_labels=input_label,
-        multimask_output=False,
-    )
+    with span("sam.segment", width=w, height=h) as s, registry.use("sam") as predictor, _sam_lock:
+        embedding_cached = _restore_embedding(predictor, image_hash)
+        s.set("embedding_cached", embedding_cached)
+        if not embedding_cached:
+            predictor.set_image(np_img)
+            _store_embedding(predictor, image_hash)
 
-    raw_mask = masks[0]
-    if invert:
-        inpaint_mask = (~raw_mask.astype(bool)).astype(np.uint8) * 255
-    else:
-        inpaint_mask = raw_mask.astype(np.uint8) * 255
+        masks, _, _ = predictor.predict(
+            point_coords=input_point,
+            point_labels=input_label,
+            multimask_output=False,
+        )
 
-    mask_img = Image.fromarray(inpaint_mask)
+    raw_mask = masks[0].astype(bool, copy=False)
 
-    # 저장 디렉토리 생성 후 저장
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    mask_img.save(save_path)
+    # 배경 제거 + 알파 채널을 한 번에: RGBA 버퍼 하나에 RGB × 마스크, 알파 = 마스크 × 255
+    result = SegmentationResult(
+        cutout=Image.fromarray(apply_mask(np_img, raw_mask), "RGBA"),
+        raw_mask=raw_mask,
+        inpaint_mask=Image.fromarray(invert_mask(raw_mask), "L"),
+        image_hash=image_hash,
+        embedding_cached=embedding_cached,
+    )
 
-    return mask_img
+    # 오브젝트/마스크는 인코딩 없이 메모리에 보관 (요청/작업 id로 조회)
+    # cutout은 이후 resize_with_padding이 제자리에서 줄이므로 복사본으로
+    if keep_artifacts:
+        artifact_store.put("original", result.cutout, copy=True)
+        artifact_store.put("mask", result.inpaint_mask)
+
+    return result
+
+
+def _restore_embedding(predictor, image_hash: str) -> bool:
+    """캐시된 임베딩을 predictor에 복원 (있으면 True)"""
+    with _embedding_lock:
+        cached = _embedding_cache.get(image_hash)
+        if cached is None:
+            return False
+        _embedding_cache.move_to_end(image_hash)
+
+    predictor.reset_image()
+    predictor.features = cached["features"]
+    predictor.original_size = cached["original_size"]
+    predictor.input_size = cached["input_size"]
+    predictor.is_image_set = True
+    return True
+
+
+def _store_embedding(predictor, image_hash: str) -> None:
+    if SAM_EMBEDDING_CACHE_SIZE <= 0:
+        return
+    with _embedding_lock:
+        _embedding_cache[image_hash] = {
+            "features": predictor.features,
+            "original_size": predictor.original_size,
+            "input_size": predictor.input_size,
+        }
+        _embedding_cache.move_to_end(image_hash)
+        while len(_embedding_cache) > SAM_EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
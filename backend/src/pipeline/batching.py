@@ -0,0 +1,113 @@
+# pipeline/batching.py
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable
+
+
+@dataclass
+class _Request:
+    key: Hashable
+    item: Any
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class MicroBatcher:
+    """
+    동적 마이크로 배칭 스케줄러.
+    - 같은 key(모델, step 수, 해상도 등)를 가진 요청을 max_wait 동안 모아서
+      최대 max_batch개까지 run_batch(key, items) 한 번으로 실행한다
+    - 결과는 요청별 Future로 돌려준다 (run_batch는 items와 같은 길이의 리스트를 반환)
+    - 배치는 전용 스레드 하나에서 차례로 실행된다 (GPU 동시 실행 제한은 run_batch가 GPU executor로 처리)
+    """
+
+    def __init__(self, run_batch: Callable[[Hashable, list[Any]], list[Any]],
+                 max_batch: int = 4, max_wait: float = 0.05, name: str = "batcher"):
+        self.run_batch = run_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.name = name
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._pending: list[_Request] = []  # key가 달라 다음 배치로 미룬 요청
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, key: Hashable, item: Any) -> Future:
+        self._ensure_started()
+        request = _Request(key, item)
+        self._queue.put(request)
+        return request.future
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    # ---- 내부 함수 ----
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _next_request(self, timeout: float | None) -> _Request | None:
+        if self._pending:
+            return self._pending.pop(0)
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _collect(self) -> list[_Request]:
+        first = self._next_request(timeout=None)
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+
+        # 이미 미뤄둔 요청 중 같은 key는 바로 합류
+        for req in list(self._pending):
+            if len(batch) >= self.max_batch:
+                break
+            if req.key == first.key:
+                self._pending.remove(req)
+                batch.append(req)
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                # 대기 시간이 지났어도 (앞 배치가 도는 동안) 이미 큐에 쌓인 요청은 합류시킨다
+                req = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if req.key == first.key:
+                batch.append(req)
+            else:
+                self._pending.append(req)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.run_batch(batch[0].key, [r.item for r in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"배치 결과 개수 불일치: {len(results)} != {len(batch)}")
+                for req, result in zip(batch, results):
+                    req.future.set_result(result)
+            except Exception as e:
+                for req in batch:
+                    req.future.set_exception(e)
+            self.batches += 1
+            self.items += len(batch)
@@ -2,6 +2,10 @@
 from PIL import Image, ImageDraw, ImageFont
 from typing import Optional
 
+from telemetry import get_logger
+
+logger = get_logger("compositor")
+
 
 def add_text_overlay(img: Image.Image, text: Optional[str], tone: Optional[str] = None) -> Image.Image:
     if not text:
@@ -11,7 +15,7 @@ def add_text_overlay(img: Image.Image, text: Optional[str], tone: Optional[str]
     try:
         font = ImageFont.truetype("assets/fonts/NotoSansCJK-Regular.ttc", size=int(img.height * 0.06))
     except:
-        print('Default font will be used..')
+        logger.warning('Default font will be used..')
         font = ImageFont.load_default()
 
     # 톤에 따른 색상 (간단 예시)
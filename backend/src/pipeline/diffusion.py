@@ -1,49 +1,92 @@
-from diffusers import StableDiffusionInpaintPipeline
-import torch
 from PIL import Image
-from config import SD_INPAINT_MODEL, SDXL_INPAINT_MODEL
-import os
-
-_inpaint_pipe = None
-_sdxl_inpaint_pipe = None
-
-def _init_inpaint(model: str = SD_INPAINT_MODEL):
-    global _inpaint_pipe
-    if _inpaint_pipe is None:
-        _inpaint_pipe = StableDiffusionInpaintPipeline.from_pretrained(
-            model,
-            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
-        )
-        if torch.cuda.is_available():
-            _inpaint_pipe = _inpaint_pipe.to("cuda")
-    return _inpaint_pipe
-
-def _init_sdxl_inpaint(model: str = SDXL_INPAINT_MODEL):
-    global _sdxl_inpaint_pipe
-    if _sdxl_inpaint_pipe is None:
-        _sdxl_inpaint_pipe = StableDiffusionInpaintPipeline.from_pretrained(
-            model,
-            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
-        )
-        if torch.cuda.is_available():
-            _sdxl_inpaint_pipe = _sdxl_inpaint_pipe.to("cuda")
-    return _sdxl_inpaint_pipe
+from config import SD_INPAINT_MODEL, SDXL_INPAINT_MODEL, INPAINT_MAX_BATCH, INPAINT_MAX_WAIT_MS
+import asyncio
+from concurrent.futures import Future
+
+from pipeline.model_registry import registry
+from pipeline.batching import MicroBatcher
+from pipeline.executors import run_cpu, gpu_executor
+from artifacts import artifact_store
+from telemetry import span
+
+
+def _load_pipeline(model: str):
+    # diffusers/torch는 모델을 실제로 로드할 때만 import
+    import torch
+    from diffusers import StableDiffusionInpaintPipeline
+
+    pipe = StableDiffusionInpaintPipeline.from_pretrained(
+        model,
+        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
+    )
+    if torch.cuda.is_available():
+        pipe = pipe.to("cuda")
+    return pipe
+
+def load_inpaint_pipeline():
+    return _load_pipeline(SD_INPAINT_MODEL)
+
+def load_sdxl_inpaint_pipeline():
+    return _load_pipeline(SDXL_INPAINT_MODEL)
+
+def _run_inpaint_batch(key: tuple, items: list[tuple[Image.Image, Image.Image, str]]) -> list[Image.Image]:
+    """
+    같은 모델/step/해상도의 요청들을 diffusers 한 번의 호출로 처리.
+    배칭 스레드가 아니라 GPU executor에서 실행해서 SAM/업스케일과 합쳐 GPU_WORKERS개까지만 동시에 돈다.
+    """
+    return gpu_executor.submit(_inpaint, key, items).result()
+
+
+def _inpaint(key: tuple, items: list[tuple[Image.Image, Image.Image, str]]) -> list[Image.Image]:
+    use_sdxl, steps, _size = key
+    products, masks, prompts = zip(*items)
+    # 사용 중에는 레지스트리가 파이프라인을 해제하지 않도록 use()로 감싼다
+    with registry.use("sdxl_inpaint" if use_sdxl else "sd_inpaint") as pipe:
+        return pipe(
+            prompt=list(prompts),
+            image=list(products),     # prepare_inpainting_inputs에서 크기/모드 맞춤
+            mask_image=list(masks),   # L 모드 마스크
+            num_inference_steps=steps
+        ).images
 
-def generate_inpainted_background(product: Image.Image, mask: Image.Image, prompt: str,
-                                  use_sdxl: bool = False, steps: int = 30) -> Image.Image:
-    pipe = _init_sdxl_inpaint() if use_sdxl else _init_inpaint()
 
-    result = pipe(
-        prompt=prompt,
-        image=product,        # prepare_inpainting_inputs에서 크기/모드 맞춤
-        mask_image=mask,      # L 모드 마스크
-        num_inference_steps=steps
-    ).images[0]
+_batcher = MicroBatcher(_run_inpaint_batch, max_batch=INPAINT_MAX_BATCH,
+                        max_wait=INPAINT_MAX_WAIT_MS / 1000, name="inpaint-batcher")
 
+
+def submit_inpaint(product: Image.Image, mask: Image.Image, prompt: str,
+                   use_sdxl: bool = False, steps: int = 30) -> Future:
+    """배칭 스케줄러에 인페인팅 요청을 넣고 Future 반환"""
+    key = (use_sdxl, steps, product.size)
+    return _batcher.submit(key, (product, mask, prompt))
+
+
+def _save_result(result: Image.Image) -> Image.Image:
     result_rgb = result.convert("RGB")
 
-    # 결과 저장
-    os.makedirs("temp", exist_ok=True)
-    result_rgb.save("temp/generated.png")
+    # 결과 보관 (현재 요청/작업 id 기준, 디스크 저장은 ARTIFACT_PERSIST_DIR를 지정했을 때만 백그라운드에서)
+    artifact_store.put("generated", result_rgb)
 
     return result_rgb
+
+
+def generate_inpainted_background(product: Image.Image, mask: Image.Image, prompt: str,
+                                  use_sdxl: bool = False, steps: int = 30) -> Image.Image:
+    # 배치는 GPU executor에서 실행되므로 GPU executor 스레드(run_gpu) 안에서 호출하면 안 된다
+    result = submit_inpaint(product, mask, prompt, use_sdxl, steps).result()
+    return _save_result(result)
+
+
+async def agenerate_inpainted_background(product: Image.Image, mask: Image.Image, prompt: str,
+                                         use_sdxl: bool = False, steps: int = 30) -> Image.Image:
+    """
+    비동기 버전. GPU executor를 점유하지 않고 배칭 스레드의 결과만 기다리므로
+    동시에 들어온 요청들이 한 배치로 묶일 수 있다.
+    """
+    with span("inpaint", model="sdxl_inpaint" if use_sdxl else "sd_inpaint", steps=steps):
+        result = await asyncio.wrap_future(submit_inpaint(product, mask, prompt, use_sdxl, steps))
+    return await run_cpu(_save_result, result)
+
+
+def inpaint_batch_stats() -> dict:
+    return _batcher.stats()
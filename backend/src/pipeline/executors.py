@@ -0,0 +1,56 @@
+# pipeline/executors.py
+import asyncio
+import functools
+import threading
+import contextvars
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from config import GPU_WORKERS, CPU_WORKERS, PROCESS_WORKERS
+
+# 이벤트 루프를 막지 않도록 동기 단계는 크기가 제한된 executor에서 실행
+# - GPU 단계는 VRAM 경합을 막기 위해 GPU_WORKERS개만 동시에 실행
+# - CPU 단계(PIL 인코딩, 합성 등)는 CPU_WORKERS개까지
+# - 호출한 쪽의 contextvars(request id, 현재 span)를 복사해서 넘긴다 (asyncio.to_thread와 동일)
+gpu_executor = ThreadPoolExecutor(max_workers=GPU_WORKERS, thread_name_prefix="gpu")
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+
+# 프로세스 풀은 처음 쓸 때 생성 (대부분의 요청은 필요 없음)
+# - spawn: 모델/CUDA가 올라간 서버 프로세스를 fork하지 않는다
+# - 함수와 인자는 pickle로 전달되므로 모듈 최상위 함수 + bytes 인자만 사용
+# - 자식 프로세스에는 contextvars가 넘어가지 않으므로 span은 호출하는 쪽에서 연다
+_process_executor: ProcessPoolExecutor | None = None
+_process_lock = threading.Lock()
+
+
+def get_process_executor() -> ProcessPoolExecutor:
+    global _process_executor
+    with _process_lock:
+        if _process_executor is None:
+            _process_executor = ProcessPoolExecutor(max_workers=PROCESS_WORKERS,
+                                                    mp_context=multiprocessing.get_context("spawn"))
+        return _process_executor
+
+
+async def run_gpu(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(gpu_executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+async def run_cpu(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(cpu_executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+async def run_process(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    gpu_executor.shutdown(wait=False, cancel_futures=True)
+    cpu_executor.shutdown(wait=False, cancel_futures=True)
+    if _process_executor is not None:
+        _process_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,224 @@
+# pipeline/model_registry.py
+import gc
+import sys
+import time
+import threading
+import importlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from config import MODEL_MEMORY_BUDGET_GB
+from telemetry import get_logger, span
+
+logger = get_logger("models")
+
+
+@dataclass
+class ModelSpec:
+    name: str
+    loader: Callable[[], Any] | str   # 함수 또는 "module:function" 경로 (지연 import)
+    size_gb: float                    # 메모리 예산 계산용 대략적인 크기
+    description: str = ""
+
+
+@dataclass
+class _Entry:
+    model: Any
+    size_gb: float
+    load_seconds: float
+    loaded_at: float
+    last_used: float
+    in_use: int = 0
+
+
+class ModelRegistry:
+    """
+    프로세스 전역 모델 레지스트리.
+    - 모델은 처음 요청될 때 한 번만 로드된다 (동시 요청이 와도 로드는 1회)
+    - memory_budget_gb를 넘으면 사용 중이 아닌 모델부터 LRU 순서로 내린다
+    - status()로 상주 모델과 로드 소요 시간을 확인할 수 있다
+    """
+
+    def __init__(self, memory_budget_gb: float = 0.0):
+        self.memory_budget_gb = memory_budget_gb  # 0 이하이면 무제한
+        self._specs: dict[str, ModelSpec] = {}
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks: dict[str, threading.Lock] = {}
+        self._load_counts: dict[str, int] = {}
+        self._last_load_seconds: dict[str, float] = {}
+
+    def register(self, name: str, loader: Callable[[], Any] | str,
+                 size_gb: float, description: str = "") -> None:
+        with self._lock:
+            self._specs[name] = ModelSpec(name, loader, size_gb, description)
+            self._load_locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str) -> Any:
+        """모델 반환 (없으면 로드). LRU 순서를 갱신한다."""
+        return self._acquire(name, hold=False)
+
+    @contextmanager
+    def use(self, name: str):
+        """
+        with registry.use("sam") as predictor: ...
+        블록 안에 있는 동안은 eviction 대상에서 제외된다.
+        """
+        # in_use는 항목을 찾거나 만드는 락 안에서 올린다 (get() 뒤에 올리면 그 사이에 eviction될 수 있다)
+        model = self._acquire(name, hold=True)
+        try:
+            yield model
+        finally:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is not None:
+                    entry.in_use -= 1
+                    entry.last_used = time.time()
+
+    def warmup(self, names: list[str]) -> None:
+        """서버 시작 시 지정된 모델을 미리 로드"""
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.warning(f"'{name}' warm-up 실패: {e}")
+
+    def evict(self, name: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.in_use > 0:
+                return False
+            del self._entries[name]
+        del entry
+        self._release_memory()
+        logger.info(f"'{name}' 메모리에서 해제")
+        return True
+
+    def resident_gb(self) -> float:
+        with self._lock:
+            return sum(e.size_gb for e in self._entries.values())
+
+    def status(self) -> dict:
+        now = time.time()
+        with self._lock:
+            models = []
+            for name, spec in self._specs.items():
+                entry = self._entries.get(name)
+                models.append({
+                    "name": name,
+                    "description": spec.description,
+                    "resident": entry is not None,
+                    "in_use": entry.in_use if entry else 0,
+                    "size_gb": spec.size_gb,
+                    "load_seconds": round(self._last_load_seconds[name], 3) if name in self._last_load_seconds else None,
+                    "load_count": self._load_counts.get(name, 0),
+                    "idle_seconds": round(now - entry.last_used, 1) if entry else None,
+                })
+            return {
+                "memory_budget_gb": self.memory_budget_gb,
+                "resident_gb": round(sum(e.size_gb for e in self._entries.values()), 2),
+                # LRU 순서 (앞쪽이 가장 오래 사용되지 않은 모델)
+                "lru_order": list(self._entries.keys()),
+                "models": models,
+            }
+
+    # ---- 내부 함수 ----
+
+    def _acquire(self, name: str, hold: bool) -> Any:
+        """모델 반환 (없으면 로드). hold=True이면 in_use를 같은 락 안에서 올린다."""
+        entry = self._touch(name, hold)
+        if entry is not None:
+            return entry.model
+
+        if name not in self._specs:
+            raise KeyError(f"등록되지 않은 모델입니다: {name}")
+
+        # 모델별 로드 락: 같은 모델을 두 번 로드하지 않도록
+        with self._load_locks[name]:
+            entry = self._touch(name, hold)
+            if entry is not None:
+                return entry.model
+
+            spec = self._specs[name]
+            self._make_room(spec.size_gb, exclude=name)
+
+            logger.info(f"'{name}' 로드 시작...")
+            started = time.perf_counter()
+            with span("model.load", model=name):
+                model = self._resolve_loader(spec.loader)()
+            elapsed = time.perf_counter() - started
+            logger.info(f"'{name}' 로드 완료 ({elapsed:.1f}s)")
+
+            now = time.time()
+            with self._lock:
+                self._entries[name] = _Entry(
+                    model=model,
+                    size_gb=spec.size_gb,
+                    load_seconds=elapsed,
+                    loaded_at=now,
+                    last_used=now,
+                    in_use=1 if hold else 0,
+                )
+                self._load_counts[name] = self._load_counts.get(name, 0) + 1
+                self._last_load_seconds[name] = elapsed
+            return model
+
+    def _touch(self, name: str, hold: bool = False) -> _Entry | None:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                entry.last_used = time.time()
+                self._entries.move_to_end(name)
+                if hold:
+                    entry.in_use += 1
+            return entry
+
+    def _make_room(self, size_gb: float, exclude: str) -> None:
+        if self.memory_budget_gb <= 0:
+            return
+        while self.resident_gb() + size_gb > self.memory_budget_gb:
+            with self._lock:
+                victim = next(
+                    (n for n, e in self._entries.items() if n != exclude and e.in_use == 0),
+                    None,
+                )
+            if victim is None:
+                logger.warning(f"메모리 예산 초과 ({self.memory_budget_gb}GB): 해제할 유휴 모델이 없습니다.")
+                return
+            self.evict(victim)
+
+    @staticmethod
+    def _resolve_loader(loader: Callable[[], Any] | str) -> Callable[[], Any]:
+        if callable(loader):
+            return loader
+        module_name, func_name = loader.split(":")
+        return getattr(importlib.import_module(module_name), func_name)
+
+    @staticmethod
+    def _release_memory() -> None:
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+
+# 전역 레지스트리
+registry = ModelRegistry(memory_budget_gb=MODEL_MEMORY_BUDGET_GB)
+
+# 로더는 "module:function" 경로로 등록 → 실제로 필요할 때만 해당 모듈(torch 등)을 import
+registry.register("sam", "pipeline.background_removal:load_sam_predictor", 2.6,
+                  "Segment Anything ViT-H predictor")
+registry.register("rembg", "pipeline.background_removal:load_rembg_session", 0.2,
+                  "rembg U2Net session")
+registry.register("sd_inpaint", "pipeline.diffusion:load_inpaint_pipeline", 2.6,
+                  "Stable Diffusion 2 inpainting pipeline")
+registry.register("sdxl_inpaint", "pipeline.diffusion:load_sdxl_inpaint_pipeline", 7.0,
+                  "Stable Diffusion XL inpainting pipeline")
+registry.register("qwen", "services.banner_qwen:load_qwen_pipeline", 40.0,
+                  "Qwen-Image-Edit-2509 pipeline")
+registry.register("realesrgan_x2", "pipeline.upscaler:load_realesrgan_x2", 0.1,
+                  "Real-ESRGAN x2plus upscaler")
+registry.register("realesrgan_x4", "pipeline.upscaler:load_realesrgan_x4", 0.1,
+                  "Real-ESRGAN x4plus upscaler")
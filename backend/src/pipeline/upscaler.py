@@ -1,70 +1,149 @@
 # pipeline/upscaler.py
 import os
-import requests
-import torch
+import math
+import threading
 import numpy as np
 from PIL import Image
-from realesrgan import RealESRGANer
-from basicsr.archs.rrdbnet_arch import RRDBNet  # RRDBNet 아키텍처
 
-DEFAULT_URL = "https://github.com/xinntao/Real-ESRGAN/releases/download/v0.1.0/RealESRGAN_x4plus.pth"
+from config import UPSCALE_PRECISION, UPSCALE_TILE, UPSCALE_TILE_PAD
+from pipeline.model_registry import registry
+from telemetry import get_logger, span
+
+logger = get_logger("upscaler")
+
+WEIGHTS = {
+    2: ("weights/RealESRGAN_x2plus.pth",
+        "https://github.com/xinntao/Real-ESRGAN/releases/download/v0.2.1/RealESRGAN_x2plus.pth"),
+    4: ("weights/RealESRGAN_x4plus.pth",
+        "https://github.com/xinntao/Real-ESRGAN/releases/download/v0.1.0/RealESRGAN_x4plus.pth"),
+}
+
+# 타일 크기 추정용: 입력 픽셀 1개당 RRDBNet 추론에 필요한 대략적인 메모리 (fp32 기준)
+_BYTES_PER_PIXEL_FP32 = 12 * 1024
+_MIN_TILE, _MAX_TILE = 128, 1024
+
+
+def _download(url: str, path: str) -> None:
+    import requests
+
+    logger.info("Real-ESRGAN weight 파일이 없습니다. 자동 다운로드를 시작합니다...")
+    r = requests.get(url, stream=True, timeout=60)
+    r.raise_for_status()
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "wb") as f:
+        for chunk in r.iter_content(chunk_size=8192):
+            if chunk:
+                f.write(chunk)
+    os.replace(tmp_path, path)
+    logger.info(f"다운로드 완료: {path}")
+
+
+def _available_memory(device: str) -> int:
+    """현재 사용 가능한 메모리(bytes). 알 수 없으면 0"""
+    if device == "cuda":
+        import torch
+        free, _total = torch.cuda.mem_get_info()
+        return free
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return 0
+
 
 class RealESRGANUpscaler:
-    def __init__(self, device=None, scale=4,
-                 weights_path="weights/RealESRGAN_x4plus.pth"):
+    """
+    Real-ESRGAN 업스케일러.
+    - scale에 맞는 네이티브 모델(x2plus / x4plus)을 사용
+    - CPU에서는 fp32, GPU에서는 fp16 (UPSCALE_PRECISION으로 강제 가능)
+    - 타일 크기는 이미지 크기와 남은 메모리로 매 호출마다 결정 (메모리 상한 유지)
+    - RealESRGANer는 타일 크기와 처리 중인 이미지를 인스턴스에 들고 있으므로 한 번에 한 호출만
+    """
+
+    def __init__(self, scale: int = 4, device: str | None = None, precision: str = UPSCALE_PRECISION):
+        import torch
+        from realesrgan import RealESRGANer
+        from basicsr.archs.rrdbnet_arch import RRDBNet  # RRDBNet 아키텍처
+
+        if scale not in WEIGHTS:
+            raise ValueError(f"지원하지 않는 배율입니다: x{scale}")
+
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.scale = scale
-        os.makedirs(os.path.dirname(weights_path), exist_ok=True)
+        self.half = precision == "fp16" or (precision == "auto" and self.device == "cuda")
+        if self.half and self.device == "cpu":
+            logger.info("CPU에서는 fp16을 지원하지 않아 fp32로 실행합니다.")
+            self.half = False
 
-        # 가중치 없으면 자동 다운로드
+        weights_path, url = WEIGHTS[scale]
+        os.makedirs(os.path.dirname(weights_path), exist_ok=True)
+        # 가중치 없으면 자동 다운로드 (최초 로드 시에만)
         if not os.path.exists(weights_path):
-            print("Real-ESRGAN weight 파일이 없습니다. 자동 다운로드를 시작합니다...")
-            r = requests.get(DEFAULT_URL, stream=True)
-            r.raise_for_status()
-            with open(weights_path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            print(f"다운로드 완료: {weights_path}")
-
-        # RRDBNet 아키텍처 정의 (RealESRGAN_x4plus 기본 설정)
+            _download(url, weights_path)
+
         rrdbnet = RRDBNet(
             num_in_ch=3,
             num_out_ch=3,
             num_feat=64,
             num_block=23,
             num_grow_ch=32,
-            scale=4
+            scale=scale
         )
 
-        # RealESRGANer 초기화
         self.model = RealESRGANer(
-            scale=self.scale,
+            scale=scale,
             model_path=weights_path,
             dni_weight=None,
             model=rrdbnet,
+            tile=0,
+            tile_pad=UPSCALE_TILE_PAD,
+            pre_pad=0,
+            half=self.half,
             device=self.device,
-            half=True
         )
+        self._lock = threading.Lock()
+
+    def tile_size_for(self, width: int, height: int) -> int:
+        """남은 메모리에 맞는 타일 크기 (0이면 타일링 없이 한 번에 처리)"""
+        if UPSCALE_TILE >= 0:
+            return UPSCALE_TILE
+
+        bytes_per_px = _BYTES_PER_PIXEL_FP32 // (2 if self.half else 1)
+        # 남은 메모리의 절반만 사용 (다른 모델/요청 여유분)
+        budget = _available_memory(self.device) // 2
+        if budget <= 0:
+            return 512
+        if width * height * bytes_per_px <= budget:
+            return 0
+
+        tile = int(math.sqrt(budget / bytes_per_px))
+        tile = max(_MIN_TILE, min(_MAX_TILE, tile))
+        return tile - tile % 32
+
+    def enhance(self, img: Image.Image, outscale: float | None = None) -> Image.Image:
+        tile_size = self.tile_size_for(img.width, img.height)
+        array = np.array(img)
+        # tile_size 설정과 enhance를 같은 락 안에서: 동시 호출이 서로의 타일 크기/중간 결과를 덮어쓰지 않도록
+        with self._lock:
+            self.model.tile_size = tile_size
+            sr_img, _ = self.model.enhance(array, outscale=outscale or self.scale)
+        return Image.fromarray(sr_img)
+
+
+def load_realesrgan_x2() -> RealESRGANUpscaler:
+    """model_registry에서 최초 사용 시 한 번만 호출 (import 시점에는 로드하지 않음)"""
+    return RealESRGANUpscaler(scale=2)
 
-    def enhance(self, img: Image.Image, outscale: int = None) -> Image.Image:
-        sr_img, _ = self.model.enhance(np.array(img), outscale=self.scale)
-        pil = Image.fromarray(sr_img)
 
-        if outscale and outscale != self.scale:
-            w, h = pil.size
-            pil = pil.resize(
-                (int(w * outscale / self.scale), int(h * outscale / self.scale)),
-                Image.LANCZOS
-            )
-        return pil
+def load_realesrgan_x4() -> RealESRGANUpscaler:
+    return RealESRGANUpscaler(scale=4)
 
-# 전역 인스턴스
-_realesrgan = RealESRGANUpscaler()
 
 def upscale_image(img: Image.Image, scale: int = 2) -> Image.Image:
     """
-    Real-ESRGAN 기반 업스케일링. 기본 x4 모델을 사용하며,
-    scale 인자는 후처리 리사이즈로 맞춥니다.
+    Real-ESRGAN 기반 업스케일링. scale ≤ 2이면 x2 모델을 사용해
+    x4로 키웠다가 줄이는 낭비를 없앤다.
     """
-    return _realesrgan.enhance(img, outscale=scale)
+    name = "realesrgan_x2" if scale <= 2 else "realesrgan_x4"
+    with span("upscale", model=name, scale=scale, width=img.width, height=img.height):
+        with registry.use(name) as upscaler:
+            return upscaler.enhance(img, outscale=scale)
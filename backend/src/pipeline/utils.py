@@ -1,5 +1,26 @@
-import os
-from PIL import Image, ImageFilter
+import numpy as np
+from PIL import Image
+
+from pipeline.image_ops import threshold_mask, feather_mask
+from artifacts import artifact_store
+from telemetry import get_logger
+
+logger = get_logger("utils")
+
+def detect_mime(data: bytes) -> str:
+    """매직 바이트로 실제 이미지 MIME 타입 판별 (알 수 없으면 image/png)"""
+    head = bytes(data[:12])
+    if head.startswith(b"\x89PNG"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1", b"ftypmsf1"):
+        return "image/heic"
+    return "image/png"
 
 def resize_with_padding(img: Image.Image, target_size=(512,512)) -> Image.Image:
     """
@@ -16,41 +37,36 @@ def prepare_inpainting_inputs(product_rgba: Image.Image,
                               target_size: tuple[int, int] = (512, 512),
                               blur_radius: int = 0,
                               alpha_threshold: int = 0,
-                              save_mask: bool = True,
-                              temp_dir: str = "temp") -> tuple[Image.Image, Image.Image]:
+                              save_mask: bool = True) -> tuple[Image.Image, Image.Image]:
     """
     제품 이미지에서 마스크를 생성하고, 인페인팅에 맞게 리사이즈하여 반환한다.
-    마스크 이미지를 temp 폴더에 저장할 수 있다.
+    마스크 이미지를 artifact_store에 보관할 수 있다.
     
     Args:
         product_rgba: rembg로 배경 제거된 RGBA 이미지
         target_size: 인페인팅 모델 입력 해상도 (기본 512x512)
         blur_radius: 마스크 경계 부드럽게 처리할 블러 강도
         alpha_threshold: 알파 채널 임계값 (0 이상 픽셀을 제품으로 인식)
-        save_mask: True일 경우 temp 폴더에 마스크 저장
-        temp_dir: 마스크 저장할 폴더 경로
+        save_mask: True일 경우 마스크를 artifact_store에 "inpaint_mask"로 보관 (현재 요청/작업 id 기준)
 
     Returns:
         resized_product: 인페인팅용 제품 이미지 (RGB)
         resized_mask: 인페인팅용 마스크 이미지 (L)
     """
     # 1. 알파 채널 기반 마스크 생성 (제품=검정, 배경=흰색)
-    alpha = product_rgba.split()[-1]
-    mask = alpha.point(lambda p: 0 if p > alpha_threshold else 255, mode="L")
+    #    알파 채널만 꺼내서 NumPy 비교 한 번으로 출력 버퍼에 바로 임계값 처리 (image_ops.threshold_mask)
+    alpha = np.asarray(product_rgba.getchannel("A"))
+    mask = threshold_mask(alpha, alpha_threshold)
 
     # 2. 경계 부드럽게 처리 (필요시만)
-    if blur_radius > 0:
-        mask = mask.filter(ImageFilter.GaussianBlur(blur_radius))
+    mask = feather_mask(mask, blur_radius)
 
     # 3. 제품 이미지와 마스크 리사이즈
     resized_product = product_rgba.resize(target_size, Image.LANCZOS).convert("RGB")
-    resized_mask = mask.resize(target_size, Image.LANCZOS)
+    resized_mask = Image.fromarray(mask, "L").resize(target_size, Image.LANCZOS)
 
-    # 4. 마스크 저장
+    # 4. 마스크 보관 (인코딩/파일 쓰기 없음)
     if save_mask:
-        os.makedirs(temp_dir, exist_ok=True)
-        mask_path = os.path.join(temp_dir, "mask.png")
-        resized_mask.save(mask_path)
-        print(f"마스크 이미지 저장 완료: {mask_path}")
+        artifact_store.put("inpaint_mask", resized_mask)
 
     return resized_product, resized_mask
@@ -1,49 +1,30 @@
 # banner.py
-import os, io, base64
+import io, base64
+import asyncio
 from PIL import Image
-from datetime import datetime
-from deep_translator import GoogleTranslator
-from google import genai
-from google.genai import types
 
-def translate_to_english(text: str) -> str:
-    return GoogleTranslator(source='ko', target='en').translate(text)
+from services.banner_cache import banner_cache
+from services.translation import get_translator
+from services.gemini import gemini_client
+from pipeline.utils import detect_mime
+from services.jobs import ProgressCallback, report, stage
+from config import GEMINI_IMAGE_MODEL
+from artifacts import artifact_store
+from telemetry import get_logger, log_payload, span
 
-def call_gemini_image_api(prompt: str, images: list[bytes]) -> Image.Image:
+PIPELINE = "banner"
+logger = get_logger(PIPELINE)
+
+async def call_gemini_image_api(prompt: str, images: list[bytes]) -> tuple[bytes, str]:
     """
     Gemini 3 Pro Image API 호출 → 여러 이미지를 함께 전달
     images: [product_bytes, person_bytes?, background_bytes?]
+    반환: (이미지 바이트, MIME 타입) — 응답 바이트를 디코딩/재인코딩 없이 그대로 사용
+    입력 축소/재인코딩, timeout/재시도는 gemini_client가 처리
     """
-    API_KEY = os.getenv("GOOGLE_API_KEY")
-    client = genai.Client(api_key=API_KEY)
-
-    contents = [types.Part(text=prompt)]
-
-    # 순서대로 inline_data 추가
-    for img_bytes in images:
-        contents.append(types.Part(
-            inline_data=types.Blob(mime_type="image/png", data=img_bytes)
-        ))
-
-    response = client.models.generate_content(
-        model="gemini-3-pro-image-preview",
-        contents=contents,
-        config=types.GenerateContentConfig(
-            image_config=types.ImageConfig(
-                aspect_ratio="1:1",
-                image_size="2K"
-            )
-        )
-    )
+    return await gemini_client.generate_image(prompt, images, aspect_ratio="1:1", image_size="2K")
 
-    for candidate in response.candidates:
-        for part in candidate.content.parts:
-            if part.inline_data:
-                return part.as_image()
-
-    raise ValueError("Gemini 응답에 이미지 데이터가 없습니다.")
-
-def generate_banner(
+async def generate_banner(
     product_bytes: bytes,
     person_bytes: bytes | None,
     background_bytes: bytes | None,
@@ -51,11 +32,53 @@ def generate_banner(
     text_overlay: str,
     overlay_position: str,
     overlay_description: str,
+    force_regenerate: bool = False,
+    progress: ProgressCallback | None = None,
 ) -> str:
-    print("1) Build final prompt from user inputs")
+    """
+    기존 JSON 응답용: 배너 이미지를 PNG base64 문자열로 반환
+    (프론트엔드가 data:image/png로 표시하므로 Gemini가 JPEG/WebP를 돌려주면 PNG로 변환)
+    """
+    img_bytes, mime_type = await generate_banner_image(
+        product_bytes, person_bytes, background_bytes, background_prompt, text_overlay,
+        overlay_position, overlay_description, force_regenerate, progress,
+    )
+    img_bytes, _ = await asyncio.to_thread(encode_image_bytes, img_bytes, mime_type, "png")
+    return base64.b64encode(img_bytes).decode("utf-8")
 
-    # background_prompt는 영어로 번역
-    bg_prompt_en = translate_to_english(background_prompt) if background_prompt else ""
+async def generate_banner_image(
+    product_bytes: bytes,
+    person_bytes: bytes | None,
+    background_bytes: bytes | None,
+    background_prompt: str,
+    text_overlay: str,
+    overlay_position: str,
+    overlay_description: str,
+    force_regenerate: bool = False,
+    progress: ProgressCallback | None = None,
+) -> tuple[bytes, str]:
+    """배너 이미지 바이트와 MIME 타입 반환 (바이너리 응답용)"""
+    # 같은 이미지 + 같은 프롬프트 조합이면 번역/Gemini 호출 없이 캐시 반환
+    cache_key = banner_cache.make_key(
+        [product_bytes, person_bytes, background_bytes],
+        version=GEMINI_IMAGE_MODEL,
+        normalize=("background_prompt", "overlay_description"),
+        background_prompt=background_prompt,
+        text_overlay=text_overlay,
+        overlay_position=overlay_position,
+        overlay_description=overlay_description,
+    )
+    if not force_regenerate:
+        cached = await asyncio.to_thread(banner_cache.get, cache_key)
+        if cached is not None:
+            report(progress, "cache_hit", "0) Banner cache hit")
+            return cached, detect_mime(cached)
+
+    with stage(progress, "prompt", "1) Build final prompt from user inputs", pipeline=PIPELINE):
+        # background_prompt, overlay_description을 한 번에 번역 (캐시 우선, 빈 문자열은 그대로)
+        bg_prompt_en, overlay_desc_en = await asyncio.to_thread(
+            get_translator().translate_batch, [background_prompt, overlay_description]
+        )
 
     # text_overlay는 한국어 그대로
     overlay_text_final = text_overlay or ""
@@ -63,7 +86,6 @@ def generate_banner(
     # overlay_description은 "한국어(영어)" 병기
     overlay_desc_final = overlay_description
     if overlay_description:
-        overlay_desc_en = translate_to_english(overlay_description)
         overlay_desc_final = f"{overlay_description} ({overlay_desc_en})"
 
     # 위치 처리
@@ -93,31 +115,49 @@ def generate_banner(
         f"Ensure high contrast and legibility, commercial quality."
     ).strip()
 
-    print('Final Prompt: ', final_prompt)
-
-    print("2) Gemini API call → composite with product/person/background")
+    log_payload(logger, "final prompt", final_prompt)
 
-    # 이미지 배열 구성 (조건부)
-    images = [product_bytes]
-    if person_bytes:
-        images.append(person_bytes)
-    if background_bytes:
-        images.append(background_bytes)
+    with stage(progress, "gemini", "2) Gemini API call → composite with product/person/background", pipeline=PIPELINE):
+        # 이미지 배열 구성 (조건부)
+        images = [product_bytes]
+        if person_bytes:
+            images.append(person_bytes)
+        if background_bytes:
+            images.append(background_bytes)
 
-    result_img = call_gemini_image_api(final_prompt, images)
+        img_bytes, mime_type = await call_gemini_image_api(final_prompt, images)
 
-    # 결과 저장 및 반환
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    temp_path = f"temp/generated-{timestamp}.png"
-    os.makedirs("temp", exist_ok=True)
-    result_img.save(temp_path)
+    # 응답 바이트를 그대로 캐시 + 결과 보관 (파일을 다시 읽지 않음)
+    with stage(progress, "encode", "3) Save result", pipeline=PIPELINE):
+        artifact_store.put("generated", img_bytes, mime_type=mime_type)
+        await asyncio.to_thread(_save_result, cache_key, img_bytes, mime_type)
 
-    with open(temp_path, "rb") as f:
-        img_bytes = f.read()
+    return img_bytes, mime_type
 
-    return base64.b64encode(img_bytes).decode("utf-8")
+def _save_result(cache_key: str, img_bytes: bytes, mime_type: str) -> None:
+    with span("banner_cache.put", bytes=len(img_bytes)):
+        banner_cache.put(cache_key, img_bytes, mime_type)
 
-def generate_banner_mock(
+def encode_image_bytes(img_bytes: bytes, mime_type: str, target_format: str) -> tuple[bytes, str]:
+    """
+    이미지 바이트를 target_format(png/webp/jpeg)으로 변환.
+    이미 같은 형식이면 디코딩 없이 그대로 반환한다.
+    """
+    target_mime = f"image/{target_format}"
+    if mime_type == target_mime:
+        return img_bytes, mime_type
+
+    image = Image.open(io.BytesIO(img_bytes))
+    buf = io.BytesIO()
+    if target_format == "jpeg":
+        image.convert("RGB").save(buf, format="JPEG", quality=92, optimize=True)
+    elif target_format == "webp":
+        image.save(buf, format="WEBP", quality=90, method=4)
+    else:
+        image.save(buf, format="PNG")
+    return buf.getvalue(), target_mime
+
+async def generate_banner_mock(
     product_bytes: bytes,
     person_bytes: bytes | None,
     background_bytes: bytes | None,
@@ -125,6 +165,8 @@ def generate_banner_mock(
     text_overlay: str,
     overlay_position: str,
     overlay_description: str,
+    force_regenerate: bool = False,
+    progress: ProgressCallback | None = None,
 ) -> str:
     with open("temp/generated-20251201-140502.png", "rb") as f:
         return base64.b64encode(f.read()).decode("utf-8")
\ No newline at end of file
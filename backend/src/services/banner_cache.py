@@ -0,0 +1,182 @@
+# services/banner_cache.py
+import os
+import re
+import time
+import hashlib
+import threading
+
+from config import BANNER_CACHE_DIR, BANNER_CACHE_MAX_MB, BANNER_CACHE_TTL_HOURS
+
+
+# 캐시 파일은 실제 형식의 확장자로 저장 (Gemini 응답이 PNG/JPEG/WebP 중 무엇이든)
+_EXTENSIONS = {"image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp"}
+
+# 예산 안쪽이어도 이 주기마다 한 번은 디렉터리를 훑어서 만료 항목을 지우고 전체 크기를 다시 맞춘다
+_SWEEP_SECONDS = 600
+
+
+def _normalize(text: str | None) -> str:
+    """공백/대소문자 차이로 캐시가 갈리지 않도록 정규화"""
+    return re.sub(r"\s+", " ", (text or "").strip()).lower()
+
+
+class BannerCache:
+    """
+    배너 결과 디스크 캐시 (content-addressed).
+    - 키: 입력 이미지 바이트 + 프롬프트 필드의 SHA-256
+      (normalize에 지정한 필드만 공백/대소문자 정규화, 나머지는 그대로 해시)
+    - TTL(mtime = 저장 시각)이 지난 항목과, 전체 크기가 max_bytes를 넘을 때
+      가장 오래 안 쓴 항목(atime = 마지막 적중 시각)부터 삭제
+    - 전체 크기는 메모리에서 갱신하고, 예산을 넘었거나 _SWEEP_SECONDS가 지났을 때만 디렉터리를 훑는다
+      (여러 워커가 같은 디렉터리를 쓰면 서로의 put은 다음 스캔 때 반영된다)
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, ttl_seconds: float):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._total: int | None = None  # 캐시 디렉터리 전체 크기 (첫 스캔 전에는 None)
+        self._swept_at = 0.0
+
+    @staticmethod
+    def make_key(images: list[bytes | None], version: str = "", normalize: tuple[str, ...] = (),
+                 **fields: str | None) -> str:
+        h = hashlib.sha256()
+        h.update(version.encode("utf-8"))
+        for img in images:
+            # 이미지 자리(없음 포함)를 구분해서 해시
+            h.update(b"\x00img\x00")
+            h.update(hashlib.sha256(img).digest() if img else b"-")
+        for name in sorted(fields):
+            # 배너에 그대로 그려지는 값(문구, 위치)은 대소문자/공백 차이도 다른 결과
+            value = _normalize(fields[name]) if name in normalize else (fields[name] or "")
+            h.update(f"\x00{name}={value}".encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        for ext in _EXTENSIONS.values():
+            path = self._path(key, ext)
+            try:
+                st = os.stat(path)
+                now = time.time()
+                if now - st.st_mtime > self.ttl_seconds:
+                    os.remove(path)
+                    self._add_size(-st.st_size)
+                    continue
+                with open(path, "rb") as f:
+                    data = f.read()
+                # 적중 시각을 atime에 기록 (LRU). mtime은 그대로 둬서 TTL은 저장 시각 기준
+                os.utime(path, (now, st.st_mtime))
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self.hits += 1
+            return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes, mime_type: str = "image/png") -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        ext = _EXTENSIONS.get(mime_type, ".png")
+        path = self._path(key, ext)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        replaced = self._size_of(path)
+        os.replace(tmp_path, path)  # 동시 요청이 반쯤 쓴 파일을 읽지 않도록
+        # 재생성으로 형식이 바뀌었으면 이전 형식의 파일은 삭제
+        for other in _EXTENSIONS.values():
+            if other != ext:
+                other_path = self._path(key, other)
+                size = self._size_of(other_path)
+                try:
+                    os.remove(other_path)
+                    replaced += size
+                except FileNotFoundError:
+                    pass
+        self._add_size(len(data) - replaced)
+        self._evict()
+
+    def stats(self) -> dict:
+        entries, total = self._scan()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "size_bytes": total,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+    # ---- 내부 함수 ----
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{ext}")
+
+    @staticmethod
+    def _size_of(path: str) -> int:
+        try:
+            return os.stat(path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _add_size(self, delta: int) -> None:
+        with self._lock:
+            if self._total is not None:
+                self._total += delta
+
+    def _scan(self) -> tuple[list[tuple[float, float, int, str]], int]:
+        if not os.path.isdir(self.cache_dir):
+            return [], 0
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(tuple(_EXTENSIONS.values())):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_atime, st.st_mtime, st.st_size, path))
+        return entries, sum(e[2] for e in entries)
+
+    def _evict(self) -> None:
+        now = time.time()
+        with self._lock:
+            if (self._total is not None and self._total <= self.max_bytes
+                    and now - self._swept_at < _SWEEP_SECONDS):
+                return
+        entries, total = self._scan()
+        removed = 0
+        for _, mtime, size, path in sorted(entries):  # 마지막 적중(atime)이 오래된 순
+            # 만료는 mtime 기준이라 atime 순서와 다를 수 있으므로 끝까지 확인
+            expired = now - mtime > self.ttl_seconds
+            if not expired and total <= self.max_bytes:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._total = total
+            self._swept_at = now
+            self.evictions += removed
+
+
+banner_cache = BannerCache(
+    cache_dir=BANNER_CACHE_DIR,
+    max_bytes=BANNER_CACHE_MAX_MB * 1024 * 1024,
+    ttl_seconds=BANNER_CACHE_TTL_HOURS * 3600,
+)
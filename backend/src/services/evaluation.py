@@ -1,17 +1,27 @@
-import json
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from models import EvaluationPayload, EvaluationResult, FactorResult, GenerateResult
-from config import OPENAI_API_KEY
-
-# LangChain ChatOpenAI 초기화
-llm = ChatOpenAI(model="gpt-5-nano", api_key=OPENAI_API_KEY)
-
-def evaluate_content(payload: EvaluationPayload) -> EvaluationResult:
-    # 프롬프트 템플릿 정의
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "너는 인스타그램 마케팅 전문가다."),
-        ("user", """캡션: {caption}
+from models import EvaluationPayload, EvaluationResult
+from services.llm_gateway import llm_gateway
+from services.prompts import prompt_registry
+from services.structured_output import structured_output
+from services.response_cache import ResponseCache
+from services.json_stream import IncrementalJSONParser
+from telemetry import get_logger
+
+logger = get_logger("evaluation")
+
+evaluation_cache = ResponseCache("evaluate_content", similar_fields=("caption", "one_liner"))
+
+
+async def evaluate_content(payload: EvaluationPayload) -> EvaluationResult:
+    return await evaluation_cache.get_or_create(
+        payload,
+        lambda: _evaluate_content(payload),
+        cacheable=lambda result: bool(result.factors),  # 빈 응답은 캐시하지 않음
+    )
+
+
+prompt_registry.register("evaluate_content", [
+    ("system", "너는 인스타그램 마케팅 전문가다."),
+    ("user", """캡션: {caption}
 한 줄 광고: {one_liner}
 해시태그: {hashtags}
 
@@ -56,39 +66,52 @@ def evaluate_content(payload: EvaluationPayload) -> EvaluationResult:
   }}
 }}
 """)
-    ])
+], input_variables=("caption", "one_liner", "hashtags"))
 
+
+def _build_variables(payload: EvaluationPayload) -> dict:
     # 변수 바인딩
-    variables = {
+    return {
         "caption": payload.caption,
         "one_liner": payload.one_liner or "",
         "hashtags": ", ".join(payload.hashtags or []),
     }
 
+
+async def _evaluate_content(payload: EvaluationPayload) -> EvaluationResult:
+    prompt = prompt_registry.get("evaluate_content")
+    variables = _build_variables(payload)
+    # 형식이 깨진 응답은 추출/교정으로 복구하고, 끝내 실패하면 StructuredOutputError
+    return await structured_output.ainvoke(prompt, variables, EvaluationResult, name="evaluate_content")
+
+
+async def stream_evaluate_content(payload: EvaluationPayload):
+    """
+    평가 항목(factor)별 점수/설명, 종합 점수, 총평, 추천 문구를 완성되는 즉시 이벤트로 전달.
+    마지막 이벤트는 전체 결과(result) 또는 오류(error).
+    """
+    parser = IncrementalJSONParser()
+    raw: list[str] = []
     try:
-        response = (prompt | llm).invoke(variables)
-        print("✅ 모델 응답:", response.content)
-
-        data = json.loads(response.content.strip())
-
-        return EvaluationResult(
-            overall_score=data.get("overall_score", 0),
-            factors={
-                k: FactorResult(score=v.get("score", 0), explanation=v.get("explanation", ""))
-                for k, v in data.get("factors", {}).items()
-            },
-            summary=data.get("summary", ""),
-            recommendations=GenerateResult(
-                captions=data.get("recommendations", {}).get("captions", []),
-                one_liner=data.get("recommendations", {}).get("one_liner", ""),
-                hashtags=data.get("recommendations", {}).get("hashtags", [])
-            )
-        )
+        async for chunk in llm_gateway.astream(prompt_registry.get("evaluate_content"), _build_variables(payload),
+                                               bind=structured_output.bind_options(EvaluationResult)):
+            raw.append(chunk.content or "")
+            for path, value in parser.feed(chunk.content or ""):
+                if len(path) == 2 and path[0] == "factors":
+                    yield {"type": "factor", "key": path[1], "value": value}
+                elif path in (("overall_score",), ("summary",)):
+                    yield {"type": path[0], "value": value}
+                elif len(path) == 3 and path[:2] == ("recommendations", "captions"):
+                    yield {"type": "recommendation_caption", "index": path[2], "value": value}
+                elif path == ("recommendations", "one_liner"):
+                    yield {"type": "recommendation_one_liner", "value": value}
+                elif len(path) == 3 and path[:2] == ("recommendations", "hashtags"):
+                    yield {"type": "recommendation_hashtag", "index": path[2], "value": value}
+            if parser.done:
+                break
+
+        result = await structured_output.parse("".join(raw), EvaluationResult, name="evaluate_content")
+        yield {"type": "result", "value": result.model_dump()}
     except Exception as e:
-        print("❌ 에러 발생:", str(e))
-        return EvaluationResult(
-            overall_score=0,
-            factors={},
-            summary=f"오류 발생: {str(e)} | 원본 응답: {getattr(response, 'content', '')}",
-            recommendations=GenerateResult(captions=[], one_liner="", hashtags=[])
-        )
+        logger.exception(f"❌ 스트리밍 에러 발생: {e}")
+        yield {"type": "error", "detail": str(e)}
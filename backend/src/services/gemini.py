@@ -0,0 +1,237 @@
+# services/gemini.py
+import io
+import time
+import random
+import asyncio
+import itertools
+import threading
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+
+from config import (
+    GOOGLE_API_KEY,
+    GEMINI_IMAGE_MODEL,
+    GEMINI_INPUT_MAX_SIDE,
+    GEMINI_INPUT_MAX_BYTES,
+    GEMINI_INPUT_JPEG_QUALITY,
+    GEMINI_TIMEOUT_SECONDS,
+    GEMINI_DEADLINE_SECONDS,
+    GEMINI_MAX_RETRIES,
+)
+from pipeline.utils import detect_mime
+from pipeline.executors import run_cpu
+from telemetry import get_logger, span
+
+logger = get_logger("gemini")
+
+# 재인코딩 없이 그대로 보낼 수 있는 입력 형식
+PASSTHROUGH_MIMES = {"image/png", "image/jpeg", "image/webp"}
+
+# 재시도 대상 (rate limit, 일시적 서버 오류, 연결 오류)
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"ServerError", "ConnectError", "ConnectTimeout", "ReadTimeout", "ReadError",
+                    "WriteTimeout", "RemoteProtocolError"}
+
+_EXIF_ORIENTATION = 0x0112
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    original_bytes: int
+    original_size: tuple[int, int] | None   # PIL이 열지 못한 형식이면 None
+    size: tuple[int, int] | None
+    reencoded: bool
+
+
+def prepare_image(data: bytes, max_side: int = GEMINI_INPUT_MAX_SIDE,
+                  max_bytes: int = GEMINI_INPUT_MAX_BYTES,
+                  quality: int = GEMINI_INPUT_JPEG_QUALITY) -> PreparedImage:
+    """
+    Gemini 업로드 전 입력 이미지 정규화 (CPU 작업이므로 run_cpu에서 실행).
+    - 매직 바이트로 실제 MIME 판별 (JPEG를 image/png로 보내지 않음)
+    - 긴 변이 max_side를 넘으면 축소. JPEG는 draft()로 디코딩 단계에서 1/2~1/8로 먼저 줄인다
+    - EXIF 회전을 픽셀에 반영 (재인코딩하면 EXIF가 빠지므로)
+    - 알파가 없으면 JPEG, 있으면 WebP로 재인코딩
+    - 이미 작고 지원되는 형식이면 디코딩 없이 그대로
+    """
+    mime_type = detect_mime(data)
+    original = PreparedImage(data, mime_type, len(data), None, None, False)
+    try:
+        image = Image.open(io.BytesIO(data))
+    except Exception:
+        # PIL이 열지 못하는 형식(HEIC 등)은 판별한 MIME으로 그대로 전송
+        return original
+
+    original.original_size = original.size = image.size
+    rotated = image.getexif().get(_EXIF_ORIENTATION, 1) != 1
+    scale = max_side / max(image.size) if max_side > 0 else 1.0
+    if scale >= 1.0 and not rotated and mime_type in PASSTHROUGH_MIMES and len(data) <= max_bytes:
+        return original
+
+    if scale < 1.0:
+        target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        if image.format == "JPEG":
+            image.draft("RGB", target)  # target 이상인 가장 작은 1/2^n 크기로 디코딩
+    image = ImageOps.exif_transpose(image)
+    if scale < 1.0:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+    buf = io.BytesIO()
+    if has_alpha:
+        image.save(buf, format="WEBP", quality=quality, method=4)
+        prepared_mime = "image/webp"
+    else:
+        image.convert("RGB").save(buf, format="JPEG", quality=quality)
+        prepared_mime = "image/jpeg"
+
+    # 크기도 방향도 그대로인데 재인코딩 결과가 더 크면 원본 유지
+    if scale >= 1.0 and not rotated and mime_type in PASSTHROUGH_MIMES and buf.tell() >= len(data):
+        return original
+    return PreparedImage(buf.getvalue(), prepared_mime, len(data), original.original_size, image.size, True)
+
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, asyncio.TimeoutError):
+        return True
+    if type(e).__name__ in RETRYABLE_ERRORS:
+        return True
+    return getattr(e, "code", None) in RETRYABLE_CODES
+
+
+def _backoff(attempt: int) -> float:
+    # full jitter: 0 ~ min(cap, base * 2^attempt)
+    return random.uniform(0, min(16.0, 1.0 * (2 ** attempt)))
+
+
+class GeminiImageClient:
+    """
+    배너 생성용 Gemini 이미지 클라이언트 (프로세스 전역 1개).
+    - genai.Client를 한 번만 만들어 커넥션을 재사용
+    - 입력 이미지를 업로드 전에 정규화 (축소 + 재인코딩 + 실제 MIME)
+    - 호출 1회 timeout + 재시도 포함 전체 deadline, 지수 백오프(full jitter) 재시도
+    - 호출별 업로드 크기와 지연 시간 집계
+    """
+
+    def __init__(self, model: str = GEMINI_IMAGE_MODEL, api_key: str | None = GOOGLE_API_KEY):
+        self.model = model
+        self.api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0, "retries": 0, "timeouts": 0, "errors": 0, "latency_seconds": 0.0,
+            "images": 0, "reencoded": 0, "input_bytes": 0, "upload_bytes": 0, "prepare_seconds": 0.0,
+        }
+
+    async def generate_image(self, prompt: str, images: list[bytes], *, aspect_ratio: str = "1:1",
+                             image_size: str = "2K", deadline: float | None = None) -> tuple[bytes, str]:
+        """
+        prompt + 이미지 여러 장 → (생성된 이미지 바이트, MIME 타입).
+        응답 바이트는 디코딩/재인코딩 없이 그대로 반환한다.
+        """
+        from google.genai import types
+
+        started = time.perf_counter()
+        with span("gemini.prepare", images=len(images)) as s:
+            prepared = await asyncio.gather(*(run_cpu(prepare_image, data) for data in images))
+            upload_bytes = sum(len(p.data) for p in prepared)
+            s.set("input_bytes", sum(p.original_bytes for p in prepared))
+            s.set("upload_bytes", upload_bytes)
+        stats = self._stats
+        stats["prepare_seconds"] += time.perf_counter() - started
+        stats["images"] += len(prepared)
+        stats["reencoded"] += sum(p.reencoded for p in prepared)
+        stats["input_bytes"] += sum(p.original_bytes for p in prepared)
+        stats["upload_bytes"] += upload_bytes
+
+        contents = [types.Part(text=prompt)]
+        # 순서대로 inline_data 추가
+        contents += [types.Part(inline_data=types.Blob(mime_type=p.mime_type, data=p.data)) for p in prepared]
+        config = types.GenerateContentConfig(
+            image_config=types.ImageConfig(aspect_ratio=aspect_ratio, image_size=image_size)
+        )
+
+        client = self._get_client()
+        response = await self._call(
+            lambda: client.aio.models.generate_content(model=self.model, contents=contents, config=config),
+            deadline=deadline, upload_bytes=upload_bytes,
+        )
+
+        for candidate in response.candidates or []:
+            for part in candidate.content.parts or []:
+                if part.inline_data:
+                    return part.inline_data.data, part.inline_data.mime_type or detect_mime(part.inline_data.data)
+
+        raise ValueError("Gemini 응답에 이미지 데이터가 없습니다.")
+
+    def stats(self) -> dict:
+        s = self._stats
+        return {
+            "model": self.model,
+            **{k: v for k, v in s.items() if not k.endswith("_seconds")},
+            "avg_latency_ms": round(s["latency_seconds"] / s["calls"] * 1000, 1) if s["calls"] else 0.0,
+            "avg_prepare_ms": round(s["prepare_seconds"] / s["images"] * 1000, 1) if s["images"] else 0.0,
+            "upload_ratio": round(s["upload_bytes"] / s["input_bytes"], 3) if s["input_bytes"] else 0.0,
+        }
+
+    async def aclose(self) -> None:
+        client, self._client = self._client, None
+        if client is None:
+            return
+        aclose = getattr(client.aio, "aclose", None)
+        if aclose is not None:
+            await aclose()
+        close = getattr(client, "close", None)
+        if close is not None:
+            close()
+
+    # ---- 내부 함수 ----
+
+    def _get_client(self):
+        # google-genai는 첫 배너 요청 시에만 import (텍스트 전용 워커 기동 시간 단축)
+        with self._lock:
+            if self._client is None:
+                from google import genai
+                from google.genai import types
+                self._client = genai.Client(
+                    api_key=self.api_key,
+                    http_options=types.HttpOptions(timeout=int(GEMINI_TIMEOUT_SECONDS * 1000)),
+                )
+            return self._client
+
+    async def _call(self, make_call, *, deadline: float | None, upload_bytes: int):
+        stats = self._stats
+        deadline_at = time.monotonic() + (deadline or GEMINI_DEADLINE_SECONDS)
+
+        for attempt in itertools.count():
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                stats["timeouts"] += 1
+                raise TimeoutError(f"Gemini 호출 deadline 초과 ({self.model})")
+
+            stats["calls"] += 1
+            started = time.perf_counter()
+            try:
+                with span("gemini.generate_image", kind="client", model=self.model,
+                          attempt=attempt, upload_bytes=upload_bytes):
+                    result = await asyncio.wait_for(make_call(), timeout=min(remaining, GEMINI_TIMEOUT_SECONDS))
+                stats["latency_seconds"] += time.perf_counter() - started
+                return result
+            except Exception as e:
+                stats["latency_seconds"] += time.perf_counter() - started
+                if isinstance(e, asyncio.TimeoutError):
+                    stats["timeouts"] += 1
+                backoff = _backoff(attempt)
+                if (attempt >= GEMINI_MAX_RETRIES or not _is_retryable(e)
+                        or time.monotonic() + backoff >= deadline_at):
+                    stats["errors"] += 1
+                    raise
+                stats["retries"] += 1
+                logger.warning(f"Gemini 재시도 {attempt + 1}/{GEMINI_MAX_RETRIES} ({type(e).__name__}), {backoff:.2f}s 대기")
+                await asyncio.sleep(backoff)
+
+
+gemini_client = GeminiImageClient()
@@ -0,0 +1,245 @@
+# services/jobs.py
+import time
+import uuid
+import asyncio
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from config import JOB_WORKERS, JOB_MAX_QUEUE, JOB_RESULT_TTL_SECONDS, JOB_CLEANUP_INTERVAL_SECONDS
+from telemetry import get_logger, span, request_scope, current_request_id
+from artifacts import artifact_scope
+
+logger = get_logger("jobs")
+
+# 진행 상황 콜백: progress(stage, message)
+ProgressCallback = Callable[[str, str], None]
+JobFunc = Callable[[ProgressCallback], Awaitable[Any]]
+
+TERMINAL_STATES = ("succeeded", "failed", "cancelled")
+
+
+def report(progress: ProgressCallback | None, stage: str, message: str) -> None:
+    """파이프라인 단계 로그 출력 + (작업 큐에서 실행 중이면) 진행 이벤트 전달"""
+    logger.info(message, extra={"fields": {"stage": stage}})
+    if progress is not None:
+        progress(stage, message)
+
+
+@contextmanager
+def stage(progress: ProgressCallback | None, name: str, message: str, *, pipeline: str):
+    """report() + 단계 타이밍 span ("{pipeline}.{name}")"""
+    report(progress, name, message)
+    with span(f"{pipeline}.{name}", pipeline=pipeline, stage=name) as s:
+        yield s
+
+
+class QueueFullError(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    func: JobFunc
+    status: str = "queued"  # queued → running → succeeded | failed | cancelled
+    stage: str | None = None
+    request_id: str | None = None  # 작업을 제출한 요청 (로그/trace 연결용)
+    result: Any = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    events: list[dict] = field(default_factory=list)
+    _task: asyncio.Task | None = None
+    _subscribers: list[asyncio.Queue] = field(default_factory=list)
+
+    def emit(self, event: dict) -> None:
+        event = {"job_id": self.id, "time": time.time(), **event}
+        self.events.append(event)
+        for q in self._subscribers:
+            q.put_nowait(event)
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_result and self.status == "succeeded":
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """
+    배너 생성 비동기 작업 큐.
+    - submit()은 바로 job id를 반환하고, 워커 workers개가 순서대로 실행
+      (GPU 동시 실행 제한은 작업 단위가 아니라 GPU executor가 맡는다)
+    - 대기 중(queued)인 작업이 max_queue개면 QueueFullError (→ 429).
+      취소된 작업은 워커가 꺼내기 전이라도 세지 않는다
+    - 완료 후 result_ttl이 지난 작업은 cleanup_interval마다 정리 (get()은 만료된 작업을 바로 숨긴다)
+    """
+
+    def __init__(self, workers: int, max_queue: int, result_ttl: float, cleanup_interval: float = 60.0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self.cleanup_interval = cleanup_interval
+        self._jobs: dict[str, Job] = {}
+        self._queue: asyncio.Queue[Job] | None = None
+        self._queued = 0  # status == "queued"인 작업 수 (취소된 작업은 큐에 남아 있어도 제외)
+        self._worker_tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self._worker_tasks.append(asyncio.create_task(self._janitor(), name="job-cleanup"))
+
+    async def stop(self) -> None:
+        for job in self._jobs.values():
+            if job.status not in TERMINAL_STATES:
+                self.cancel(job.id)
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def submit(self, kind: str, func: JobFunc) -> Job:
+        if self._queued >= self.max_queue:
+            raise QueueFullError(f"대기 중인 작업이 너무 많습니다 (최대 {self.max_queue}).")
+        job = Job(id=uuid.uuid4().hex, kind=kind, func=func, request_id=current_request_id())
+        self._queue.put_nowait(job)
+        self._queued += 1
+        self._jobs[job.id] = job
+        job.emit({"type": "status", "status": "queued", "queue_position": self._queued})
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        job = self._jobs.get(job_id)
+        if job is not None and self._expired(job, time.time()):
+            del self._jobs[job_id]
+            return None
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job.status in TERMINAL_STATES:
+            return False
+        if job.status == "queued":
+            # 아직 워커가 꺼내지 않은 작업은 상태만 바꾸고, 워커가 꺼낼 때 건너뛴다
+            self._queued -= 1
+            self._finish(job, "cancelled")
+        elif job._task is not None:
+            job._task.cancel()
+        return True
+
+    async def subscribe(self, job_id: str):
+        """지금까지의 이벤트를 먼저 보내고, 작업이 끝날 때까지 새 이벤트를 전달"""
+        job = self._jobs[job_id]
+        q: asyncio.Queue = asyncio.Queue()
+        for event in job.events:
+            q.put_nowait(event)
+        if job.status not in TERMINAL_STATES:
+            job._subscribers.append(q)
+        try:
+            while True:
+                if q.empty() and job.status in TERMINAL_STATES:
+                    return
+                event = await q.get()
+                yield event
+                if event.get("type") == "status" and event.get("status") in TERMINAL_STATES:
+                    return
+        finally:
+            if q in job._subscribers:
+                job._subscribers.remove(q)
+
+    def stats(self) -> dict:
+        counts: dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queued,
+            "max_queue": self.max_queue,
+            "jobs": counts,
+        }
+
+    # ---- 내부 함수 ----
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status == "cancelled":
+                    continue
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _janitor(self) -> None:
+        while True:
+            await asyncio.sleep(self.cleanup_interval)
+            self._cleanup()
+
+    async def _run(self, job: Job) -> None:
+        self._queued -= 1
+        job.status = "running"
+        job.started_at = time.time()
+        job.emit({"type": "status", "status": "running"})
+
+        def progress(stage: str, message: str = "") -> None:
+            job.stage = stage
+            job.emit({"type": "progress", "stage": stage, "message": message})
+
+        async def traced():
+            with request_scope(job.request_id or job.id), artifact_scope(job.id), \
+                    span(f"job.{job.kind}", job_id=job.id):
+                return await job.func(progress)
+
+        job._task = asyncio.create_task(traced())
+        try:
+            job.result = await job._task
+            self._finish(job, "succeeded")
+        except asyncio.CancelledError:
+            # 실행 중 취소: GPU executor에서 이미 돌고 있는 단계는 끝까지 실행되지만 결과는 버린다
+            self._finish(job, "cancelled")
+            if asyncio.current_task().cancelling():
+                raise  # 워커 자체가 종료되는 중
+        except Exception as e:
+            logger.exception(f"작업 실패 ({job.id}): {e}")
+            job.error = str(e)
+            self._finish(job, "failed")
+        finally:
+            job._task = None
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished_at = time.time()
+        job.emit({"type": "status", "status": status, "error": job.error})
+
+    def _expired(self, job: Job, now: float) -> bool:
+        return job.finished_at is not None and now - job.finished_at > self.result_ttl
+
+    def _cleanup(self) -> None:
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items() if self._expired(job, now)]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_manager = JobManager(
+    workers=JOB_WORKERS,
+    max_queue=JOB_MAX_QUEUE,
+    result_ttl=JOB_RESULT_TTL_SECONDS,
+    cleanup_interval=JOB_CLEANUP_INTERVAL_SECONDS,
+)
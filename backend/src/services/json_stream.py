@@ -0,0 +1,140 @@
+# services/json_stream.py
+import json
+from typing import Any
+
+Path = tuple[str | int, ...]
+
+
+class IncrementalJSONParser:
+    """
+    LLM 스트리밍 출력용 점진적 JSON 파서.
+    feed()로 조각을 넣으면, 그 사이에 완성된 값들을 (경로, 값) 목록으로 돌려준다.
+    예) {"captions": ["a", "b"]} → (("captions", 0), "a"), (("captions", 1), "b"), (("captions",), [...]), ((), {...})
+    - 첫 '{' 또는 '[' 이전의 텍스트(코드 펜스 등)는 무시
+    - 루트 값이 끝나면 이후 입력은 무시
+    - 형식이 깨진 입력을 만나면 error를 기록하고 이후 이벤트는 내보내지 않는다
+      (최종 해석은 호출 측에서 전체 텍스트로 다시 수행)
+    """
+
+    def __init__(self):
+        self._buf: list[str] = []
+        self._pos = 0
+        self._stack: list[dict] = []   # {"kind": "obj"|"arr", "path", "start", "key", "index", "expect"}
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        self._token_start: int | None = None  # 문자열/원시값 시작 위치
+        self.root: Any = None
+        self.error: Exception | None = None
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, chunk: str) -> list[tuple[Path, Any]]:
+        events: list[tuple[Path, Any]] = []
+        if self._done or self.error is not None:
+            return events
+        self._buf.append(chunk)
+        text = "".join(self._buf)
+        self._buf = [text]
+
+        try:
+            self._consume(text, events)
+        except (ValueError, IndexError) as e:
+            self.error = e
+        return events
+
+    # ---- 내부 함수 ----
+
+    def _consume(self, text: str, events: list) -> None:
+        while self._pos < len(text) and not self._done:
+            ch = text[self._pos]
+            i = self._pos
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._end_string(text, i, events)
+                continue
+
+            if not self._started:
+                if ch in "{[":
+                    self._started = True
+                    self._open(ch, i)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._token_start = i
+            elif ch in "{[":
+                self._open(ch, i)
+            elif ch in "}]":
+                self._end_primitive(text, i, events)
+                self._close(text, i, events)
+            elif ch == ":":
+                self._stack[-1]["expect"] = "value"
+            elif ch == ",":
+                self._end_primitive(text, i, events)
+                top = self._stack[-1]
+                if top["kind"] == "arr":
+                    top["index"] += 1
+                else:
+                    top["expect"] = "key"
+            elif ch.isspace():
+                self._end_primitive(text, i, events)
+            elif self._token_start is None:
+                self._token_start = i  # 숫자, true/false/null
+
+    def _child_path(self) -> Path:
+        if not self._stack:
+            return ()
+        top = self._stack[-1]
+        if top["kind"] == "arr":
+            return top["path"] + (top["index"],)
+        return top["path"] + (top["key"],)
+
+    def _open(self, ch: str, i: int) -> None:
+        self._stack.append({
+            "kind": "obj" if ch == "{" else "arr",
+            "path": self._child_path(),
+            "start": i,
+            "key": None,
+            "index": 0,
+            "expect": "key",
+        })
+
+    def _close(self, text: str, i: int, events: list) -> None:
+        frame = self._stack.pop()
+        value = json.loads(text[frame["start"]:i + 1])
+        self._emit(frame["path"], value, events)
+        if not self._stack:
+            self.root = value
+            self._done = True
+
+    def _end_string(self, text: str, i: int, events: list) -> None:
+        raw = text[self._token_start:i + 1]
+        self._token_start = None
+        top = self._stack[-1]
+        if top["kind"] == "obj" and top["expect"] == "key":
+            top["key"] = json.loads(raw)
+            top["expect"] = "colon"
+            return
+        self._emit(self._child_path(), json.loads(raw), events)
+
+    def _end_primitive(self, text: str, i: int, events: list) -> None:
+        if self._token_start is None:
+            return
+        raw = text[self._token_start:i]
+        self._token_start = None
+        self._emit(self._child_path(), json.loads(raw), events)
+
+    @staticmethod
+    def _emit(path: Path, value: Any, events: list) -> None:
+        events.append((path, value))
@@ -0,0 +1,302 @@
+# services/llm_gateway.py
+import json
+import time
+import random
+import asyncio
+import itertools
+import threading
+from typing import Any
+
+from config import (
+    OPENAI_API_KEY,
+    LLM_BACKEND,
+    LLM_TIMEOUT_SECONDS,
+    LLM_DEADLINE_SECONDS,
+    LLM_MAX_RETRIES,
+    LLM_MAX_CONCURRENCY,
+    LLM_RATE_PER_SECOND,
+    LLM_MAX_CONNECTIONS,
+    LLM_FAKE_LATENCY_MS,
+)
+from telemetry import get_logger, span
+
+logger = get_logger("llm")
+
+DEFAULT_MODEL = "gpt-5-nano"
+
+# 재시도 대상 HTTP 상태 코드 (rate limit, 일시적 서버 오류)
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError"}
+
+
+class TokenBucket:
+    """초당 rate개 요청 허용 (최대 capacity개까지 몰아서 사용 가능)"""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, asyncio.TimeoutError):
+        return True
+    if type(e).__name__ in RETRYABLE_ERRORS:
+        return True
+    return getattr(e, "status_code", None) in RETRYABLE_STATUS
+
+
+def _backoff(attempt: int) -> float:
+    # full jitter: 0 ~ min(cap, base * 2^attempt)
+    return random.uniform(0, min(8.0, 0.5 * (2 ** attempt)))
+
+
+def _build_fake_model(latency_ms: float):
+    """오프라인 부하 테스트용 가짜 채팅 모델 (네트워크 호출 없이 지연만 흉내)"""
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    # 모든 서비스가 .get()으로 읽는 키를 한 응답에 담아둔다
+    canned = json.dumps({
+        "captions": ["오늘의 추천 메뉴를 만나보세요.", "따뜻한 한 그릇으로 하루를 마무리하세요.", "지금 바로 방문하세요!"],
+        "one_liner": "오늘 하루, 맛있게 채우세요.",
+        "hashtags": ["#오늘의메뉴", "#맛집", "#데일리", "#추천", "#동네맛집"],
+        "overall_score": 7,
+        "factors": {"clarity": {"score": 7, "explanation": "fake"}},
+        "summary": "fake response",
+        "recommendations": {"captions": ["fake"], "one_liner": "fake", "hashtags": ["#fake"]},
+        "results": [{
+            "personaId": "fake", "personaName": "fake", "overall_score": 7, "feedback": "fake",
+            "captionFeedback": {"score": 7, "comment": "fake"},
+            "oneLinerFeedback": {"score": 7, "comment": "fake"},
+            "hashtagsFeedback": {"score": 7, "comment": "fake"},
+            "breakdown": {k: {"score": 7, "reason": "fake"} for k in ("emotion", "offer", "cta", "local", "trend")},
+        }],
+    }, ensure_ascii=False)
+
+    class LocalFakeChatModel(BaseChatModel):
+        latency: float = 0.3
+
+        @property
+        def _llm_type(self) -> str:
+            return "local-fake"
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+            time.sleep(self.latency)
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=canned))])
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+            await asyncio.sleep(self.latency)
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=canned))])
+
+    return LocalFakeChatModel(latency=latency_ms / 1000)
+
+
+class LLMGateway:
+    """
+    text/evaluation/persona 서비스가 공유하는 LLM 호출 게이트웨이.
+    - 커넥션 풀을 공유하는 httpx 클라이언트 1세트
+    - 모델별 동시 실행 제한(semaphore) + 토큰 버킷 rate limit
+    - 지수 백오프(full jitter) 재시도, 호출 전체 deadline
+    """
+
+    def __init__(self, backend: str = LLM_BACKEND):
+        self.backend = backend
+        self._models: dict[tuple, Any] = {}
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._http_client = None
+        self._http_async_client = None
+        self._stats: dict[str, dict[str, float]] = {}
+
+    def get_model(self, model: str = DEFAULT_MODEL, temperature: float | None = None):
+        key = (model, temperature)
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = self._build_model(model, temperature)
+            return self._models[key]
+
+    async def ainvoke(self, prompt, variables: dict, *, model: str = DEFAULT_MODEL,
+                      temperature: float | None = None, deadline: float | None = None,
+                      bind: dict | None = None):
+        """
+        (prompt | llm).ainvoke(variables)를 동시성/rate limit/재시도/deadline 정책으로 감싸서 실행.
+        deadline: 재시도를 포함한 전체 허용 시간(초)
+        bind: llm.bind(**bind)로 전달할 추가 옵션 (예: response_format)
+        """
+        llm = self.get_model(model, temperature)
+        if bind:
+            llm = llm.bind(**bind)
+        chain = prompt | llm if prompt is not None else llm
+        return await self.arun(lambda: chain.ainvoke(variables), model=model, deadline=deadline)
+
+    async def arun(self, make_call, *, model: str = DEFAULT_MODEL, deadline: float | None = None):
+        """make_call()이 반환하는 코루틴을 게이트웨이 정책으로 실행 (재시도 시 다시 호출)"""
+        stats = self._model_stats(model)
+        deadline_at = time.monotonic() + (deadline or LLM_DEADLINE_SECONDS)
+
+        async with self._semaphore(model):
+            for attempt in itertools.count():
+                await self._bucket(model).acquire()
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    stats["timeouts"] += 1
+                    raise TimeoutError(f"LLM 호출 deadline 초과 ({model})")
+
+                stats["calls"] += 1
+                started = time.perf_counter()
+                try:
+                    with span("llm.call", kind="client", model=model, attempt=attempt):
+                        result = await asyncio.wait_for(make_call(), timeout=min(remaining, LLM_TIMEOUT_SECONDS))
+                    stats["latency_seconds"] += time.perf_counter() - started
+                    return result
+                except Exception as e:
+                    stats["latency_seconds"] += time.perf_counter() - started
+                    if isinstance(e, asyncio.TimeoutError):
+                        stats["timeouts"] += 1
+                    if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                        stats["errors"] += 1
+                        raise
+
+                    backoff = _backoff(attempt)
+                    if time.monotonic() + backoff >= deadline_at:
+                        stats["errors"] += 1
+                        raise
+                    stats["retries"] += 1
+                    logger.warning(f"LLM 재시도 {attempt + 1}/{LLM_MAX_RETRIES} ({model}, {type(e).__name__}), {backoff:.2f}s 대기")
+                    await asyncio.sleep(backoff)
+
+    async def astream(self, prompt, variables: dict, *, model: str = DEFAULT_MODEL,
+                      temperature: float | None = None, deadline: float | None = None,
+                      bind: dict | None = None):
+        """
+        (prompt | llm).astream(variables) 스트리밍.
+        첫 조각을 받기 전의 실패만 재시도하고, 이미 출력이 나간 뒤의 실패는 그대로 전달한다.
+        """
+        llm = self.get_model(model, temperature)
+        if bind:
+            llm = llm.bind(**bind)
+        chain = prompt | llm
+        stats = self._model_stats(model)
+        deadline_at = time.monotonic() + (deadline or LLM_DEADLINE_SECONDS)
+
+        async with self._semaphore(model):
+            for attempt in itertools.count():
+                await self._bucket(model).acquire()
+                stats["calls"] += 1
+                started = time.perf_counter()
+                received = False
+                stream = chain.astream(variables)
+                try:
+                    with span("llm.stream", kind="client", model=model, attempt=attempt) as s:
+                        while True:
+                            remaining = deadline_at - time.monotonic()
+                            if remaining <= 0:
+                                raise asyncio.TimeoutError()
+                            try:
+                                chunk = await asyncio.wait_for(anext(stream),
+                                                               timeout=min(remaining, LLM_TIMEOUT_SECONDS))
+                            except StopAsyncIteration:
+                                break
+                            if not received:
+                                s.set("first_chunk_ms", round((time.perf_counter() - started) * 1000, 1))
+                                received = True
+                            yield chunk
+                    stats["latency_seconds"] += time.perf_counter() - started
+                    return
+                except Exception as e:
+                    stats["latency_seconds"] += time.perf_counter() - started
+                    if isinstance(e, asyncio.TimeoutError):
+                        stats["timeouts"] += 1
+                    backoff = _backoff(attempt)
+                    if (received or attempt >= LLM_MAX_RETRIES or not _is_retryable(e)
+                            or time.monotonic() + backoff >= deadline_at):
+                        stats["errors"] += 1
+                        raise
+                    stats["retries"] += 1
+                    logger.warning(f"LLM 스트림 재시도 {attempt + 1}/{LLM_MAX_RETRIES} ({model}, {type(e).__name__}), {backoff:.2f}s 대기")
+                    await asyncio.sleep(backoff)
+                finally:
+                    await stream.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "models": {
+                model: {
+                    **{k: v for k, v in s.items() if k != "latency_seconds"},
+                    "avg_latency_ms": round(s["latency_seconds"] / s["calls"] * 1000, 1) if s["calls"] else 0.0,
+                }
+                for model, s in self._stats.items()
+            },
+        }
+
+    async def aclose(self) -> None:
+        if self._http_async_client is not None:
+            await self._http_async_client.aclose()
+        if self._http_client is not None:
+            self._http_client.close()
+        self._http_client = self._http_async_client = None
+        self._models.clear()
+
+    # ---- 내부 함수 ----
+
+    def _build_model(self, model: str, temperature: float | None):
+        if self.backend == "fake":
+            return _build_fake_model(LLM_FAKE_LATENCY_MS)
+
+        import httpx
+        from langchain_openai import ChatOpenAI
+
+        if self._http_client is None:
+            limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                                  max_keepalive_connections=LLM_MAX_CONNECTIONS)
+            timeout = httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=10.0)
+            self._http_client = httpx.Client(limits=limits, timeout=timeout)
+            self._http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+
+        kwargs = {"temperature": temperature} if temperature is not None else {}
+        return ChatOpenAI(
+            model=model,
+            api_key=OPENAI_API_KEY,
+            timeout=LLM_TIMEOUT_SECONDS,
+            max_retries=0,  # 재시도는 게이트웨이에서 직접 처리
+            http_client=self._http_client,
+            http_async_client=self._http_async_client,
+            **kwargs,
+        )
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        return self._semaphores[model]
+
+    def _bucket(self, model: str) -> TokenBucket:
+        if model not in self._buckets:
+            self._buckets[model] = TokenBucket(LLM_RATE_PER_SECOND)
+        return self._buckets[model]
+
+    def _model_stats(self, model: str) -> dict[str, float]:
+        return self._stats.setdefault(model, {
+            "calls": 0, "retries": 0, "timeouts": 0, "errors": 0, "latency_seconds": 0.0,
+        })
+
+
+llm_gateway = LLMGateway()
@@ -1,41 +1,31 @@
 # services/persona_evaluation.py
-import json
-import sys
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+import asyncio
+import weakref
 from models import (
+    Persona,
     PersonaEvaluationPayload,
     PersonaEvaluationResponse,
     PersonaEvaluationResult,
-    PersonaEvaluationFeedback,
-    PersonaBreakdownItem,
+    PersonaEvaluationShard,
+)
+from services.prompts import prompt_registry
+from services.structured_output import structured_output
+from telemetry import get_logger, log_payload
+from config import (
+    PERSONA_EVAL_MODE,
+    PERSONA_SHARD_SIZE,
+    PERSONA_MAX_CONCURRENCY,
+    PERSONA_SHARD_TIMEOUT_SECONDS,
 )
-from config import OPENAI_API_KEY
-
-# 싱글턴 LLM 객체
-llm = ChatOpenAI(model="gpt-5-nano", api_key=OPENAI_API_KEY)
 
-def evaluate_personas(payload: PersonaEvaluationPayload) -> PersonaEvaluationResponse:
-    # 모든 페르소나를 한 번에 프롬프트에 포함
-    personas_text = "\n".join([
-        f"- {p.id}: {p.name} ({p.description}), weights={p.weights}"
-        for p in payload.selectedPersonas
-    ])
-
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "너는 인스타그램 마케팅 전문가이며, 여러 페르소나 관점에서 광고 문구를 평가한다."),
-        ("user", """선택된 페르소나들:
-{personas_text}
+logger = get_logger("persona_evaluation")
 
-캡션: {caption}
-원라이너: {one_liner}
-해시태그: {hashtags}
+PERSONA_EVAL_MODES = ("sharded", "single")
 
-각 페르소나별로 아래 JSON 형식의 평가 결과를 배열로 반환해줘:
+_SYSTEM_MESSAGE = ("system", "너는 인스타그램 마케팅 전문가이며, 여러 페르소나 관점에서 광고 문구를 평가한다.")
 
-{{
-  "results": [
-    {{
+# 페르소나 1명분 평가 결과 형식 (단일/분할 프롬프트 공용)
+_RESULT_FORMAT = """    {{
       "personaId": "<string>",
       "personaName": "<string>",
       "overall_score": <int>,
@@ -50,7 +40,26 @@ def evaluate_personas(payload: PersonaEvaluationPayload) -> PersonaEvaluationRes
         "local": {{ "score": <int>, "reason": "<string>" }},
         "trend": {{ "score": <int>, "reason": "<string>" }}
       }}
-    }}
+    }}"""
+
+_CONTENT = """선택된 페르소나들:
+{personas_text}
+
+캡션: {caption}
+원라이너: {one_liner}
+해시태그: {hashtags}
+"""
+
+_VARIABLES = ("personas_text", "caption", "one_liner", "hashtags")
+
+prompt_registry.register("evaluate_personas", [
+    _SYSTEM_MESSAGE,
+    ("user", _CONTENT + """
+각 페르소나별로 아래 JSON 형식의 평가 결과를 배열로 반환해줘:
+
+{{
+  "results": [
+""" + _RESULT_FORMAT + """
   ],
   "summary": {{
     "bestPersonaId": "<string>",
@@ -58,64 +67,159 @@ def evaluate_personas(payload: PersonaEvaluationPayload) -> PersonaEvaluationRes
     "notes": ["<string>", "<string>", ...]
   }}
 }}
-""")
-    ])
+"""),
+], input_variables=_VARIABLES)
+
+# 분할 평가: 점수 요약(bestPersonaId/averageScore)은 서버에서 계산하므로 결과 배열 + 정성적 메모만 요청
+prompt_registry.register("evaluate_persona_shard", [
+    _SYSTEM_MESSAGE,
+    ("user", _CONTENT + """
+각 페르소나별로 아래 JSON 형식의 평가 결과를 배열로 반환해줘.
+personaId/personaName은 위 목록의 값을 그대로 사용해:
+
+{{
+  "results": [
+""" + _RESULT_FORMAT + """
+  ],
+  "notes": ["<string>", "<string>", ...]
+}}
+"""),
+], input_variables=_VARIABLES)
+
+# 분할 호출 동시 실행 제한 (요청 여러 개가 동시에 와도 전체 상한 유지)
+# asyncio.Semaphore는 처음 쓰인 이벤트 루프에 묶이므로 실행 중인 루프마다 따로 만든다
+_shard_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+    weakref.WeakKeyDictionary()
+
+
+async def evaluate_personas(payload: PersonaEvaluationPayload,
+                            mode: str | None = None) -> PersonaEvaluationResponse:
+    mode = mode or PERSONA_EVAL_MODE
+    # 같은 id가 여러 번 오면 처음 것만 한 번 평가 (결과/요약이 id 기준이므로)
+    unique: dict[str, Persona] = {}
+    for p in payload.selectedPersonas:
+        unique.setdefault(p.id, p)
+    if len(unique) != len(payload.selectedPersonas):
+        logger.info(f"중복 페르소나 제외: {len(payload.selectedPersonas)} → {len(unique)}")
+        payload = payload.model_copy(update={"selectedPersonas": list(unique.values())})
+    if mode == "single":
+        return await _evaluate_single(payload)
+    return await _evaluate_sharded(payload)
 
-    variables = {
-        "personas_text": personas_text,
+
+def _build_variables(payload: PersonaEvaluationPayload, personas: list[Persona]) -> dict:
+    return {
+        "personas_text": "\n".join([
+            f"- {p.id}: {p.name} ({p.description}), weights={p.weights}"
+            for p in personas
+        ]),
         "caption": payload.caption,
         "one_liner": payload.one_liner or "",
         "hashtags": ", ".join(payload.hashtags or []),
     }
 
-    try:
-        # ✅ 디버그 출력
-        print("=== Prompt input_variables ===", file=sys.stderr)
-        print(prompt.input_variables, file=sys.stderr)
-
-        messages = prompt.format_messages(**variables)
-        print("=== Rendered messages ===", file=sys.stderr)
-        for i, m in enumerate(messages):
-            print(f"[{i}] role={getattr(m, 'type', 'unk')} content:\n{m.content}\n", file=sys.stderr)
-
-        # LLM 단일 호출
-        response = (prompt | llm).invoke(variables)
-        print("=== Raw LLM Response ===", file=sys.stderr)
-        print(response.content, file=sys.stderr)
-
-        data = json.loads(response.content.strip())
-
-        results = []
-        for r in data.get("results", []):
-            results.append(
-                PersonaEvaluationResult(
-                    personaId=r.get("personaId", ""),
-                    personaName=r.get("personaName", ""),
-                    overall_score=r.get("overall_score", 0),
-                    feedback=r.get("feedback", ""),
-                    captionFeedback=PersonaEvaluationFeedback(
-                        score=r.get("captionFeedback", {}).get("score", 0),
-                        comment=r.get("captionFeedback", {}).get("comment", "")
-                    ),
-                    oneLinerFeedback=PersonaEvaluationFeedback(
-                        score=r.get("oneLinerFeedback", {}).get("score", 0),
-                        comment=r.get("oneLinerFeedback", {}).get("comment", "")
-                    ),
-                    hashtagsFeedback=PersonaEvaluationFeedback(
-                        score=r.get("hashtagsFeedback", {}).get("score", 0),
-                        comment=r.get("hashtagsFeedback", {}).get("comment", "")
-                    ),
-                    breakdown={
-                        k: PersonaBreakdownItem(score=v.get("score", 0), reason=v.get("reason", ""))
-                        for k, v in r.get("breakdown", {}).items()
-                    }
-                )
-            )
 
-        summary = data.get("summary", {})
+async def _evaluate_single(payload: PersonaEvaluationPayload) -> PersonaEvaluationResponse:
+    # 모든 페르소나를 한 번에 프롬프트에 포함
+    prompt = prompt_registry.get("evaluate_personas")
+    variables = _build_variables(payload, payload.selectedPersonas)
+
+    try:
+        # 바인딩된 변수 (샘플링된 요청만, 렌더링된 프롬프트 크기는 prompt_registry.stats()에서 확인)
+        log_payload(logger, "evaluate_personas 변수", variables)
 
-        return PersonaEvaluationResponse(results=results, summary=summary)
+        # LLM 단일 호출 (형식이 깨진 응답은 추출/교정으로 복구)
+        return await structured_output.ainvoke(prompt, variables, PersonaEvaluationResponse,
+                                               name="evaluate_personas")
 
     except Exception as e:
-        print(f"❌ LLM 평가 중 오류 발생: {str(e)}", file=sys.stderr)
+        logger.exception(f"❌ LLM 평가 중 오류 발생: {e}")
         raise e
+
+
+async def _evaluate_sharded(payload: PersonaEvaluationPayload) -> PersonaEvaluationResponse:
+    """
+    페르소나를 PERSONA_SHARD_SIZE명씩 나눠 병렬로 평가.
+    - 묶음별로 시간 초과/형식 오류가 나도 나머지 결과는 그대로 반환 (summary.partial)
+    - averageScore / bestPersonaId는 LLM 대신 서버에서 계산
+    """
+    personas = payload.selectedPersonas
+    size = max(1, PERSONA_SHARD_SIZE)
+    shards = [personas[i:i + size] for i in range(0, len(personas), size)]
+
+    outcomes = await asyncio.gather(
+        *(_evaluate_shard(payload, shard) for shard in shards),
+        return_exceptions=True,
+    )
+
+    evaluated: dict[str, PersonaEvaluationResult] = {}
+    notes: list[str] = []
+    failures: dict[str, str] = {}
+    for shard, outcome in zip(shards, outcomes):
+        if isinstance(outcome, BaseException):
+            reason = "시간 초과" if isinstance(outcome, asyncio.TimeoutError) else str(outcome)
+            logger.warning(f"❌ 페르소나 평가 실패 ({', '.join(p.id for p in shard)}): {reason}")
+            failures.update({p.id: reason for p in shard})
+            continue
+        matched, shard_notes = outcome
+        evaluated.update(matched)
+        notes.extend(shard_notes)
+        failures.update({p.id: "응답에 결과가 없음" for p in shard if p.id not in matched})
+
+    # 요청에 들어온 순서대로 정렬
+    results = [evaluated[p.id] for p in personas if p.id in evaluated]
+    if not results:
+        raise RuntimeError(f"모든 페르소나 평가에 실패했습니다: {failures}")
+
+    return PersonaEvaluationResponse(results=results, summary=_summarize(personas, results, notes, failures))
+
+
+async def _evaluate_shard(payload: PersonaEvaluationPayload,
+                          shard: list[Persona]) -> tuple[dict[str, PersonaEvaluationResult], list[str]]:
+    async def run() -> PersonaEvaluationShard:
+        async with _shard_semaphore():
+            return await structured_output.ainvoke(
+                prompt_registry.get("evaluate_persona_shard"), _build_variables(payload, shard),
+                PersonaEvaluationShard, name="evaluate_persona_shard",
+            )
+
+    # 대기 시간까지 포함해서 묶음 하나가 PERSONA_SHARD_TIMEOUT_SECONDS를 넘지 않도록
+    response = await asyncio.wait_for(run(), timeout=PERSONA_SHARD_TIMEOUT_SECONDS)
+
+    # personaId/personaName은 요청 값으로 고정 (LLM이 바꿔 쓴 값은 신뢰하지 않음)
+    if len(shard) == 1 and response.results:
+        p = shard[0]
+        return {p.id: response.results[0].model_copy(update={"personaId": p.id, "personaName": p.name})}, response.notes
+
+    by_id = {p.id: p for p in shard}
+    by_name = {p.name: p for p in shard}
+    matched = {}
+    for r in response.results:
+        p = by_id.get(r.personaId) or by_name.get(r.personaName)
+        if p is not None and p.id not in matched:
+            matched[p.id] = r.model_copy(update={"personaId": p.id, "personaName": p.name})
+    return matched, response.notes
+
+
+def _shard_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    if loop not in _shard_semaphores:
+        _shard_semaphores[loop] = asyncio.Semaphore(PERSONA_MAX_CONCURRENCY)
+    return _shard_semaphores[loop]
+
+
+def _summarize(personas: list[Persona], results: list[PersonaEvaluationResult],
+               notes: list[str], failures: dict[str, str]) -> dict:
+    scores = [r.overall_score for r in results]
+    # 동점이면 요청 순서상 앞의 페르소나
+    best = max(results, key=lambda r: r.overall_score)
+    names = {p.id: p.name for p in personas}
+    return {
+        "bestPersonaId": best.personaId,
+        # 사사오입 (round()는 6.5 → 6으로 짝수 쪽 반올림). 점수는 0 이상의 정수이므로 정수 연산으로
+        "averageScore": (2 * sum(scores) + len(scores)) // (2 * len(scores)),
+        # LLM이 남긴 정성적 메모 + 실패한 페르소나 안내
+        "notes": notes + [f"{names[pid]}: 평가 실패 ({reason})" for pid, reason in failures.items()],
+        "partial": bool(failures),
+        "failedPersonaIds": list(failures),
+    }
@@ -0,0 +1,163 @@
+# services/prompts.py
+import time
+import threading
+from dataclasses import dataclass, field
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from config import PROMPT_VERSIONS, PROMPT_TOKENIZER
+from telemetry import get_logger
+
+logger = get_logger("prompts")
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """로컬 tiktoken으로 토큰 수 계산 (인코딩을 불러올 수 없으면 글자 수 기반 추정)"""
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(PROMPT_TOKENIZER)
+                except Exception as e:
+                    logger.warning(f"tokenizer '{PROMPT_TOKENIZER}' 로드 실패, 추정값 사용: {e}")
+                    _encoding = False
+    if _encoding is False:
+        return len(text) // 2 + 1  # 한국어 위주 텍스트 기준 대략적인 추정
+    return len(_encoding.encode(text))
+
+
+@dataclass
+class _Template:
+    name: str
+    version: str
+    template: ChatPromptTemplate
+    runnable: Runnable
+    static_text: str                   # 변수를 비운 렌더링 결과 (템플릿 자체의 크기)
+    static_tokens: int | None = None
+    renders: int = 0
+    render_seconds: float = 0.0
+    max_render_seconds: float = 0.0
+    tokens_total: int = 0
+    tokens_max: int = 0
+    tokens_last: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class PromptRegistry:
+    """
+    서비스별 ChatPromptTemplate을 서버 시작 시 한 번만 만들고 검증해서 재사용.
+    - 템플릿마다 버전을 두고, PROMPT_VERSIONS로 사용할 버전을 고정할 수 있다
+    - get()이 돌려주는 Runnable은 렌더링 시간과 토큰 수를 기록한다 (prompt | llm 그대로 사용 가능)
+    """
+
+    def __init__(self, pinned_versions: dict[str, str] | None = None):
+        self.pinned_versions = pinned_versions or {}
+        self._templates: dict[str, dict[str, _Template]] = {}
+        self._active: dict[str, str] = {}
+
+    def register(self, name: str, messages: list, *, version: str = "v1",
+                 input_variables: tuple[str, ...] | None = None) -> None:
+        """
+        템플릿 생성 + 검증. 잘못된 템플릿은 import 시점(서버 시작)에 바로 실패한다.
+        input_variables: 기대하는 변수 목록 (지정하면 템플릿의 변수와 정확히 일치해야 함)
+        """
+        template = ChatPromptTemplate.from_messages(messages)
+        found = set(template.input_variables)
+        if input_variables is not None and found != set(input_variables):
+            raise ValueError(f"프롬프트 '{name}@{version}' 변수 불일치: 기대 {sorted(input_variables)}, 실제 {sorted(found)}")
+        # 빈 값으로 한 번 렌더링해서 형식 오류 확인
+        static_text = template.format_prompt(**{v: "" for v in found}).to_string()
+
+        def render(variables: dict) -> PromptValue:
+            return self._render(entry, variables)
+
+        async def arender(variables: dict) -> PromptValue:
+            return self._render(entry, variables)  # 렌더링은 가벼우므로 스레드로 넘기지 않음
+
+        entry = _Template(
+            name=name,
+            version=version,
+            template=template,
+            runnable=RunnableLambda(render, afunc=arender, name=f"{name}@{version}"),
+            static_text=static_text,
+        )
+        self._templates.setdefault(name, {})[version] = entry
+        pinned = self.pinned_versions.get(name)
+        if pinned is None or pinned == version:
+            self._active[name] = version
+
+    def validate(self) -> None:
+        """
+        서버 시작 시 호출: PROMPT_VERSIONS로 고정한 버전이 모두 있는지 확인하고,
+        토크나이저를 미리 로드해서 템플릿별 고정 토큰 수를 계산한다.
+        """
+        for name, version in self.pinned_versions.items():
+            if version not in self._templates.get(name, {}):
+                raise ValueError(f"PROMPT_VERSIONS: 프롬프트 '{name}'에 버전 '{version}'이 없습니다.")
+        for versions in self._templates.values():
+            for t in versions.values():
+                t.static_tokens = count_tokens(t.static_text)
+        logger.info(f"{', '.join(f'{n}@{v}' for n, v in self._active.items())} 준비 완료")
+
+    def get(self, name: str) -> Runnable:
+        """prompt | llm 체인에 그대로 넣을 수 있는 Runnable (변수 dict → PromptValue)"""
+        return self._entry(name).runnable
+
+    def template(self, name: str) -> ChatPromptTemplate:
+        return self._entry(name).template
+
+    def version(self, name: str) -> str:
+        return self._entry(name).version
+
+    def render(self, name: str, variables: dict) -> PromptValue:
+        return self._render(self._entry(name), variables)
+
+    def stats(self) -> dict:
+        templates = {}
+        for name, versions in self._templates.items():
+            for version, t in versions.items():
+                templates[f"{name}@{version}"] = {
+                    "active": self._active.get(name) == version,
+                    "input_variables": t.template.input_variables,
+                    "static_tokens": t.static_tokens,
+                    "renders": t.renders,
+                    "avg_render_ms": round(t.render_seconds / t.renders * 1000, 3) if t.renders else 0.0,
+                    "max_render_ms": round(t.max_render_seconds * 1000, 3),
+                    "avg_tokens": round(t.tokens_total / t.renders, 1) if t.renders else 0.0,
+                    "max_tokens": t.tokens_max,
+                    "last_tokens": t.tokens_last,
+                }
+        return {"tokenizer": PROMPT_TOKENIZER if _encoding is not False else "estimate", "templates": templates}
+
+    # ---- 내부 함수 ----
+
+    def _entry(self, name: str) -> _Template:
+        if name not in self._active:
+            raise KeyError(f"등록되지 않은 프롬프트입니다: {name}")
+        return self._templates[name][self._active[name]]
+
+    @staticmethod
+    def _render(t: _Template, variables: dict) -> PromptValue:
+        started = time.perf_counter()
+        value = t.template.format_prompt(**variables)
+        elapsed = time.perf_counter() - started
+        tokens = count_tokens(value.to_string())
+        with t._lock:
+            t.renders += 1
+            t.render_seconds += elapsed
+            t.max_render_seconds = max(t.max_render_seconds, elapsed)
+            t.tokens_total += tokens
+            t.tokens_max = max(t.tokens_max, tokens)
+            t.tokens_last = tokens
+        return value
+
+
+# 전역 레지스트리 (각 서비스 모듈이 import 시점에 자기 템플릿을 등록)
+prompt_registry = PromptRegistry(pinned_versions=PROMPT_VERSIONS)
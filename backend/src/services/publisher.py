@@ -0,0 +1,472 @@
+# services/publisher.py
+import os
+import time
+import uuid
+import random
+import sqlite3
+import asyncio
+import threading
+from dataclasses import dataclass, fields
+
+from config import (
+    PUBLISH_QUEUE_PATH,
+    PUBLISH_MEDIA_DIR,
+    PUBLISH_CONCURRENCY,
+    PUBLISH_MAX_ATTEMPTS,
+    PUBLISH_CONTAINER_TIMEOUT_SECONDS,
+    PUBLISH_WAIT_SECONDS,
+    PUBLISH_PROCESS_POOL_MIN,
+)
+from services.storage import (
+    ContainerFailedError,
+    PreparedMedia,
+    check_publish_config,
+    public_url,
+    upload_blob,
+    delete_blob,
+    create_container,
+    wait_for_container,
+    publish_container,
+    prepare_instagram_jpeg,
+)
+from pipeline.executors import run_cpu, run_process
+from telemetry import get_logger, span, current_request_id
+
+logger = get_logger("publisher")
+
+# queued → uploaded(GCS) → container_created → published | failed | cancelled
+# 단계가 끝날 때마다 기록하므로 재시도는 마지막으로 끝난 단계 다음부터 (blob 재업로드 없음)
+TERMINAL_STATES = ("published", "failed", "cancelled")
+
+# GCS SDK 예외 중 재시도 대상
+RETRYABLE_ERRORS = {"ServiceUnavailable", "TooManyRequests", "InternalServerError", "BadGateway",
+                    "GatewayTimeout", "RetryError", "ConnectionError", "Timeout", "TimeoutError"}
+
+# 한 게시물을 처리하는 워커가 죽어도 이 시간이 지나면 다른 워커(프로세스)가 다시 가져간다
+_LEASE_SECONDS = PUBLISH_CONTAINER_TIMEOUT_SECONDS + 300
+# 재시도 대기: full jitter, 최대 10분
+_RETRY_BASE = 15.0
+_RETRY_MAX = 600.0
+# 예약 게시물이 없을 때도 이 간격으로 다른 프로세스가 넣은 게시물을 확인
+_IDLE_POLL_SECONDS = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id TEXT PRIMARY KEY,
+    caption TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    blob_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    scheduled_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    container_id TEXT,
+    publish_id TEXT,
+    error TEXT,
+    request_id TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    lease_until REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS posts_due ON posts (status, next_attempt_at);
+"""
+
+
+@dataclass
+class Post:
+    id: str
+    caption: str
+    filename: str
+    blob_name: str
+    status: str
+    scheduled_at: float
+    next_attempt_at: float
+    attempts: int = 0
+    container_id: str | None = None
+    publish_id: str | None = None
+    error: str | None = None
+    request_id: str | None = None  # 게시물을 넣은 요청 (로그/trace 연결용)
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "post_id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "scheduled_at": self.scheduled_at,
+            "next_attempt_at": self.next_attempt_at if self.status not in TERMINAL_STATES else None,
+            "attempts": self.attempts,
+            "container_id": self.container_id,
+            "publish_id": self.publish_id,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+_POST_FIELDS = [f.name for f in fields(Post)]
+
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    return bool(getattr(e, "retryable", False)) or type(e).__name__ in RETRYABLE_ERRORS
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(_RETRY_BASE / 2, min(_RETRY_MAX, _RETRY_BASE * (2 ** attempt)))
+
+
+class PublishQueue:
+    """
+    Instagram 게시 대기열 (SQLite 파일 + JPEG 파일로 서버 재시작 후에도 유지).
+    - submit()은 JPEG 준비(조건에 맞는 JPEG는 그대로) 후 바로 반환하고, 워커가 scheduled_at 이후에 게시
+    - 단계(GCS 업로드 / 컨테이너 생성 / 게시)마다 결과를 기록 → 재시도는 남은 단계만
+    - 컨테이너는 status_code가 FINISHED가 될 때까지 확인한 뒤 게시
+    - 일시 오류는 지수 백오프로 최대 max_attempts번, 게시물별 lease로 여러 프로세스가 같은 파일을 써도 중복 게시 없음
+    """
+
+    def __init__(self, path: str, media_dir: str, concurrency: int, max_attempts: int):
+        self.path = path
+        self.media_dir = media_dir
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._wake: asyncio.Event | None = None
+        self._worker_task: asyncio.Task | None = None
+        self._active: dict[str, asyncio.Task] = {}
+        self._waiters: dict[str, asyncio.Event] = {}
+        self._preparing = 0
+        self._media_stats = {"prepared": 0, "reencoded": 0, "input_bytes": 0, "output_bytes": 0}
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self._open)
+        self._wake = asyncio.Event()
+        self._worker_task = asyncio.create_task(self._worker(), name="publish-worker")
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._worker_task, *self._active.values()) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_task = None
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
+
+    async def submit(self, file_bytes: bytes, filename: str, caption: str,
+                     scheduled_at: float | None = None) -> Post:
+        """이미지를 JPEG으로 변환해 저장하고 게시 대기열에 추가 (scheduled_at: unix time, None이면 바로)"""
+        check_publish_config()
+        media = await self._prepare(file_bytes)
+        jpeg_bytes = media.data
+
+        now = time.time()
+        post_id = uuid.uuid4().hex
+        stem = os.path.basename(filename).rsplit(".", 1)[0] or "post"
+        due = max(now, scheduled_at or now)
+        post = Post(
+            id=post_id, caption=caption, filename=filename,
+            # 게시물마다 고정된 이름 → 재시도해도 같은 blob
+            blob_name=f"{stem}_{int(now)}_{post_id[:8]}.jpg",
+            status="queued", scheduled_at=due, next_attempt_at=due,
+            request_id=current_request_id(), created_at=now, updated_at=now,
+        )
+        await asyncio.to_thread(self._insert, post, jpeg_bytes)
+        logger.info(f"게시 대기열 추가: {post.id} ({len(jpeg_bytes)} bytes, {due - now:.0f}s 후)")
+        self._wake.set()
+        return post
+
+    async def get(self, post_id: str) -> Post | None:
+        return await asyncio.to_thread(self._get, post_id)
+
+    async def recent(self, status: str | None = None, limit: int = 50) -> list[Post]:
+        return await asyncio.to_thread(self._recent, status, limit)
+
+    async def wait(self, post_id: str, timeout: float = PUBLISH_WAIT_SECONDS) -> Post | None:
+        """게시물이 끝날 때까지(published/failed/cancelled) 최대 timeout초 대기 후 현재 상태 반환"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        event = self._waiters.setdefault(post_id, asyncio.Event())
+        try:
+            while True:
+                post = await self.get(post_id)
+                remaining = deadline - loop.time()
+                if post is None or post.status in TERMINAL_STATES or remaining <= 0:
+                    return post
+                # 다른 프로세스가 처리하는 경우도 있으므로 이벤트만 믿지 않고 주기적으로 다시 읽는다
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(remaining, 1.0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiters.pop(post_id, None)
+
+    async def cancel(self, post_id: str) -> bool:
+        """처리 중이 아닌 대기 게시물만 취소 (이미 게시 요청을 보낸 게시물은 취소하지 않음)"""
+        post = await asyncio.to_thread(self._claim_one, post_id)
+        if post is None:
+            return False
+        await self._finish(post, "cancelled")
+        return True
+
+    def stats(self) -> dict:
+        counts: dict[str, int] = {}
+        if self._db is not None:
+            with self._lock:
+                rows = self._db.execute("SELECT status, COUNT(*) FROM posts GROUP BY status").fetchall()
+            counts = {status: count for status, count in rows}
+        return {
+            "concurrency": self.concurrency,
+            "active": len(self._active),
+            "max_attempts": self.max_attempts,
+            "posts": counts,
+            "media": dict(self._media_stats),
+        }
+
+    # ---- 내부 함수 ----
+
+    async def _prepare(self, file_bytes: bytes) -> PreparedMedia:
+        """
+        JPEG 준비. 여러 게시물이 동시에 들어오면(대량 예약) GIL 경합을 피해 프로세스 풀에서 인코딩.
+        한두 장은 프로세스 간 전달 비용이 더 커서 스레드 풀 그대로.
+        """
+        self._preparing += 1
+        use_processes = self._preparing >= PUBLISH_PROCESS_POOL_MIN
+        try:
+            with span("instagram.prepare_media", executor="process" if use_processes else "thread",
+                      input_bytes=len(file_bytes)) as s:
+                run = run_process if use_processes else run_cpu
+                media = await run(prepare_instagram_jpeg, file_bytes)
+                s.set("output_bytes", len(media.data))
+                s.set("reencoded", media.reencoded)
+        finally:
+            self._preparing -= 1
+        self._media_stats["prepared"] += 1
+        self._media_stats["reencoded"] += media.reencoded
+        self._media_stats["input_bytes"] += media.original_bytes
+        self._media_stats["output_bytes"] += len(media.data)
+        return media
+
+    async def _worker(self) -> None:
+        while True:
+            free = self.concurrency - len(self._active)
+            if free > 0:
+                try:
+                    posts = await asyncio.to_thread(self._claim_due, free)
+                except Exception as e:
+                    logger.exception(f"게시 대기열 조회 실패: {e}")
+                    posts = []
+                for post in posts:
+                    task = asyncio.create_task(self._process(post), name=f"publish-{post.id}")
+                    self._active[post.id] = task
+                    task.add_done_callback(lambda _, post_id=post.id: self._on_done(post_id))
+
+            self._wake.clear()
+            try:
+                delay = await asyncio.to_thread(self._next_due_in)
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _on_done(self, post_id: str) -> None:
+        self._active.pop(post_id, None)
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _process(self, post: Post) -> None:
+        with span("instagram.publish_post", post_id=post.id, attempt=post.attempts,
+                  request_id=post.request_id) as s:
+            try:
+                if post.status == "queued":
+                    data = await asyncio.to_thread(self._read_media, post.id)
+                    with span("gcs.upload", kind="client", bytes=len(data)) as upload_span:
+                        created = await asyncio.to_thread(upload_blob, post.blob_name, data)
+                        upload_span.set("created", created)
+                    await self._update(post, status="uploaded")
+
+                if post.status == "uploaded":
+                    container_id = await create_container(public_url(post.blob_name), post.caption)
+                    await self._update(post, status="container_created", container_id=container_id)
+
+                state = await wait_for_container(post.container_id)
+                if state == "PUBLISHED":
+                    # 이전 시도에서 게시 요청은 처리됐지만 응답을 받지 못한 경우 → 다시 게시하지 않음
+                    logger.warning(f"컨테이너 {post.container_id}는 이미 게시됨 ({post.id})")
+                    publish_id = None
+                else:
+                    publish_id = await publish_container(post.container_id)
+                await self._finish(post, "published", publish_id=publish_id)
+                s.set("status", "published")
+
+            except asyncio.CancelledError:
+                # 서버 종료: lease만 풀어두고 다음 기동 때 이어서 처리
+                await asyncio.to_thread(self._write, post, lease_until=0)
+                raise
+            except Exception as e:
+                s.set("status", "error")
+                await self._retry_or_fail(post, e)
+
+    async def _retry_or_fail(self, post: Post, e: Exception) -> None:
+        changes = {}
+        if isinstance(e, ContainerFailedError):
+            # 컨테이너만 다시 만든다 (GCS blob은 그대로 재사용)
+            changes = {"status": "uploaded", "container_id": None}
+        attempts = post.attempts + 1
+        if not _is_retryable(e) or attempts >= self.max_attempts:
+            logger.exception(f"Instagram 게시 실패 ({post.id}, {attempts}회): {e}")
+            await self._finish(post, "failed", attempts=attempts, error=str(e))
+            return
+        backoff = _backoff(post.attempts)
+        logger.warning(f"Instagram 게시 재시도 {attempts}/{self.max_attempts} ({post.id}, {type(e).__name__}: {e}), "
+                       f"{backoff:.0f}s 후")
+        await self._update(post, attempts=attempts, error=str(e), next_attempt_at=time.time() + backoff,
+                           lease_until=0, **changes)
+
+    async def _update(self, post: Post, **changes) -> None:
+        await asyncio.to_thread(self._write, post, **changes)
+
+    async def _finish(self, post: Post, status: str, **changes) -> None:
+        await self._update(post, status=status, lease_until=0, **changes)
+        # 게시가 끝났으면(성공/실패/취소) 임시 blob과 로컬 JPEG 정리 (업로드 전이면 NotFound → 무시)
+        try:
+            await asyncio.to_thread(delete_blob, post.blob_name)
+        except Exception as e:
+            logger.warning(f"GCS blob 삭제 실패 ({post.blob_name}): {e}")
+        await asyncio.to_thread(self._remove_media, post.id)
+        event = self._waiters.get(post.id)
+        if event is not None:
+            event.set()
+
+    # ---- SQLite (asyncio.to_thread에서 호출) ----
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        os.makedirs(self.media_dir, exist_ok=True)
+        with self._lock:
+            # autocommit + 필요한 곳만 BEGIN IMMEDIATE (여러 프로세스가 같은 파일을 쓸 때 lease 경쟁 방지)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+
+    def _insert(self, post: Post, jpeg_bytes: bytes) -> None:
+        path = self._media_path(post.id)
+        with open(path + ".tmp", "wb") as f:
+            f.write(jpeg_bytes)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        columns = ", ".join(_POST_FIELDS)
+        placeholders = ", ".join("?" for _ in _POST_FIELDS)
+        with self._lock:
+            self._db.execute(f"INSERT INTO posts ({columns}) VALUES ({placeholders})",
+                             [getattr(post, name) for name in _POST_FIELDS])
+
+    def _write(self, post: Post, **changes) -> None:
+        changes["updated_at"] = time.time()
+        for name, value in changes.items():
+            if hasattr(post, name):
+                setattr(post, name, value)
+        assignments = ", ".join(f"{name} = ?" for name in changes)
+        with self._lock:
+            self._db.execute(f"UPDATE posts SET {assignments} WHERE id = ?", [*changes.values(), post.id])
+
+    def _get(self, post_id: str) -> Post | None:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM posts WHERE id = ?", (post_id,)).fetchone()
+        return self._row_to_post(row) if row else None
+
+    def _recent(self, status: str | None, limit: int) -> list[Post]:
+        query, params = "SELECT * FROM posts", []
+        if status:
+            query, params = query + " WHERE status = ?", [status]
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY created_at DESC LIMIT ?", [*params, limit]).fetchall()
+        return [self._row_to_post(row) for row in rows]
+
+    def _claim_due(self, limit: int) -> list[Post]:
+        """예약 시간이 지났고 아무도 처리하고 있지 않은 게시물을 lease와 함께 가져옴"""
+        now = time.time()
+        terminal = ", ".join("?" for _ in TERMINAL_STATES)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    f"SELECT * FROM posts WHERE status NOT IN ({terminal}) AND next_attempt_at <= ? "
+                    f"AND lease_until <= ? ORDER BY next_attempt_at LIMIT ?",
+                    [*TERMINAL_STATES, now, now, limit],
+                ).fetchall()
+                self._db.executemany("UPDATE posts SET lease_until = ? WHERE id = ?",
+                                     [(now + _LEASE_SECONDS, row["id"]) for row in rows])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return [self._row_to_post(row) for row in rows]
+
+    def _claim_one(self, post_id: str) -> Post | None:
+        """취소용: 컨테이너를 만들기 전이고 처리 중이 아닌 게시물만"""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE posts SET lease_until = ? WHERE id = ? AND status IN ('queued', 'uploaded') "
+                "AND lease_until <= ?", (now + _LEASE_SECONDS, post_id, now),
+            )
+            if cursor.rowcount == 0:
+                return None
+            row = self._db.execute("SELECT * FROM posts WHERE id = ?", (post_id,)).fetchone()
+        return self._row_to_post(row)
+
+    def _next_due_in(self) -> float:
+        terminal = ", ".join("?" for _ in TERMINAL_STATES)
+        with self._lock:
+            (due,) = self._db.execute(
+                f"SELECT MIN(MAX(next_attempt_at, lease_until)) FROM posts WHERE status NOT IN ({terminal})",
+                TERMINAL_STATES,
+            ).fetchone()
+        if due is None:
+            return _IDLE_POLL_SECONDS
+        return min(_IDLE_POLL_SECONDS, max(0.05, due - time.time()))
+
+    def _media_path(self, post_id: str) -> str:
+        return os.path.join(self.media_dir, f"{post_id}.jpg")
+
+    def _read_media(self, post_id: str) -> bytes:
+        with open(self._media_path(post_id), "rb") as f:
+            return f.read()
+
+    def _remove_media(self, post_id: str) -> None:
+        try:
+            os.remove(self._media_path(post_id))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _row_to_post(row: sqlite3.Row) -> Post:
+        return Post(**{name: row[name] for name in _POST_FIELDS})
+
+
+publish_queue = PublishQueue(
+    path=PUBLISH_QUEUE_PATH,
+    media_dir=PUBLISH_MEDIA_DIR,
+    concurrency=PUBLISH_CONCURRENCY,
+    max_attempts=PUBLISH_MAX_ATTEMPTS,
+)
+
+
+async def upload_to_gcs_and_instagram(file_bytes: bytes, filename: str, caption: str) -> dict:
+    """
+    바로 게시: 대기열에 넣고 PUBLISH_WAIT_SECONDS까지 결과를 기다림.
+    그 안에 끝나지 않으면 pending으로 반환 (게시물은 대기열에서 계속 재시도되므로 다시 올리지 않아야 함)
+    """
+    post = await publish_queue.submit(file_bytes, filename, caption)
+    post = await publish_queue.wait(post.id)
+    if post.status == "published":
+        return {"success": True, "publish_id": post.publish_id, "post_id": post.id}
+    if post.status in TERMINAL_STATES:
+        raise RuntimeError(post.error or f"게시 {post.status}")
+    return {"success": False, "pending": True, **post.to_dict()}
@@ -0,0 +1,225 @@
+# services/response_cache.py
+import re
+import json
+import asyncio
+import time
+import zlib
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, TypeVar
+
+import numpy as np
+from pydantic import BaseModel
+
+from config import (
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_VARIANTS,
+    RESPONSE_CACHE_SIMILARITY,
+)
+
+T = TypeVar("T")
+
+
+def _normalize_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value.strip()).lower()
+    if isinstance(value, (list, tuple)):
+        # 필수/금지 단어, 해시태그 등은 순서가 의미 없으므로 정렬
+        return sorted(_normalize_value(v) for v in value if v)
+    return value
+
+
+class HashingEmbedder:
+    """
+    로컬 문자 n-gram 해싱 임베딩 (외부 모델/네트워크 없음).
+    한국어 메뉴/상황 문구처럼 짧은 텍스트의 표기 차이(띄어쓰기, 조사 등)를 흡수하는 용도.
+    """
+
+    def __init__(self, dim: int = 512, ngram: tuple[int, int] = (2, 3)):
+        self.dim = dim
+        self.ngram = ngram
+
+    def embed(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        text = re.sub(r"\s+", "", text)
+        for n in range(self.ngram[0], self.ngram[1] + 1):
+            for i in range(max(1, len(text) - n + 1)):
+                h = zlib.crc32(text[i:i + n].encode("utf-8"))
+                vec[h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+
+class VectorIndex:
+    """인메모리 코사인 유사도 인덱스 (정규화된 벡터의 내적)"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._keys: list[str] = []
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+
+    def add(self, key: str, vector: np.ndarray) -> None:
+        self.remove(key)
+        self._keys.append(key)
+        self._vectors = np.vstack([self._vectors, vector[None, :]])
+
+    def remove(self, key: str) -> None:
+        if key in self._keys:
+            i = self._keys.index(key)
+            self._keys.pop(i)
+            self._vectors = np.delete(self._vectors, i, axis=0)
+
+    def search(self, vector: np.ndarray) -> tuple[str, float] | None:
+        if not self._keys:
+            return None
+        scores = self._vectors @ vector
+        i = int(np.argmax(scores))
+        return self._keys[i], float(scores[i])
+
+
+@dataclass
+class _Entry:
+    scope: str
+    created_at: float
+    variants: list[Any] = field(default_factory=list)
+    cursor: int = 0
+
+
+class ResponseCache:
+    """
+    LLM 응답 캐시.
+    - 정확 일치: 정규화된 payload 전체를 키로 사용
+    - 유사 일치(선택): exact_fields가 같은 항목 중에서 similar_fields 텍스트의
+      로컬 임베딩 코사인 유사도가 similarity 이상이면 같은 항목으로 본다
+    - 키마다 최대 variants개의 응답을 모아두고, 다 차면 재생성 요청 시 순서대로 돌려준다
+      (유사 일치한 항목이 아직 덜 찼으면 새 응답은 요청 자신의 키로 저장)
+    - 같은 키를 이미 생성 중이면 새로 호출하지 않고 그 결과를 같이 받는다 (coalesced)
+    - TTL 만료는 생성 순서 큐의 앞쪽만 확인 (조회마다 전체 항목을 훑지 않는다)
+    """
+
+    def __init__(self, name: str, similar_fields: tuple[str, ...] = (),
+                 ttl: float = RESPONSE_CACHE_TTL_SECONDS, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 variants: int = RESPONSE_CACHE_VARIANTS, similarity: float = RESPONSE_CACHE_SIMILARITY):
+        self.name = name
+        self.similar_fields = similar_fields
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.variants = max(1, variants)
+        self.similarity = similarity  # 0이면 유사 일치 비활성
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()  # LRU 순서
+        self._created: "deque[tuple[str, _Entry]]" = deque()  # 생성 순서 (= 만료 순서, TTL이 같으므로)
+        self._embedder = HashingEmbedder()
+        self._indexes: dict[str, VectorIndex] = {}  # scope(정확 일치 필드)별 인덱스
+        self._inflight: dict[str, asyncio.Future] = {}  # 키별 생성 중인 요청 (결과: (성공 여부, 값))
+        self.counters = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "fills": 0,
+                         "coalesced": 0, "evictions": 0}
+
+    async def get_or_create(self, payload: BaseModel, create: Callable[[], Awaitable[T]],
+                            cacheable: Callable[[T], bool] = lambda _: True) -> T:
+        key, scope, text = self._keys(payload)
+        while True:
+            entry, kind = self._lookup(key, scope, text)
+            if entry is not None and len(entry.variants) >= self.variants:
+                value = entry.variants[entry.cursor % len(entry.variants)]
+                entry.cursor += 1
+                self.counters[f"{kind}_hits"] += 1
+                return value
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            # 같은 키를 생성 중인 요청의 결과를 같이 쓴다 (실패했으면 다시 조회해서 직접 생성)
+            ok, value = await asyncio.shield(pending)
+            if ok:
+                self.counters["coalesced"] += 1
+                return value
+
+        # 캐시에 없거나, 아직 variant가 다 모이지 않았으면 새로 생성
+        # 유사 일치한 다른 키의 항목은 채우지 않는다 (그 키의 variant에 다른 요청의 응답이 섞이지 않도록)
+        self.counters["fills" if kind == "exact" else "misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        ok, value = False, None
+        try:
+            value = await create()
+            ok = True
+        finally:
+            del self._inflight[key]
+            future.set_result((ok, value))
+        if cacheable(value):
+            self._store(key, scope, text, value)
+        return value
+
+    def stats(self) -> dict:
+        c = self.counters
+        hits = c["exact_hits"] + c["similar_hits"] + c["coalesced"]
+        lookups = hits + c["misses"] + c["fills"]
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            **c,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "variants_per_key": self.variants,
+            "similarity_threshold": self.similarity,
+        }
+
+    # ---- 내부 함수 ----
+
+    def _keys(self, payload: BaseModel) -> tuple[str, str, str]:
+        data = {k: _normalize_value(v) for k, v in payload.model_dump().items()}
+        key = json.dumps(data, ensure_ascii=False, sort_keys=True)
+        scope = json.dumps({k: v for k, v in data.items() if k not in self.similar_fields},
+                           ensure_ascii=False, sort_keys=True)
+        text = " | ".join(str(data.get(f, "")) for f in self.similar_fields)
+        return key, scope, text
+
+    def _lookup(self, key: str, scope: str, text: str) -> tuple[_Entry | None, str]:
+        self._expire()
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry, "exact"
+
+        if self.similarity > 0 and self.similar_fields and scope in self._indexes:
+            found = self._indexes[scope].search(self._embedder.embed(text))
+            if found and found[1] >= self.similarity:
+                entry = self._entries.get(found[0])
+                if entry is not None:
+                    self._entries.move_to_end(found[0])
+                    return entry, "similar"
+        return None, ""
+
+    def _store(self, key: str, scope: str, text: str, value: Any) -> None:
+        # 생성하는 동안 항목이 만료/교체됐을 수 있으므로 키로 다시 찾는다
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = _Entry(scope=scope, created_at=time.time())
+            self._entries[key] = entry
+            self._created.append((key, entry))
+            if self.similarity > 0 and self.similar_fields:
+                self._indexes.setdefault(scope, VectorIndex(self._embedder.dim)).add(
+                    key, self._embedder.embed(text))
+        if len(entry.variants) < self.variants:
+            entry.variants.append(value)
+
+        while len(self._entries) > self.max_entries:
+            old_key, _ = next(iter(self._entries.items()))
+            self._remove(old_key)
+            self.counters["evictions"] += 1
+        # 밀려난 항목이 생성 순서 큐에 쌓이지 않도록 가끔 정리 (분할 상환 O(1))
+        if len(self._created) > 2 * self.max_entries:
+            self._created = deque(item for item in self._created if self._entries.get(item[0]) is item[1])
+
+    def _expire(self) -> None:
+        now = time.time()
+        while self._created and now - self._created[0][1].created_at > self.ttl:
+            key, entry = self._created.popleft()
+            # LRU로 이미 밀려났거나 같은 키로 새로 만들어진 항목이면 건너뛴다
+            if self._entries.get(key) is entry:
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.scope in self._indexes:
+            self._indexes[entry.scope].remove(key)
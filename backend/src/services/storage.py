@@ -1,69 +1,321 @@
-import os
-import time
 import io
-import requests
-from PIL import Image
-from google.cloud import storage
-from fastapi import HTTPException
+import math
+import asyncio
+import itertools
+import threading
+from dataclasses import dataclass
 
-def upload_to_gcs_and_instagram(file_bytes: bytes, filename: str, caption: str):
-    IG_USER_ID = os.getenv("IG_USER_ID")
-    ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
-    BUCKET_NAME = os.getenv("STORAGE_BUCKET")
-    STORAGE_ENDPOINT = os.getenv("STORAGE_ENDPOINT")
+import httpx
+from PIL import Image, ImageOps
 
-    if not IG_USER_ID or not ACCESS_TOKEN or not BUCKET_NAME or not STORAGE_ENDPOINT:
-        raise HTTPException(status_code=500, detail="환경변수가 설정되지 않았습니다.")
+from config import (
+    IG_USER_ID,
+    ACCESS_TOKEN,
+    STORAGE_BUCKET,
+    STORAGE_ENDPOINT,
+    INSTAGRAM_GRAPH_URL,
+    INSTAGRAM_MAX_CONNECTIONS,
+    INSTAGRAM_MAX_WIDTH,
+    INSTAGRAM_MAX_BYTES,
+    INSTAGRAM_JPEG_QUALITY,
+    INSTAGRAM_ASPECT_MODE,
+    INSTAGRAM_JPEG_PROGRESSIVE,
+    PUBLISH_CONTAINER_TIMEOUT_SECONDS,
+)
+from telemetry import get_logger, span
 
+logger = get_logger("storage")
+
+# Graph API 오류 중 재시도 대상 (일시 오류 / 호출 한도)
+# https://developers.facebook.com/docs/graph-api/guides/error-handling
+RETRYABLE_GRAPH_CODES = {1, 2, 4, 17, 32, 341, 613}
+RETRYABLE_HTTP_CODES = {408, 429, 500, 502, 503, 504}
+# 컨테이너가 아직 준비되지 않아 게시가 거부된 경우 (상태 확인 후 다시 게시)
+MEDIA_NOT_READY_SUBCODE = 2207027
+
+# Instagram 이미지 비율 허용 범위 (세로 4:5 ~ 가로 1.91:1)
+MIN_ASPECT = 4 / 5
+MAX_ASPECT = 1.91
+# 용량을 맞추려고 줄일 수 있는 최소 가로 (Instagram은 320px보다 작으면 확대해서 게시)
+MIN_WIDTH = 320
+
+_EXIF_ORIENTATION = 0x0112
+
+# 컨테이너 상태 확인 간격: 1s → 1.5배씩 → 최대 10s
+_POLL_INITIAL = 1.0
+_POLL_FACTOR = 1.5
+_POLL_MAX = 10.0
+
+# Graph API 호출용 공유 비동기 클라이언트 (커넥션 재사용)
+_http_client: httpx.AsyncClient | None = None
+
+# GCS 클라이언트는 인증/세션 생성 비용이 있어 프로세스당 1개만 (업로드는 스레드에서 실행)
+_gcs_client = None
+_gcs_lock = threading.Lock()
+
+
+class GraphAPIError(Exception):
+    """Graph API 오류 응답 (retryable: 같은 요청을 나중에 다시 보내도 되는 오류)"""
+
+    def __init__(self, message: str, *, retryable: bool = False, status_code: int | None = None,
+                 code: int | None = None, subcode: int | None = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status_code = status_code
+        self.code = code
+        self.subcode = subcode
+
+
+class ContainerFailedError(GraphAPIError):
+    """컨테이너 처리 실패/만료 (ERROR, EXPIRED) → 같은 이미지 URL로 컨테이너를 새로 만들어야 함"""
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=INSTAGRAM_MAX_CONNECTIONS,
+                                max_keepalive_connections=INSTAGRAM_MAX_CONNECTIONS),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def check_publish_config() -> None:
+    if not IG_USER_ID or not ACCESS_TOKEN or not STORAGE_BUCKET or not STORAGE_ENDPOINT:
+        raise RuntimeError("환경변수가 설정되지 않았습니다.")
+
+
+def public_url(blob_name: str) -> str:
+    return f"{STORAGE_ENDPOINT}/{blob_name}"
+
+
+@dataclass
+class PreparedMedia:
+    data: bytes
+    size: tuple[int, int]
+    original_bytes: int
+    reencoded: bool
+
+
+def prepare_instagram_jpeg(data: bytes, max_width: int = INSTAGRAM_MAX_WIDTH,
+                           max_bytes: int = INSTAGRAM_MAX_BYTES, quality: int = INSTAGRAM_JPEG_QUALITY,
+                           aspect_mode: str = INSTAGRAM_ASPECT_MODE,
+                           progressive: bool = INSTAGRAM_JPEG_PROGRESSIVE) -> PreparedMedia:
+    """
+    Instagram 업로드용 JPEG 준비 (CPU 작업 → run_cpu / run_process에서 실행).
+    - 이미 RGB JPEG이고 회전 없음 + 가로 max_width 이하 + 허용 비율 + max_bytes 이하면 디코딩 없이 그대로
+    - 아니면 EXIF 회전 반영, 알파는 흰 배경에 합성, 비율을 4:5 ~ 1.91:1 안으로 (pad/crop), 가로 max_width로 축소
+    - optimize(+ progressive)로 인코딩, max_bytes를 넘으면 품질을 낮춰 다시
+    - 가장 낮은 품질(quality - 20)로도 넘으면 크기를 줄여 가며 다시, 가로 MIN_WIDTH까지 줄여도 넘으면 ValueError
+    """
+    image = Image.open(io.BytesIO(data))
+    orientation = image.getexif().get(_EXIF_ORIENTATION, 1)
+    width, height = image.size
+    if (image.format == "JPEG" and image.mode == "RGB" and orientation == 1 and width <= max_width
+            and MIN_ASPECT <= width / height <= MAX_ASPECT and len(data) <= max_bytes):
+        return PreparedMedia(data, (width, height), len(data), False)
+
+    icc_profile = image.info.get("icc_profile")
+    if image.format == "JPEG":
+        # 회전 후 가로 기준 축소 비율로 target 이상인 가장 작은 1/2^n 크기로 디코딩
+        rotated_width = height if orientation in (5, 6, 7, 8) else width
+        scale = min(1.0, max_width / rotated_width)
+        image.draft("RGB", (max(1, round(width * scale)), max(1, round(height * scale))))
+    image = ImageOps.exif_transpose(image)
+    image = _flatten(image)
+    if aspect_mode == "crop":
+        image = _crop_to_aspect(image)
+    # 여백은 축소한 뒤에 붙인다 (리사이즈할 픽셀 수를 줄이기 위해)
+    canvas_width = _padded_size(image.size)[0]
+    if canvas_width > max_width:
+        scale = max_width / canvas_width
+        new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(new_size, Image.LANCZOS, reducing_gap=3.0)
+    image = _pad_to_aspect(image)
+
+    buf = io.BytesIO()
+
+    def encode(img: Image.Image, q: int) -> int:
+        buf.seek(0)
+        buf.truncate()
+        img.save(buf, format="JPEG", quality=q, optimize=True, progressive=progressive, subsampling="4:2:0",
+                 icc_profile=icc_profile)
+        return buf.tell()
+
+    for q in (quality, quality - 10, quality - 20):
+        if encode(image, q) <= max_bytes:
+            return PreparedMedia(buf.getvalue(), image.size, len(data), True)
+
+    # 품질만으로는 부족 → 용량 비율만큼 (조금 더) 줄여서 다시. 비율은 가로세로를 같이 줄이므로 유지된다
+    while image.width > MIN_WIDTH:
+        scale = max(0.5, math.sqrt(max_bytes / buf.tell()) * 0.95)
+        new_width = max(MIN_WIDTH, round(image.width * scale))
+        new_size = (new_width, max(1, round(image.height * new_width / image.width)))
+        image = image.resize(new_size, Image.LANCZOS)
+        if encode(image, quality - 20) <= max_bytes:
+            return PreparedMedia(buf.getvalue(), image.size, len(data), True)
+    raise ValueError(f"이미지를 {max_bytes / 1024 / 1024:.1f}MB 이하로 줄일 수 없습니다 "
+                     f"(가로 {image.width}px, 품질 {quality - 20}에서 {buf.tell() / 1024 / 1024:.1f}MB).")
+
+
+# ---- GCS ----
+
+def get_bucket(bucket_name: str = STORAGE_BUCKET):
+    global _gcs_client
+    with _gcs_lock:
+        if _gcs_client is None:
+            # STORAGE_EMULATOR_HOST가 설정돼 있으면 SDK가 로컬 에뮬레이터로 접속
+            from google.cloud import storage
+            _gcs_client = storage.Client()
+        return _gcs_client.bucket(bucket_name)
+
+
+def upload_blob(blob_name: str, data: bytes) -> bool:
+    """
+    blob 업로드 (동기 SDK → asyncio.to_thread에서 호출).
+    if_generation_match=0으로 같은 이름이 이미 있으면 덮어쓰지 않는다:
+    재시도에서 다시 호출돼도 한 번만 업로드되고, 이미 있었으면 False.
+    """
+    from google.api_core.exceptions import PreconditionFailed
+
+    blob = get_bucket().blob(blob_name)
+    try:
+        blob.upload_from_string(data, content_type="image/jpeg", if_generation_match=0)
+    except PreconditionFailed:
+        return False
+    return True
+
+
+def delete_blob(blob_name: str) -> None:
+    from google.api_core.exceptions import NotFound
+
+    try:
+        get_bucket().blob(blob_name).delete()
+    except NotFound:
+        pass
+
+
+# ---- Instagram Graph API ----
+
+async def create_container(image_url: str, caption: str) -> str:
+    """이미지 컨테이너 생성 → container id"""
+    with span("instagram.create_container", kind="client"):
+        data = await _graph("POST", f"{IG_USER_ID}/media", {"image_url": image_url, "caption": caption})
+    return data["id"]
+
+
+async def wait_for_container(container_id: str, timeout: float = PUBLISH_CONTAINER_TIMEOUT_SECONDS) -> str:
+    """
+    컨테이너 status_code가 FINISHED(또는 이미 PUBLISHED)가 될 때까지 백오프하며 확인.
+    ERROR/EXPIRED면 ContainerFailedError, timeout 안에 끝나지 않으면 재시도 가능한 GraphAPIError.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = _POLL_INITIAL
+    with span("instagram.wait_container", kind="client") as s:
+        for polls in itertools.count(1):
+            data = await _graph("GET", container_id, {"fields": "status_code,status"})
+            status = data.get("status_code")
+            s.set("polls", polls)
+            s.set("status", status)
+            if status in ("FINISHED", "PUBLISHED"):
+                return status
+            if status in ("ERROR", "EXPIRED"):
+                raise ContainerFailedError(f"컨테이너 {container_id} 처리 실패: {status} {data.get('status', '')}",
+                                           retryable=True)
+            if loop.time() + delay > deadline:
+                raise GraphAPIError(f"컨테이너 {container_id}가 {timeout:.0f}초 안에 준비되지 않았습니다 ({status})",
+                                    retryable=True)
+            await asyncio.sleep(delay)
+            delay = min(_POLL_MAX, delay * _POLL_FACTOR)
+
+
+async def publish_container(container_id: str) -> str:
+    """준비된 컨테이너 게시 → 게시물(media) id"""
+    with span("instagram.publish", kind="client"):
+        data = await _graph("POST", f"{IG_USER_ID}/media_publish", {"creation_id": container_id})
+    return data["id"]
+
+
+# ---- 내부 함수 ----
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """RGB로 변환 (투명한 부분이 있으면 흰 배경에 합성)"""
+    if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        alpha = image.getchannel("A")
+        if alpha.getextrema()[0] < 255:
+            canvas = Image.new("RGB", image.size, "white")
+            canvas.paste(image, mask=alpha)
+            return canvas
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+
+def _crop_to_aspect(image: Image.Image) -> Image.Image:
+    """허용 비율 밖이면 가운데를 잘라 MIN_ASPECT ~ MAX_ASPECT 안으로"""
+    width, height = image.size
+    if width / height < MIN_ASPECT:
+        new_height = math.floor(width / MIN_ASPECT)
+        top = (height - new_height) // 2
+        return image.crop((0, top, width, top + new_height))
+    if width / height > MAX_ASPECT:
+        new_width = math.floor(height * MAX_ASPECT)
+        left = (width - new_width) // 2
+        return image.crop((left, 0, left + new_width, height))
+    return image
+
+
+def _padded_size(size: tuple[int, int]) -> tuple[int, int]:
+    """흰 여백을 붙여 허용 비율로 만든 캔버스 크기 (이미 허용 비율이면 그대로)"""
+    width, height = size
+    if width / height < MIN_ASPECT:
+        return math.ceil(height * MIN_ASPECT), height
+    if width / height > MAX_ASPECT:
+        return width, math.ceil(width / MAX_ASPECT)
+    return size
+
+
+def _pad_to_aspect(image: Image.Image) -> Image.Image:
+    size = _padded_size(image.size)
+    if size == image.size:
+        return image
+    canvas = Image.new("RGB", size, "white")
+    canvas.paste(image, ((size[0] - image.width) // 2, (size[1] - image.height) // 2))
+    return canvas
+
+
+async def _graph(method: str, path: str, params: dict) -> dict:
+    params = {**params, "access_token": ACCESS_TOKEN}
+    url = f"{INSTAGRAM_GRAPH_URL}/{path}"
+    http = get_http_client()
     try:
-        # 1) 파일을 JPEG으로 변환
-        image = Image.open(io.BytesIO(file_bytes)).convert("RGB")
-        buf = io.BytesIO()
-        image.save(buf, format="JPEG", quality=85)
-        jpeg_bytes = buf.getvalue()
-
-        # 2) 파일명에 timestamp 붙이기
-        timestamp = int(time.time())
-        safe_name = f"{filename.rsplit('.',1)[0]}_{timestamp}.jpg"
-
-        # 3) GCS 클라이언트 생성 및 업로드
-        client = storage.Client()
-        bucket = client.bucket(BUCKET_NAME)
-        blob = bucket.blob(safe_name)
-        blob.upload_from_string(jpeg_bytes, content_type="image/jpeg")
-
-        # 4) 공개 URL 생성
-        public_url = f"{STORAGE_ENDPOINT}/{safe_name}"
-
-        # 5) Instagram Graph API 호출
-        media_url = f"https://graph.facebook.com/v24.0/{IG_USER_ID}/media"
-        upload_res = requests.post(media_url, data={
-            "image_url": public_url,
-            "caption": caption,
-            "access_token": ACCESS_TOKEN
-        })
-        upload_data = upload_res.json()
-        if "id" not in upload_data:
-            blob.delete()
-            raise HTTPException(status_code=500, detail=f"업로드 실패: {upload_data}")
-
-        creation_id = upload_data["id"]
-
-        publish_url = f"https://graph.facebook.com/v24.0/{IG_USER_ID}/media_publish"
-        publish_res = requests.post(publish_url, data={
-            "creation_id": creation_id,
-            "access_token": ACCESS_TOKEN
-        })
-        publish_data = publish_res.json()
-        if "id" not in publish_data:
-            blob.delete()
-            raise HTTPException(status_code=500, detail=f"퍼블리시 실패: {publish_data}")
-
-        # 6) 성공 시 GCS에서 삭제
-        blob.delete()
-
-        return {"success": True, "publish_id": publish_data["id"]}
-
-    except Exception as e:
-        print(e)
-        raise HTTPException(status_code=500, detail=str(e))
+        if method == "GET":
+            res = await http.get(url, params=params)
+        else:
+            res = await http.post(url, data=params)
+    except httpx.TransportError as e:
+        raise GraphAPIError(f"Graph API 연결 오류: {type(e).__name__}", retryable=True) from e
+
+    try:
+        data = res.json()
+    except ValueError:
+        data = {}
+    error = data.get("error") if isinstance(data, dict) else None
+    if res.status_code < 400 and error is None and (method == "GET" or "id" in data):
+        return data
+
+    error = error or {}
+    code, subcode = error.get("code"), error.get("error_subcode")
+    retryable = (res.status_code in RETRYABLE_HTTP_CODES or code in RETRYABLE_GRAPH_CODES
+                 or subcode == MEDIA_NOT_READY_SUBCODE or bool(error.get("is_transient")))
+    message = error.get("error_user_msg") or error.get("message") or res.text[:200]
+    raise GraphAPIError(f"Graph API 오류 ({res.status_code}, code={code}): {message}", retryable=retryable,
+                        status_code=res.status_code, code=code, subcode=subcode)
@@ -0,0 +1,182 @@
+# services/structured_output.py
+import re
+import json
+import time
+from typing import Any, TypeVar
+
+from pydantic import BaseModel
+
+from config import LLM_STRUCTURED_MODE
+from services.llm_gateway import llm_gateway
+from services.prompts import prompt_registry
+from telemetry import get_logger, log_payload, span
+
+logger = get_logger("structured")
+
+M = TypeVar("M", bound=BaseModel)
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.S)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+# 교정 호출: 원래 프롬프트 없이, 깨진 출력 + 오류 + 스키마만 보내서 형식만 고친다
+prompt_registry.register("structured_repair", [
+    ("system", "너는 JSON 교정기다. 주어진 출력을 스키마에 맞는 JSON으로 고쳐서 JSON만 반환한다. "
+               "내용은 바꾸지 말고, 빠진 필드만 원본 내용에 맞게 채운다."),
+    ("user", """스키마:
+{schema}
+
+검증 오류:
+{error}
+
+원본 출력:
+{raw}
+"""),
+], input_variables=("schema", "error", "raw"))
+
+
+class StructuredOutputError(Exception):
+    """교정 호출 후에도 응답이 스키마에 맞지 않을 때"""
+
+    def __init__(self, name: str, raw: str, cause: Exception):
+        super().__init__(f"{name} 응답을 해석할 수 없습니다: {cause}")
+        self.name = name
+        self.raw = raw
+
+
+def extract_json(text: str) -> Any:
+    """
+    관대한 JSON 추출기.
+    - 코드 펜스(```json ... ```) 안쪽 우선
+    - 첫 '{' 또는 '['부터 값 하나만 읽고 뒤에 붙은 설명 문구는 무시
+    - 닫는 괄호 앞의 trailing comma 제거
+    """
+    text = text.strip()
+    candidates = []
+    m = _FENCE.search(text)
+    if m:
+        candidates.append(m.group(1).strip())
+    candidates.append(text)
+
+    decoder = json.JSONDecoder()
+    for candidate in candidates:
+        starts = [i for i in (candidate.find("{"), candidate.find("[")) if i >= 0]
+        if not starts:
+            continue
+        body = candidate[min(starts):]
+        for attempt in (body, _TRAILING_COMMA.sub(r"\1", body)):
+            try:
+                value, _end = decoder.raw_decode(attempt)
+                return value
+            except ValueError:
+                pass
+    raise ValueError("응답에서 JSON을 찾을 수 없습니다.")
+
+
+def _tokens(response) -> int:
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("total_tokens", 0)
+
+
+class StructuredOutput:
+    """
+    pydantic 모델 기반 구조화 출력.
+    1) 모델의 네이티브 JSON 스키마 모드로 호출 (LLM_STRUCTURED_MODE)
+    2) 그대로 검증 → 실패하면 관대한 추출기로 다시 검증
+    3) 그래도 실패하면 형식만 고치는 교정 호출을 최대 1회 수행
+    전체 재생성 대신 추출/교정으로 살린 건수와 교정 비용을 스키마별로 집계한다.
+    """
+
+    def __init__(self, mode: str = LLM_STRUCTURED_MODE):
+        self.mode = mode
+        self._stats: dict[str, dict[str, float]] = {}
+
+    async def ainvoke(self, prompt, variables: dict, schema: type[M], *, name: str,
+                      temperature: float | None = None, deadline: float | None = None) -> M:
+        response = await llm_gateway.ainvoke(prompt, variables, temperature=temperature,
+                                             deadline=deadline, bind=self.bind_options(schema))
+        return await self.parse(response.content, schema, name=name, tokens=_tokens(response))
+
+    async def parse(self, raw: str, schema: type[M], *, name: str, tokens: int = 0) -> M:
+        """이미 받은 응답 텍스트(스트리밍 누적 결과 등)를 schema로 해석"""
+        log_payload(logger, f"{name} 모델 응답", raw)
+        with span("llm.parse", schema=name) as s:
+            result, outcome = await self._parse(raw, schema, name, tokens)
+            s.set("outcome", outcome)
+        return result
+
+    async def _parse(self, raw: str, schema: type[M], name: str, tokens: int) -> tuple[M, str]:
+        stats = self._model_stats(name)
+        stats["calls"] += 1
+        stats["generation_tokens"] += tokens
+
+        try:
+            result = schema.model_validate_json(raw)
+            stats["direct"] += 1
+            return result, "direct"
+        except ValueError:
+            pass
+
+        try:
+            result = schema.model_validate(extract_json(raw))
+            stats["extracted"] += 1
+            return result, "extracted"
+        except ValueError as e:
+            error = e
+
+        logger.warning(f"{name} 응답 교정 호출: {str(error)[:200]}")
+        stats["repair_calls"] += 1
+        started = time.perf_counter()
+        try:
+            response = await llm_gateway.ainvoke(prompt_registry.get("structured_repair"), {
+                "schema": json.dumps(schema.model_json_schema(), ensure_ascii=False),
+                "error": str(error),
+                "raw": raw,
+            }, bind=self.bind_options(schema))
+            stats["repair_tokens"] += _tokens(response)
+            result = schema.model_validate(extract_json(response.content))
+        except Exception as e:
+            stats["failed"] += 1
+            raise StructuredOutputError(name, raw, e) from e
+        finally:
+            stats["repair_latency_seconds"] += time.perf_counter() - started
+        stats["repaired"] += 1
+        return result, "repaired"
+
+    def bind_options(self, schema: type[BaseModel]) -> dict | None:
+        """llm.bind()에 넘길 response_format (모드가 none이면 None)"""
+        if self.mode == "json_schema":
+            return {"response_format": {
+                "type": "json_schema",
+                # dict 필드(factors, breakdown 등)가 있어 strict 모드는 사용하지 않음
+                "json_schema": {"name": schema.__name__, "schema": schema.model_json_schema(), "strict": False},
+            }}
+        if self.mode == "json_object":
+            return {"response_format": {"type": "json_object"}}
+        return None
+
+    def stats(self) -> dict:
+        schemas = {}
+        for name, s in self._stats.items():
+            calls = s["calls"]
+            saved = s["extracted"] + s["repaired"]
+            avg_tokens = s["generation_tokens"] / calls if calls else 0.0
+            schemas[name] = {
+                **{k: v for k, v in s.items() if k != "repair_latency_seconds"},
+                # json.loads만 썼다면 실패했을 비율 / 최종 실패 비율
+                "malformed_rate": round((calls - s["direct"]) / calls, 3) if calls else 0.0,
+                "failure_rate": round(s["failed"] / calls, 3) if calls else 0.0,
+                "regenerations_saved": saved,
+                "avg_repair_latency_ms": round(s["repair_latency_seconds"] / s["repair_calls"] * 1000, 1)
+                if s["repair_calls"] else 0.0,
+                "estimated_tokens_saved": round(saved * avg_tokens - s["repair_tokens"]),
+            }
+        return {"mode": self.mode, "schemas": schemas}
+
+    def _model_stats(self, name: str) -> dict[str, float]:
+        return self._stats.setdefault(name, {
+            "calls": 0, "direct": 0, "extracted": 0, "repaired": 0, "failed": 0,
+            "repair_calls": 0, "generation_tokens": 0, "repair_tokens": 0, "repair_latency_seconds": 0.0,
+        })
+
+
+structured_output = StructuredOutput()
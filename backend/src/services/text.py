@@ -1,15 +1,33 @@
 import json
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+import time
+from langchain_core.runnables import RunnableLambda
 from models import GeneratePayload, GenerateResult
-from config import OPENAI_API_KEY
+from services.llm_gateway import llm_gateway
+from services.prompts import prompt_registry
+from services.structured_output import structured_output
+from services.response_cache import ResponseCache
+from services.json_stream import IncrementalJSONParser
+from config import GENERATE_BATCH_CONCURRENCY
+from telemetry import get_logger, log_payload
 
-llm = ChatOpenAI(model="gpt-5-nano", temperature=0.7, api_key=OPENAI_API_KEY)
+logger = get_logger("text")
 
-def generate_text(payload: GeneratePayload) -> GenerateResult:
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "너는 SNS 마케팅 문구를 작성하는 카피라이터다."),
-        ("user", """메뉴: {menu}
+# 같은 (또는 유사한) 메뉴/상황/톤/채널 요청은 캐시된 응답을 돌려서 사용
+text_cache = ResponseCache("generate_text", similar_fields=("menu", "context"))
+
+
+async def generate_text(payload: GeneratePayload) -> GenerateResult:
+    return await text_cache.get_or_create(
+        payload,
+        lambda: _generate_text(payload),
+        cacheable=lambda result: bool(result.captions),  # 빈 응답은 캐시하지 않음
+    )
+
+
+# 프롬프트는 서버 시작 시 한 번만 만들어 재사용
+prompt_registry.register("generate_text", [
+    ("system", "너는 SNS 마케팅 문구를 작성하는 카피라이터다."),
+    ("user", """메뉴: {menu}
 상황: {context}
 톤: {tone}
 채널: {channel}
@@ -38,10 +56,12 @@ def generate_text(payload: GeneratePayload) -> GenerateResult:
   "hashtags": ["...", "...", "...", "...", "..."]
 }}
 """)
-    ])
+], input_variables=("menu", "context", "tone", "channel", "required_words", "banned_words"))
+
 
+def _build_variables(payload: GeneratePayload) -> dict:
     # 바인딩할 변수 딕셔너리 준비
-    variables = {
+    return {
         "menu": payload.menu,
         "context": payload.context,
         "tone": payload.tone,
@@ -50,28 +70,108 @@ def generate_text(payload: GeneratePayload) -> GenerateResult:
         "banned_words": ", ".join(payload.banned_words or []),
     }
 
-    # 변수 딕셔너리 출력
-    print("👉 바인딩된 변수들:", variables)
 
-    # 최종 프롬프트 출력
-    formatted_prompt = prompt.format(**variables)
-    print("👉 최종 프롬프트:", formatted_prompt)
+async def _generate_text(payload: GeneratePayload) -> GenerateResult:
+    prompt = prompt_registry.get("generate_text")
+    variables = _build_variables(payload)
 
-    # 모델 호출
+    # 바인딩된 변수 (샘플링된 요청만, 렌더링된 프롬프트 크기는 prompt_registry.stats()에서 확인)
+    log_payload(logger, "generate_text 변수", variables)
+
+    # 모델 호출 (형식이 깨진 응답은 추출/교정으로 복구하고, 끝내 실패하면 StructuredOutputError)
+    result = await structured_output.ainvoke(prompt, variables, GenerateResult,
+                                             name="generate_text", temperature=0.7)
+    return result
+
+
+async def stream_generate_text(payload: GeneratePayload):
+    """
+    캡션/한 줄 광고/해시태그를 완성되는 즉시 하나씩 이벤트로 전달.
+    마지막 이벤트는 전체 결과(result) 또는 오류(error).
+    """
+    parser = IncrementalJSONParser()
+    raw: list[str] = []
     try:
-        response = (prompt | llm).invoke(variables)
-        print("✅ 모델 응답:", response.content)
-
-        data = json.loads(response.content.strip())
-        return GenerateResult(
-            captions=data.get("captions", []),
-            one_liner=data.get("one_liner", ""),
-            hashtags=data.get("hashtags", [])
-        )
+        async for chunk in llm_gateway.astream(prompt_registry.get("generate_text"), _build_variables(payload), temperature=0.7,
+                                               bind=structured_output.bind_options(GenerateResult)):
+            raw.append(chunk.content or "")
+            for path, value in parser.feed(chunk.content or ""):
+                if len(path) == 2 and path[0] == "captions":
+                    yield {"type": "caption", "index": path[1], "value": value}
+                elif path == ("one_liner",):
+                    yield {"type": "one_liner", "value": value}
+                elif len(path) == 2 and path[0] == "hashtags":
+                    yield {"type": "hashtag", "index": path[1], "value": value}
+            if parser.done:
+                break
+
+        result = await structured_output.parse("".join(raw), GenerateResult, name="generate_text")
+        yield {"type": "result", "value": result.model_dump()}
     except Exception as e:
-        print("❌ 에러 발생:", str(e))
-        return GenerateResult(
-            captions=[],
-            one_liner=f"오류 발생: {str(e)} | 원본 응답: {getattr(response, 'content', '')}",
-            hashtags=[]
-        )
+        logger.exception(f"❌ 스트리밍 에러 발생: {e}")
+        yield {"type": "error", "detail": str(e)}
+
+
+async def generate_text_batch(payloads: list[GeneratePayload], max_concurrency: int = GENERATE_BATCH_CONCURRENCY):
+    """
+    여러 메뉴/채널 요청을 abatch_as_completed로 동시에 생성하고, 끝나는 순서대로 이벤트로 전달.
+    - 같은 payload는 한 번만 생성해서 해당 index 모두에 돌려준다
+    - 항목마다 generate_text와 같은 캐시/구조화 출력 경로를 사용
+    - 마지막 summary 이벤트에 항목별 지연 시간 분포와 전체 처리량
+    """
+    started = time.perf_counter()
+
+    # 동일 payload 묶기: 대표 payload 순서대로 index 목록
+    groups: dict[str, list[int]] = {}
+    for i, p in enumerate(payloads):
+        groups.setdefault(json.dumps(p.model_dump(), ensure_ascii=False, sort_keys=True), []).append(i)
+    unique = list(groups.values())
+
+    async def run(payload: GeneratePayload) -> tuple[GenerateResult, float]:
+        item_started = time.perf_counter()
+        result = await generate_text(payload)
+        return result, time.perf_counter() - item_started
+
+    runner = RunnableLambda(run)
+    latencies: list[float] = []
+    failed = 0
+    async for u, output in runner.abatch_as_completed(
+        [payloads[indexes[0]] for indexes in unique],
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True,
+    ):
+        indexes = unique[u]
+        if isinstance(output, Exception):
+            logger.warning(f"❌ 일괄 생성 항목 실패 {indexes}: {output}")
+            failed += len(indexes)
+            for i in indexes:
+                yield {"type": "error", "index": i, "detail": str(output)}
+            continue
+
+        result, latency = output
+        latencies.append(latency)
+        for i in indexes:
+            yield {
+                "type": "item",
+                "index": i,
+                "value": result.model_dump(),
+                "latency_ms": round(latency * 1000, 1),
+                "deduplicated": i != indexes[0],
+            }
+
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    yield {
+        "type": "summary",
+        "items": len(payloads),
+        "unique": len(unique),
+        "succeeded": len(payloads) - failed,
+        "failed": failed,
+        "total_seconds": round(elapsed, 3),
+        "items_per_second": round(len(payloads) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(latencies[len(latencies) // 2] * 1000, 1),
+            "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1),
+        } if latencies else None,
+    }
@@ -0,0 +1,181 @@
+# services/translation.py
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Protocol
+
+from telemetry import get_logger, span
+from config import (
+    TRANSLATION_BACKEND,
+    TRANSLATION_CACHE_SIZE,
+    TRANSLATION_CACHE_PATH,
+    TRANSLATION_DICTIONARY_PATH,
+)
+
+logger = get_logger("translation")
+
+
+class TranslationBackend(Protocol):
+    name: str
+
+    def translate_batch(self, texts: list[str]) -> list[str]: ...
+
+
+class GoogleBackend:
+    """deep-translator GoogleTranslator. 여러 문장을 줄바꿈으로 묶어 한 번에 요청"""
+    name = "google"
+
+    def __init__(self, source: str = "ko", target: str = "en"):
+        from deep_translator import GoogleTranslator
+        self._translator = GoogleTranslator(source=source, target=target)
+
+    def translate_batch(self, texts: list[str]) -> list[str]:
+        if len(texts) == 1:
+            return [self._translator.translate(texts[0])]
+
+        # 문장 안에 줄바꿈이 없을 때만 묶어서 한 번에 번역 (줄 수가 다르면 개별 번역)
+        if not any("\n" in t for t in texts):
+            joined = self._translator.translate("\n".join(texts)) or ""
+            lines = [line.strip() for line in joined.split("\n")]
+            if len(lines) == len(texts):
+                return lines
+
+        return [self._translator.translate(t) for t in texts]
+
+
+class DictionaryBackend:
+    """
+    오프라인 사전 백엔드 (테스트/네트워크 없는 환경용).
+    사전에 없는 문장은 원문을 그대로 반환한다.
+    """
+    name = "dictionary"
+
+    def __init__(self, entries: dict[str, str] | None = None, path: str | None = TRANSLATION_DICTIONARY_PATH):
+        self.entries = dict(entries or {})
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries.update(json.load(f))
+
+    def translate_batch(self, texts: list[str]) -> list[str]:
+        return [self.entries.get(t, t) for t in texts]
+
+
+BACKENDS = {
+    GoogleBackend.name: GoogleBackend,
+    DictionaryBackend.name: DictionaryBackend,
+}
+
+
+class TranslationService:
+    """
+    ko→en 번역 서비스.
+    - 메모리 LRU + JSON 파일 영구 캐시 (서버 재시작 후에도 유지)
+    - translate_batch: 캐시에 없는 문장만 모아서 백엔드에 한 번에 요청
+    """
+
+    def __init__(self, backend: TranslationBackend, max_size: int = 1024, cache_path: str | None = None):
+        self.backend = backend
+        self.max_size = max_size
+        self.cache_path = cache_path
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def translate(self, text: str) -> str:
+        return self.translate_batch([text])[0]
+
+    def translate_batch(self, texts: list[str]) -> list[str]:
+        results: dict[str, str] = {"": ""}
+        missing: list[str] = []
+
+        with self._lock:
+            for text in texts:
+                key = (text or "").strip()
+                if key in results or key in missing:
+                    continue
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[key] = self._cache[key]
+                    self.hits += 1
+                else:
+                    missing.append(key)
+                    self.misses += 1
+
+        if missing:
+            with span("translation", backend=self.backend.name, texts=len(missing)):
+                translated = self.backend.translate_batch(missing)
+            stored = False
+            with self._lock:
+                for src, dst in zip(missing, translated):
+                    results[src] = dst
+                    # 빈 결과(None, "")는 캐시하지 않는다 (다음 요청에서 다시 번역)
+                    if dst:
+                        self._cache[src] = dst
+                        stored = True
+                while len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+            if stored:
+                self._save()
+
+        return [results[(text or "").strip()] for text in texts]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend.name,
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    # ---- 영구 캐시 ----
+
+    def _load(self) -> None:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                self._cache.update((src, dst) for src, dst in json.load(f).items() if dst)
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"번역 캐시 로드 실패: {e}")
+        # 파일은 LRU 순서(오래된 것부터)로 저장되므로 앞쪽부터 버려서 max_size에 맞춘다
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def _save(self) -> None:
+        if not self.cache_path:
+            return
+        with self._lock:
+            snapshot = dict(self._cache)
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+
+_service: TranslationService | None = None
+_service_lock = threading.Lock()
+
+
+def get_translator() -> TranslationService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            backend = BACKENDS[TRANSLATION_BACKEND]()
+            _service = TranslationService(backend, TRANSLATION_CACHE_SIZE, TRANSLATION_CACHE_PATH)
+        return _service
+
+
+def current_translator() -> TranslationService | None:
+    """이미 만들어진 번역 서비스 (아직 한 번도 안 썼으면 None, 백엔드를 만들지 않음)"""
+    return _service
+
+
+def translate_to_english(text: str) -> str:
+    return get_translator().translate(text)
@@ -0,0 +1,159 @@
+# services/uploads.py
+import io
+from dataclasses import dataclass
+
+from fastapi import UploadFile
+from PIL import Image, ImageOps
+
+from config import (
+    UPLOAD_MAX_FILE_MB,
+    UPLOAD_MAX_REQUEST_MB,
+    UPLOAD_MAX_PIXELS,
+    UPLOAD_MAX_SIDE,
+    UPLOAD_CHUNK_SIZE,
+)
+from pipeline.utils import detect_mime
+from pipeline.executors import run_cpu
+from telemetry import get_logger, span
+
+logger = get_logger("uploads")
+
+UPLOAD_MAX_FILE_BYTES = int(UPLOAD_MAX_FILE_MB * 1024 * 1024)
+UPLOAD_MAX_REQUEST_BYTES = int(UPLOAD_MAX_REQUEST_MB * 1024 * 1024)
+
+# 헤더(해상도) 확인은 앞부분 이 크기까지만 시도 (EXIF가 큰 JPEG도 보통 이 안에 SOF가 있음)
+_PROBE_LIMIT = 1024 * 1024
+
+# PIL이 열지 못해도 그대로 받는 형식 (Gemini는 HEIC를 직접 처리)
+_UNDECODABLE_OK = {"image/heic"}
+
+_SAVE_OPTIONS = {
+    "JPEG": {"quality": 92},
+    "WEBP": {"quality": 90, "method": 4},
+    "PNG": {},
+}
+
+
+class UploadError(Exception):
+    """업로드 거부 (status_code: 413 크기 초과, 415 이미지 아님, 400 빈 파일)"""
+
+    def __init__(self, message: str, status_code: int = 413):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class UploadedImage:
+    data: bytes                 # 파이프라인 전체가 공유하는 버퍼 (BytesIO(data)는 복사하지 않음)
+    filename: str
+    mime_type: str
+    width: int | None           # PIL이 읽지 못한 형식(HEIC 등)이면 None
+    height: int | None
+    original_bytes: int
+    downscaled: bool
+
+    @property
+    def view(self) -> memoryview:
+        """복사 없는 슬라이스/스트리밍용"""
+        return memoryview(self.data)
+
+
+class UploadBudget:
+    """요청 하나에 들어온 파일들의 총 업로드 크기 제한"""
+
+    def __init__(self, max_bytes: int = UPLOAD_MAX_REQUEST_BYTES):
+        self.max_bytes = max_bytes
+        self.used = 0
+
+    def consume(self, size: int) -> None:
+        self.used += size
+        if self.used > self.max_bytes:
+            raise UploadError(f"요청 전체 업로드 크기가 최대 {self.max_bytes // (1024 * 1024)}MB를 넘었습니다.")
+
+
+async def read_image(file: UploadFile, budget: UploadBudget | None = None, *,
+                     max_bytes: int = UPLOAD_MAX_FILE_BYTES,
+                     max_side: int = UPLOAD_MAX_SIDE) -> UploadedImage:
+    """
+    업로드 파일을 UPLOAD_CHUNK_SIZE씩 읽으면서 제한을 적용.
+    - 파일/요청 크기 제한은 청크마다 확인 (초과하는 순간 중단)
+    - 앞부분 헤더가 들어오면 해상도를 읽어 UPLOAD_MAX_PIXELS 초과 시 나머지를 읽지 않고 거부
+    - 긴 변이 max_side를 넘으면 축소해서 반환 (이후 SAM/Gemini/인코딩 단계가 작은 이미지로 동작)
+    청크는 마지막에 한 번만 합쳐서 파일당 버퍼 하나만 남긴다.
+    """
+    name = file.filename or "upload"
+    size = getattr(file, "size", None)
+    if size is not None and size > max_bytes:
+        raise UploadError(f"{name}: 파일 크기가 최대 {max_bytes // (1024 * 1024)}MB를 넘었습니다.")
+
+    with span("upload.read", filename=name) as s:
+        chunks: list[bytes] = []
+        total = 0
+        dimensions = None
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            total += len(chunk)
+            if total > max_bytes:
+                raise UploadError(f"{name}: 파일 크기가 최대 {max_bytes // (1024 * 1024)}MB를 넘었습니다.")
+            if budget is not None:
+                budget.consume(len(chunk))
+            chunks.append(chunk)
+            if dimensions is None and total <= _PROBE_LIMIT:
+                dimensions = _probe(name, b"".join(chunks))
+
+        data = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+        del chunks
+        s.set("bytes", len(data))
+
+    if not data:
+        raise UploadError(f"{name}: 빈 파일입니다.", status_code=400)
+
+    mime_type = detect_mime(data)
+    if dimensions is None:
+        dimensions = _probe(name, data)
+    if dimensions is None:
+        if mime_type not in _UNDECODABLE_OK:
+            raise UploadError(f"{name}: 이미지 파일이 아닙니다.", status_code=415)
+        return UploadedImage(data, name, mime_type, None, None, len(data), False)
+
+    width, height = dimensions
+    if max_side <= 0 or max(width, height) <= max_side:
+        return UploadedImage(data, name, mime_type, width, height, len(data), False)
+
+    with span("upload.downscale", width=width, height=height, max_side=max_side):
+        resized, mime_type, (new_width, new_height) = await run_cpu(_downscale, data, max_side)
+    logger.info(f"{name}: {width}x{height} → {new_width}x{new_height} ({len(data)} → {len(resized)} bytes)")
+    return UploadedImage(resized, name, mime_type, new_width, new_height, len(data), True)
+
+
+# ---- 내부 함수 ----
+
+def _probe(name: str, head: bytes) -> tuple[int, int] | None:
+    """헤더만 파싱해서 (width, height) 반환. 아직 데이터가 부족하거나 이미지가 아니면 None"""
+    try:
+        with Image.open(io.BytesIO(head)) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        raise UploadError(f"{name}: 해상도가 너무 큽니다.")
+    except Exception:
+        return None
+    if width * height > UPLOAD_MAX_PIXELS:
+        raise UploadError(f"{name}: 해상도 {width}x{height}가 최대 {UPLOAD_MAX_PIXELS:,} 픽셀을 넘었습니다.")
+    return width, height
+
+
+def _downscale(data: bytes, max_side: int) -> tuple[bytes, str, tuple[int, int]]:
+    """긴 변을 max_side로 축소 + EXIF 회전 반영, 원래 형식(JPEG/PNG/WebP)으로 재인코딩"""
+    image = Image.open(io.BytesIO(data))
+    fmt = image.format if image.format in _SAVE_OPTIONS else "PNG"
+    scale = max_side / max(image.size)
+    if fmt == "JPEG":
+        # target 이상인 가장 작은 1/2^n 크기로 디코딩
+        image.draft("RGB", (round(image.width * scale), round(image.height * scale)))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buf = io.BytesIO()
+    image.save(buf, format=fmt, **_SAVE_OPTIONS[fmt])
+    return buf.getvalue(), f"image/{fmt.lower()}", image.size
@@ -0,0 +1,352 @@
+# telemetry.py
+import os
+import sys
+import copy
+import json
+import time
+import uuid
+import queue
+import random
+import logging
+import threading
+import contextvars
+import urllib.request
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable
+
+from config import (
+    LOG_LEVEL,
+    LOG_FORMAT,
+    LOG_PAYLOAD_SAMPLE_RATE,
+    LOG_PAYLOAD_MAX_CHARS,
+    TRACE_EXPORT,
+    TRACE_FILE,
+    TRACE_OTLP_ENDPOINT,
+    SERVICE_NAME,
+)
+
+# 요청 단위 컨텍스트 (executor 스레드로는 pipeline.executors가 복사해서 넘긴다)
+_request_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("request_id", default=None)
+_payload_sampled: contextvars.ContextVar[bool | None] = contextvars.ContextVar("payload_sampled", default=None)
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("current_span", default=None)
+
+
+# ---- 로깅 ----
+
+class _ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        # 큐를 거친 기록은 로그를 남긴 스레드에서 이미 채웠다 (출력 스레드의 contextvars는 비어 있음)
+        if hasattr(record, "trace_id"):
+            return True
+        record.request_id = _request_id.get()
+        current = _current_span.get()
+        record.trace_id = current.trace_id if current else None
+        return True
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "trace_id": getattr(record, "trace_id", None),
+        }
+        data.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        return f"{text} {json.dumps(fields, ensure_ascii=False, default=str)}" if fields else text
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 기본 prepare는 traceback을 msg에 합치고 exc_info/exc_text를 지운다 (JSON "exc"가 비게 됨).
+        # 메시지만 확정하고 traceback은 문자열(exc_text)로 넘긴다 (프레임 객체를 큐에 붙잡아 두지 않음)
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_exc_formatter = logging.Formatter()
+
+# import 시에는 stderr에 바로 쓰는 핸들러만 붙인다 (스레드 없음).
+# start_telemetry()가 큐 + 출력 스레드로 바꾸고, shutdown_telemetry()가 되돌린다.
+_output = logging.StreamHandler(sys.stderr)
+if LOG_FORMAT == "json":
+    _output.setFormatter(_JsonFormatter())
+else:
+    _output.setFormatter(_TextFormatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+_output.addFilter(_ContextFilter())
+
+_root = logging.getLogger("app")
+_root.setLevel(LOG_LEVEL)
+_root.addHandler(_output)
+_root.propagate = False
+
+_listener: QueueListener | None = None
+_queue_handler: _QueueHandler | None = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"app.{name}")
+
+
+logger = get_logger("telemetry")
+
+
+def current_request_id() -> str | None:
+    return _request_id.get()
+
+
+@contextmanager
+def request_scope(request_id: str | None = None):
+    """요청(또는 작업) 하나의 범위: request id 지정 + 본문 로그 샘플링 여부 결정"""
+    request_id = request_id or uuid.uuid4().hex
+    tokens = (
+        _request_id.set(request_id),
+        _payload_sampled.set(random.random() < LOG_PAYLOAD_SAMPLE_RATE),
+    )
+    try:
+        yield request_id
+    finally:
+        _payload_sampled.reset(tokens[1])
+        _request_id.reset(tokens[0])
+
+
+def log_payload(log: logging.Logger, message: str, payload: Any) -> None:
+    """
+    프롬프트/LLM 응답 같은 큰 본문 로그. DEBUG 레벨이고 샘플링된 요청일 때만 기록하고,
+    LOG_PAYLOAD_MAX_CHARS로 잘라낸다.
+    """
+    if not log.isEnabledFor(logging.DEBUG):
+        return
+    sampled = _payload_sampled.get()
+    if sampled is None:
+        sampled = random.random() < LOG_PAYLOAD_SAMPLE_RATE
+    if not sampled:
+        return
+    text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False, default=str)
+    if len(text) > LOG_PAYLOAD_MAX_CHARS:
+        text = f"{text[:LOG_PAYLOAD_MAX_CHARS]}... ({len(text)} chars)"
+    log.debug(message, extra={"fields": {"payload": text}})
+
+
+# ---- 트레이싱 ----
+
+class Span:
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id",
+                 "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: str | None, attributes: dict):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.attributes = attributes
+        self.error: str | None = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_seconds(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+
+# 종료된 span을 받는 콜백 (메트릭 집계 등)
+_span_listeners: list[Callable[[Span], None]] = []
+
+
+def add_span_listener(listener: Callable[[Span], None]) -> None:
+    _span_listeners.append(listener)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """
+    단계별 타이밍 span. 동기/비동기 코드 모두 `with span("sam.segment"):` 형태로 사용.
+    같은 요청 안에서는 부모-자식 관계가 유지되고, 종료 시 DEBUG 로그 + 내보내기.
+    """
+    parent = _current_span.get()
+    s = Span(name, kind, parent.trace_id if parent else os.urandom(16).hex(),
+             parent.span_id if parent else None, attributes)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            _current_span.set(parent)  # 다른 컨텍스트에서 종료된 경우 (스트리밍 제너레이터 등)
+        _finish(s)
+
+
+def _finish(s: Span) -> None:
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"span {s.name} {s.duration_seconds * 1000:.1f}ms", extra={"fields": {
+            "span": s.name, "trace_id": s.trace_id, "duration_ms": round(s.duration_seconds * 1000, 2),
+            "error": s.error, **s.attributes,
+        }})
+    for listener in _span_listeners:
+        try:
+            listener(s)
+        except Exception:
+            logger.exception(f"span listener 실패 ({s.name})")
+    if _exporter is not None:
+        _exporter.add(s)
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: list[Span]) -> dict:
+    """OTLP/JSON ExportTraceServiceRequest 형식"""
+    kinds = {"internal": 1, "server": 2, "client": 3}
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{
+            "scope": {"name": SERVICE_NAME},
+            "spans": [{
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                "name": s.name,
+                "kind": kinds.get(s.kind, 1),
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            } for s in spans],
+        }],
+    }]}
+
+
+class SpanExporter:
+    """
+    종료된 span을 모아 백그라운드 스레드에서 내보낸다 (요청 경로에서는 큐에 넣기만).
+    - file: OTLP JSON 한 줄씩 (collector의 filelog/otlpjsonfile 수신기로 읽을 수 있음)
+    - otlp: OTLP/HTTP JSON으로 수집기에 POST
+    """
+
+    def __init__(self, mode: str, path: str = TRACE_FILE, endpoint: str = TRACE_OTLP_ENDPOINT,
+                 batch_size: int = 256, interval: float = 2.0):
+        self.mode = mode
+        self.path = path
+        self.endpoint = endpoint
+        self.batch_size = batch_size
+        self.interval = interval
+        self.exported = 0
+        self.failed = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def add(self, s: Span) -> None:
+        self._queue.put(s)
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: list[Span] = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                self._export(batch)
+
+    def _export(self, batch: list[Span]) -> None:
+        body = json.dumps(to_otlp(batch), ensure_ascii=False)
+        try:
+            if self.mode == "file":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(body + "\n")
+            else:
+                req = urllib.request.Request(self.endpoint, data=body.encode("utf-8"),
+                                             headers={"Content-Type": "application/json"})
+                urllib.request.urlopen(req, timeout=5).close()
+            self.exported += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.warning(f"span 내보내기 실패 ({self.mode}): {e}")
+
+
+# start_telemetry()에서 생성 (TRACE_EXPORT가 file/otlp일 때만). 그 전에 끝난 span은 내보내지 않음
+_exporter: SpanExporter | None = None
+
+
+def start_telemetry() -> None:
+    """
+    서버 시작 시(lifespan): 로그 출력을 별도 스레드로 옮기고 span 내보내기 스레드 시작.
+    요청 처리 경로에는 큐에 넣는 비용만 남는다.
+    """
+    global _listener, _queue_handler, _exporter
+    if _listener is not None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = _QueueHandler(log_queue)
+    _queue_handler.addFilter(_ContextFilter())
+    _listener = QueueListener(log_queue, _output)
+    _listener.start()
+    _root.addHandler(_queue_handler)
+    _root.removeHandler(_output)
+
+    if TRACE_EXPORT in ("file", "otlp"):
+        _exporter = SpanExporter(TRACE_EXPORT)
+        _exporter.start()
+
+
+def shutdown_telemetry() -> None:
+    """서버 종료 시: 남은 span 내보내기 + 로그 큐 비우고 stderr 직접 출력으로 복귀"""
+    global _listener, _queue_handler, _exporter
+    exporter, _exporter = _exporter, None
+    if exporter is not None:
+        exporter.shutdown()
+    if _listener is not None:
+        _root.addHandler(_output)
+        _root.removeHandler(_queue_handler)
+        _listener.stop()
+        _listener = _queue_handler = None
@@ -0,0 +1,18 @@
+# tests/conftest.py
+import pytest
+
+from services import llm_gateway as gateway_module
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """네트워크 없이 지연만 흉내 내는 가짜 모델로 공유 게이트웨이를 바꾼다 (rate limit 없음)"""
+    monkeypatch.setattr(gateway_module, "LLM_FAKE_LATENCY_MS", 200.0)
+    monkeypatch.setattr(gateway_module, "LLM_RATE_PER_SECOND", 0.0)
+    gateway = gateway_module.llm_gateway
+    monkeypatch.setattr(gateway, "backend", "fake")
+    # 모델/semaphore/버킷은 이벤트 루프마다 새로 만든다 (테스트마다 asyncio.run)
+    monkeypatch.setattr(gateway, "_models", {})
+    monkeypatch.setattr(gateway, "_semaphores", {})
+    monkeypatch.setattr(gateway, "_buckets", {})
+    return gateway
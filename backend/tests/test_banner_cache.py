@@ -0,0 +1,42 @@
+# tests/test_banner_cache.py
+import os
+import time
+
+from services.banner_cache import BannerCache
+
+
+def _age(cache: BannerCache, key: str, seconds: float) -> None:
+    path = cache._path(key, ".png")
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def test_hits_refresh_recency_so_eviction_is_lru(tmp_path):
+    cache = BannerCache(str(tmp_path), max_bytes=250, ttl_seconds=3600)
+    cache.put("a", b"a" * 100)
+    cache.put("b", b"b" * 100)
+    _age(cache, "a", 100)  # a가 먼저 저장됨
+    _age(cache, "b", 50)
+    stored_at = os.stat(cache._path("a", ".png")).st_mtime
+
+    assert cache.get("a") == b"a" * 100
+    cache.put("c", b"c" * 100)  # 예산 초과 → 가장 오래 안 쓴 b가 빠진다
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"a" * 100 and cache.get("c") == b"c" * 100
+    # 적중은 TTL 기준(저장 시각)을 바꾸지 않는다
+    assert os.stat(cache._path("a", ".png")).st_mtime == stored_at
+
+
+def test_puts_under_budget_do_not_rescan_the_directory(tmp_path, monkeypatch):
+    cache = BannerCache(str(tmp_path), max_bytes=10_000, ttl_seconds=3600)
+    scans = []
+    scan = cache._scan
+    monkeypatch.setattr(cache, "_scan", lambda: scans.append(None) or scan())
+
+    for i in range(5):
+        cache.put(f"k{i}", b"x" * 100)
+    cache.put("k0", b"y" * 50, mime_type="image/jpeg")  # 형식이 바뀌면 이전 파일 크기를 뺀다
+
+    assert len(scans) == 1  # 처음 크기를 알 때 한 번만
+    assert cache._total == sum(e[2] for e in scan()[0]) == 450
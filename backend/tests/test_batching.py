@@ -0,0 +1,34 @@
+# tests/test_batching.py
+import threading
+from concurrent.futures import wait
+
+from pipeline.batching import MicroBatcher
+
+
+def test_requests_queued_during_a_batch_join_the_next_one():
+    started, release = threading.Event(), threading.Event()
+    sizes: list[int] = []
+
+    def run_batch(key, items):
+        sizes.append(len(items))
+        started.set()
+        release.wait(5)
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(run_batch, max_batch=4, max_wait=0.0)
+    first = batcher.submit("k", 0)
+    started.wait(5)
+    # 첫 배치가 도는 동안 쌓인 요청은 대기 시간이 지났어도 한 배치로 묶여야 한다
+    rest = [batcher.submit("k", i) for i in range(1, 7)]
+    release.set()
+    wait([first, *rest], timeout=5)
+
+    assert [f.result() for f in [first, *rest]] == [0, 2, 4, 6, 8, 10, 12]
+    assert sizes == [1, 4, 2]
+
+
+def test_different_keys_are_not_mixed():
+    batcher = MicroBatcher(lambda key, items: [(key, item) for item in items], max_batch=8, max_wait=0.05)
+    futures = [batcher.submit(i % 2, i) for i in range(6)]
+    wait(futures, timeout=5)
+    assert [f.result() for f in futures] == [(i % 2, i) for i in range(6)]
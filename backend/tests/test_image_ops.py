@@ -0,0 +1,27 @@
+# tests/test_image_ops.py
+import numpy as np
+import pytest
+from PIL import Image
+
+from pipeline.image_ops import compose_over
+
+
+def _random_rgba(size: int, seed: int, alpha: tuple[int, int]) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, (size, size, 4), dtype=np.uint8)
+    pixels[..., 3] = rng.integers(alpha[0], alpha[1] + 1, (size, size), dtype=np.uint8)
+    return Image.fromarray(pixels, "RGBA")
+
+
+@pytest.mark.parametrize("bg_alpha", [(255, 255), (0, 255)], ids=["opaque", "translucent"])
+def test_compose_over_matches_porter_duff_over(bg_alpha):
+    bg = _random_rgba(64, 1, bg_alpha)
+    obj = _random_rgba(64, 2, (0, 255))
+
+    result = np.asarray(compose_over(bg, obj), dtype=np.int16)
+    expected = np.asarray(Image.alpha_composite(bg, obj), dtype=np.int16)
+
+    assert np.array_equal(result[..., 3], expected[..., 3])
+    # 색은 결과 알파가 있는 곳만 의미가 있다 (premultiplied 왕복의 반올림 오차 허용)
+    visible = expected[..., 3] >= 32
+    assert np.abs(result - expected)[visible][:, :3].max() <= 8
@@ -0,0 +1,42 @@
+# tests/test_import_time.py
+import os
+import re
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# 텍스트 전용 워커가 import main만으로 불러오면 안 되는 무거운 모듈
+HEAVY_MODULES = ("torch", "diffusers", "google.genai", "rembg", "segment_anything", "cv2", "realesrgan")
+
+# import main 전체(-X importtime 누적 시간) 제한. 느린 CI 머신이면 환경변수로 늘린다
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "2.0"))
+
+
+def _import_main() -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (SRC_DIR, env.get("PYTHONPATH")) if p)
+    code = (
+        "import sys, json, main; "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+
+
+def test_import_main_skips_heavy_modules():
+    result = _import_main()
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_import_main_within_budget():
+    result = _import_main()
+    assert result.returncode == 0, result.stderr[-2000:]
+    # "import time: self [us] | cumulative | name" 형식에서 main 줄의 누적 시간
+    match = re.search(r"^import time:\s+\d+ \|\s+(\d+) \| main$", result.stderr, re.MULTILINE)
+    assert match, "importtime 출력에서 main을 찾지 못했습니다."
+    seconds = int(match.group(1)) / 1e6
+    assert seconds < IMPORT_BUDGET_SECONDS, f"import main: {seconds:.2f}s (budget {IMPORT_BUDGET_SECONDS}s)"
@@ -0,0 +1,131 @@
+# tests/test_jobs.py
+import asyncio
+import time
+
+import pytest
+
+from services.jobs import JobManager, QueueFullError, TERMINAL_STATES
+
+
+def _blocked(release: asyncio.Event):
+    async def func(progress):
+        await release.wait()
+        return "done"
+    return func
+
+
+def test_cancelled_jobs_do_not_count_toward_the_queue_limit():
+    async def scenario():
+        manager = JobManager(workers=1, max_queue=2, result_ttl=60)
+        await manager.start()
+        release = asyncio.Event()
+        try:
+            running = manager.submit("banner", _blocked(release))
+            await asyncio.sleep(0)  # 워커가 첫 작업을 꺼내서 실행
+            assert running.status == "running"
+
+            queued = [manager.submit("banner", _blocked(release)) for _ in range(2)]
+            with pytest.raises(QueueFullError):
+                manager.submit("banner", _blocked(release))
+
+            # 워커가 아직 꺼내지 않은 취소 작업은 자리를 차지하지 않는다
+            for job in queued:
+                assert manager.cancel(job.id)
+            assert manager.stats()["queue_depth"] == 0
+            replacement = manager.submit("banner", _blocked(release))
+
+            release.set()
+            for _ in range(50):
+                if replacement.status == "succeeded":
+                    break
+                await asyncio.sleep(0.01)
+            assert running.status == replacement.status == "succeeded"
+            assert manager.stats()["queue_depth"] == 0
+        finally:
+            await manager.stop()
+
+    asyncio.run(scenario())
+
+
+def test_finished_jobs_expire_without_new_submissions():
+    async def scenario():
+        manager = JobManager(workers=1, max_queue=4, result_ttl=0.05, cleanup_interval=0.02)
+        await manager.start()
+        try:
+            async def func(progress):
+                return "done"
+
+            job = manager.submit("banner", func)
+            await asyncio.sleep(0.01)
+            assert manager.get(job.id) is job
+
+            # submit이 더 없어도 주기 정리로 사라진다
+            await asyncio.sleep(0.15)
+            assert job.id not in manager._jobs
+        finally:
+            await manager.stop()
+
+    asyncio.run(scenario())
+
+
+def test_get_hides_expired_job_before_cleanup_runs():
+    async def scenario():
+        manager = JobManager(workers=1, max_queue=4, result_ttl=60, cleanup_interval=3600)
+        await manager.start()
+        try:
+            async def func(progress):
+                return "done"
+
+            job = manager.submit("banner", func)
+            await asyncio.sleep(0.01)
+            job.finished_at = time.time() - 61
+            assert manager.get(job.id) is None
+        finally:
+            await manager.stop()
+
+    asyncio.run(scenario())
+
+
+def test_sd2_banner_job_reports_the_pipeline_stages(monkeypatch):
+    import io
+
+    import httpx
+    from PIL import Image
+
+    import main
+    from services import banner_sd2
+    from services.jobs import job_manager, report
+
+    stages = ("background_removal", "padding", "mask", "inpaint", "composite", "text", "upscale", "encode")
+
+    async def fake_generate_banner(file_bytes, menu, context, tone, channel, required_words, banned_words,
+                                   text_overlay, progress=None):
+        for name in stages:
+            report(progress, name, name)
+        return "ZmFrZQ=="
+
+    monkeypatch.setattr(banner_sd2, "generate_banner", fake_generate_banner)
+    buf = io.BytesIO()
+    Image.new("RGB", (16, 16)).save(buf, format="PNG")
+
+    async def scenario():
+        await job_manager.start()
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post("/api/jobs/banner", data={"pipeline": "sd2", "menu": "우동"},
+                                             files={"file_product": ("p.png", buf.getvalue(), "image/png")})
+                assert response.status_code == 202, response.text
+                job = job_manager.get(response.json()["job_id"])
+                for _ in range(100):
+                    if job.status in TERMINAL_STATES:
+                        break
+                    await asyncio.sleep(0.01)
+                return job
+        finally:
+            await job_manager.stop()
+
+    job = asyncio.run(scenario())
+    assert job.status == "succeeded", job.error
+    assert [e["stage"] for e in job.events if e["type"] == "progress"] == list(stages)
+    assert job.result["image_base64"] == "ZmFrZQ=="
@@ -0,0 +1,115 @@
+# tests/test_llm_gateway.py
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.prompts import ChatPromptTemplate
+
+from services import llm_gateway as gateway_module
+
+PROMPT = ChatPromptTemplate.from_messages([("human", "{question}")])
+VARIABLES = {"question": "안녕"}
+
+
+class RateLimitError(Exception):
+    """openai.RateLimitError와 같은 이름 (게이트웨이는 예외 이름으로 재시도 여부를 판단)"""
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def gateway(fake_llm, monkeypatch):
+    monkeypatch.setattr(gateway_module, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(gateway_module, "_backoff", lambda attempt: 0.0)
+    monkeypatch.setattr(fake_llm, "_stats", {})
+    return fake_llm
+
+
+def _script_failures(gateway, monkeypatch, errors: list[Exception]):
+    """가짜 모델의 호출이 errors를 차례로 던진 뒤 원래 응답을 돌려주도록 한다"""
+    model_type = type(gateway.get_model())
+    original = model_type._agenerate
+
+    async def flaky(self, *args, **kwargs):
+        if errors:
+            raise errors.pop(0)
+        return await original(self, *args, **kwargs)
+
+    monkeypatch.setattr(model_type, "_agenerate", flaky)
+
+
+def test_retryable_errors_are_retried_until_success(gateway, monkeypatch):
+    _script_failures(gateway, monkeypatch, [RateLimitError("slow down"), UpstreamError(503)])
+
+    response = asyncio.run(gateway.ainvoke(PROMPT, VARIABLES))
+
+    assert "captions" in response.content
+    stats = gateway.stats()["models"][gateway_module.DEFAULT_MODEL]
+    assert (stats["calls"], stats["retries"], stats["errors"]) == (3, 2, 0)
+
+
+def test_non_retryable_error_is_raised_without_retry(gateway, monkeypatch):
+    _script_failures(gateway, monkeypatch, [UpstreamError(400)])
+
+    with pytest.raises(UpstreamError):
+        asyncio.run(gateway.ainvoke(PROMPT, VARIABLES))
+
+    stats = gateway.stats()["models"][gateway_module.DEFAULT_MODEL]
+    assert (stats["calls"], stats["retries"], stats["errors"]) == (1, 0, 1)
+
+
+def test_gives_up_after_max_retries(gateway, monkeypatch):
+    _script_failures(gateway, monkeypatch, [RateLimitError("slow down") for _ in range(5)])
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(gateway.ainvoke(PROMPT, VARIABLES))
+
+    stats = gateway.stats()["models"][gateway_module.DEFAULT_MODEL]
+    assert (stats["calls"], stats["retries"], stats["errors"]) == (3, 2, 1)
+
+
+def test_call_timeout_is_retried_within_the_deadline(gateway, monkeypatch):
+    # 가짜 모델 지연(200ms)보다 짧은 호출 제한 → 매번 타임아웃, 전체 deadline 안에서만 재시도
+    monkeypatch.setattr(gateway_module, "LLM_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(gateway_module, "LLM_MAX_RETRIES", 10)
+
+    started = time.monotonic()
+    with pytest.raises((asyncio.TimeoutError, TimeoutError)):
+        asyncio.run(gateway.ainvoke(PROMPT, VARIABLES, deadline=0.3))
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 1.0
+    stats = gateway.stats()["models"][gateway_module.DEFAULT_MODEL]
+    assert stats["timeouts"] >= 2
+    assert stats["retries"] >= 1
+
+
+def test_stream_retries_only_before_the_first_chunk(gateway, monkeypatch):
+    model_type = type(gateway.get_model())
+    calls = {"n": 0}
+
+    async def stream(self, messages, stop=None, run_manager=None, **kwargs):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise RateLimitError("slow down")  # 첫 조각 전 실패 → 재시도
+        yield ChatGenerationChunk(message=AIMessageChunk(content="첫 조각"))
+        raise UpstreamError(503)  # 출력이 나간 뒤 실패 → 그대로 전달
+
+    monkeypatch.setattr(model_type, "_astream", stream)
+
+    async def consume():
+        chunks = []
+        with pytest.raises(UpstreamError):
+            async for chunk in gateway.astream(PROMPT, VARIABLES):
+                chunks.append(chunk.content)
+        return chunks
+
+    assert asyncio.run(consume()) == ["첫 조각"]
+    stats = gateway.stats()["models"][gateway_module.DEFAULT_MODEL]
+    assert (stats["calls"], stats["retries"], stats["errors"]) == (2, 1, 1)
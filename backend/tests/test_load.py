@@ -0,0 +1,35 @@
+# tests/test_load.py
+import asyncio
+import time
+
+import httpx
+
+import main
+
+CONCURRENCY = 8
+
+
+async def _post_generate(client: httpx.AsyncClient, i: int) -> None:
+    # 메뉴를 요청마다 다르게 해서 응답 캐시를 거치지 않게 한다
+    response = await client.post("/api/generate", json={
+        "menu": f"부하 테스트 메뉴 {i}", "context": "평일 점심", "tone": "친근함", "channel": "피드",
+    })
+    assert response.status_code == 200, response.text
+    assert len(response.json()["captions"]) == 3
+
+
+def test_generate_throughput_scales_with_concurrency(fake_llm):
+    async def run() -> tuple[float, float]:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            await _post_generate(client, -1)
+            single = time.perf_counter() - started
+
+            started = time.perf_counter()
+            await asyncio.gather(*(_post_generate(client, i) for i in range(CONCURRENCY)))
+            return single, time.perf_counter() - started
+
+    single, concurrent = asyncio.run(run())
+    # 핸들러가 이벤트 루프를 막으면 CONCURRENCY * single에 가깝고, 동시에 처리되면 single에 가깝다
+    assert concurrent < single * CONCURRENCY / 3, f"single={single:.2f}s, {CONCURRENCY} concurrent={concurrent:.2f}s"
@@ -0,0 +1,28 @@
+# tests/test_metrics.py
+import metrics
+from services import translation
+from services.text import text_cache
+
+
+def _cache_samples() -> dict[tuple[str, str], float]:
+    family = next(f for f in metrics._collect_caches())
+    return {(labels["cache"], labels["result"]): value for _, labels, value in family.samples}
+
+
+def test_scrape_does_not_create_the_translator(monkeypatch):
+    monkeypatch.setattr(translation, "_service", None)
+
+    samples = _cache_samples()
+
+    assert translation.current_translator() is None
+    assert not any(cache == "translation" for cache, _ in samples)
+
+
+def test_fills_are_reported_separately_from_misses(monkeypatch):
+    monkeypatch.setitem(text_cache.counters, "misses", 2)
+    monkeypatch.setitem(text_cache.counters, "fills", 5)
+
+    samples = _cache_samples()
+
+    assert samples[text_cache.name, "miss"] == 2
+    assert samples[text_cache.name, "fill"] == 5
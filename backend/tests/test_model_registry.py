@@ -0,0 +1,50 @@
+# tests/test_model_registry.py
+import threading
+
+import pytest
+
+from pipeline.model_registry import ModelRegistry
+
+
+class _EvictAfterRelease:
+    """레지스트리 락이 처음으로 완전히 풀린 직후, 다른 스레드에서 모델 eviction을 한 번 끼워 넣는다"""
+
+    def __init__(self, registry: ModelRegistry, name: str):
+        self._inner = threading.RLock()
+        self._depth = 0
+        self._registry = registry
+        self._name = name
+        self.evicted: list[bool] = []
+
+    def __enter__(self):
+        self._inner.acquire()
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        self._inner.release()
+        if self._depth == 0 and not self.evicted and self._name in self._registry._entries:
+            self.evicted.append(None)  # 재진입 방지
+            worker = threading.Thread(target=lambda: self.evicted.append(self._registry.evict(self._name)))
+            worker.start()
+            worker.join(5)
+
+
+@pytest.mark.parametrize("resident", [False, True], ids=["load", "hit"])
+def test_model_in_use_survives_an_eviction_right_after_the_lookup(resident):
+    registry = ModelRegistry()
+    registry.register("m", lambda: object(), 1.0)
+    if resident:
+        registry.get("m")
+    hook = _EvictAfterRelease(registry, "m")
+    registry._lock = hook
+
+    with registry.use("m") as model:
+        # 조회와 in_use 증가 사이에 eviction이 끼어들어도 블록 안에서는 상주해야 한다
+        assert hook.evicted == [None, False]
+        assert registry._entries["m"].model is model
+        assert registry._entries["m"].in_use == 1
+
+    assert registry._entries["m"].in_use == 0
+    assert registry.status()["models"][0]["load_count"] == 1
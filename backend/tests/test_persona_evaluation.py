@@ -0,0 +1,78 @@
+# tests/test_persona_evaluation.py
+import asyncio
+
+import httpx
+
+import main
+from models import Persona, PersonaEvaluationPayload, PersonaEvaluationResult, PersonaEvaluationShard
+from services import persona_evaluation
+
+
+def _persona(pid: str) -> Persona:
+    return Persona(id=pid, name=f"name-{pid}", description="desc", weights={"emotion": 1})
+
+
+def _result(pid: str, score: int) -> PersonaEvaluationResult:
+    feedback = {"score": score, "comment": "c"}
+    return PersonaEvaluationResult(
+        personaId=pid, personaName=f"name-{pid}", overall_score=score, feedback="f",
+        captionFeedback=feedback, oneLinerFeedback=feedback, hashtagsFeedback=feedback,
+        breakdown={"emotion": {"score": score, "reason": "r"}},
+    )
+
+
+def _payload(*ids: str) -> PersonaEvaluationPayload:
+    return PersonaEvaluationPayload(selectedPersonas=[_persona(i) for i in ids],
+                                    caption="caption", one_liner="one", hashtags=["#a"])
+
+
+def test_empty_personas_rejected():
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/evaluate-personas", json={
+                "selectedPersonas": [], "caption": "c", "one_liner": "o", "hashtags": [],
+            })
+
+    assert asyncio.run(run()).status_code == 422
+
+
+def test_sharded_dedupes_ids_and_keeps_llm_notes(monkeypatch):
+    calls: list[str] = []
+
+    class FakeStructuredOutput:
+        async def ainvoke(self, prompt, variables, schema, name):
+            pid = variables["personas_text"].split(":")[0].lstrip("- ")
+            calls.append(pid)
+            return PersonaEvaluationShard(results=[_result(pid, {"a": 6, "b": 7}[pid])],
+                                          notes=[f"{pid} 관점에서 CTA가 약함"])
+
+    monkeypatch.setattr(persona_evaluation, "structured_output", FakeStructuredOutput())
+    monkeypatch.setattr(persona_evaluation, "PERSONA_SHARD_SIZE", 1)
+
+    response = asyncio.run(persona_evaluation.evaluate_personas(_payload("a", "b", "a"), mode="sharded"))
+
+    assert sorted(calls) == ["a", "b"]
+    assert [r.personaId for r in response.results] == ["a", "b"]
+    assert response.summary["notes"] == ["a 관점에서 CTA가 약함", "b 관점에서 CTA가 약함"]
+    assert response.summary["bestPersonaId"] == "b"
+    # (6 + 7) / 2 = 6.5 → 7 (사사오입)
+    assert response.summary["averageScore"] == 7
+
+
+def test_shard_semaphore_is_created_per_event_loop():
+    async def get_twice():
+        return persona_evaluation._shard_semaphore(), persona_evaluation._shard_semaphore()
+
+    first, again = asyncio.run(get_twice())
+    other, _ = asyncio.run(get_twice())
+
+    assert first is again
+    assert other is not first
+
+
+def test_average_score_rounds_half_up():
+    personas = [_persona(i) for i in "abcd"]
+    for scores, expected in (([6, 7], 7), ([8, 9], 9), ([7, 7, 8], 7), ([1, 2, 2, 2], 2)):
+        results = [_result(p.id, s) for p, s in zip(personas, scores)]
+        assert persona_evaluation._summarize(personas, results, [], {})["averageScore"] == expected
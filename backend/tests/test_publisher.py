@@ -0,0 +1,151 @@
+# tests/test_publisher.py
+import io
+import asyncio
+import sqlite3
+from contextlib import closing
+
+import pytest
+from PIL import Image
+
+from services import publisher
+from services.publisher import PublishQueue
+
+
+class TransientError(Exception):
+    retryable = True
+
+
+class FakeInstagram:
+    """GCS/Graph API 대역: 호출 횟수를 세고, block_*가 켜진 단계에서는 멈춰서 서버 중단을 흉내 낸다"""
+
+    def __init__(self):
+        self.uploads: list[str] = []
+        self.containers: list[str] = []
+        self.published: list[str] = []
+        self.entered = asyncio.Event()
+        self.block_create = self.block_wait = self.block_publish = False
+        self.publish_errors: list[Exception] = []
+
+    def upload_blob(self, blob_name: str, data: bytes) -> bool:
+        self.uploads.append(blob_name)
+        return True
+
+    async def create_container(self, image_url: str, caption: str) -> str:
+        if self.block_create:
+            await self._hang()
+        container_id = f"container-{len(self.containers)}"
+        self.containers.append(container_id)
+        return container_id
+
+    async def wait_for_container(self, container_id: str, timeout: float = 0) -> str:
+        if self.block_wait:
+            await self._hang()
+        return "PUBLISHED" if container_id in self.published else "FINISHED"
+
+    async def publish_container(self, container_id: str) -> str:
+        if self.publish_errors:
+            raise self.publish_errors.pop(0)
+        self.published.append(container_id)
+        if self.block_publish:
+            # 게시 요청은 처리됐지만 응답을 받기 전에 서버가 멈춤
+            await self._hang()
+        return f"media-{container_id}"
+
+    async def _hang(self) -> None:
+        self.entered.set()
+        await asyncio.Event().wait()
+
+
+@pytest.fixture
+def instagram(monkeypatch):
+    fake = FakeInstagram()
+    for name in ("upload_blob", "create_container", "wait_for_container", "publish_container"):
+        monkeypatch.setattr(publisher, name, getattr(fake, name))
+    monkeypatch.setattr(publisher, "delete_blob", lambda blob_name: None)
+    monkeypatch.setattr(publisher, "public_url", lambda blob_name: f"https://example.invalid/{blob_name}")
+    monkeypatch.setattr(publisher, "check_publish_config", lambda: None)
+    monkeypatch.setattr(publisher, "_backoff", lambda attempt: 0.0)
+    return fake
+
+
+def _png() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 120, 80)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _queue(tmp_path) -> PublishQueue:
+    return PublishQueue(path=str(tmp_path / "queue.sqlite3"), media_dir=str(tmp_path / "media"),
+                        concurrency=1, max_attempts=3)
+
+
+async def _interrupt_then_resume(tmp_path, instagram: FakeInstagram):
+    """첫 프로세스가 막힌 단계에서 서버를 멈추고, 같은 파일로 새 대기열을 띄워 끝까지 처리"""
+    first = _queue(tmp_path)
+    await first.start()
+    post = await first.submit(_png(), "menu.png", "오늘의 메뉴")
+    await asyncio.wait_for(instagram.entered.wait(), timeout=5)
+    await first.stop()
+
+    with closing(sqlite3.connect(first.path)) as db:
+        (status,) = db.execute("SELECT status FROM posts WHERE id = ?", (post.id,)).fetchone()
+
+    instagram.block_create = instagram.block_wait = instagram.block_publish = False
+    second = _queue(tmp_path)
+    await second.start()
+    try:
+        done = await second.wait(post.id, timeout=5)
+    finally:
+        await second.stop()
+    return status, done
+
+
+def test_resumes_from_uploaded_without_reuploading(tmp_path, instagram):
+    instagram.block_create = True
+    status, done = asyncio.run(_interrupt_then_resume(tmp_path, instagram))
+
+    assert status == "uploaded"
+    assert done.status == "published"
+    assert len(instagram.uploads) == 1
+    assert instagram.published == ["container-0"]
+
+
+def test_resumes_from_container_created_without_recreating(tmp_path, instagram):
+    instagram.block_wait = True
+    status, done = asyncio.run(_interrupt_then_resume(tmp_path, instagram))
+
+    assert status == "container_created"
+    assert done.status == "published"
+    assert len(instagram.uploads) == 1
+    assert instagram.containers == ["container-0"]
+    assert instagram.published == ["container-0"]
+
+
+def test_does_not_publish_twice_when_the_response_was_lost(tmp_path, instagram):
+    instagram.block_publish = True
+    status, done = asyncio.run(_interrupt_then_resume(tmp_path, instagram))
+
+    assert status == "container_created"
+    assert done.status == "published"
+    assert instagram.containers == ["container-0"]
+    assert instagram.published == ["container-0"]
+
+
+def test_publish_retry_reuses_upload_and_container(tmp_path, instagram):
+    instagram.publish_errors = [TransientError("rate limited")]
+
+    async def scenario():
+        queue = _queue(tmp_path)
+        await queue.start()
+        try:
+            post = await queue.submit(_png(), "menu.png", "오늘의 메뉴")
+            return await queue.wait(post.id, timeout=5)
+        finally:
+            await queue.stop()
+
+    done = asyncio.run(scenario())
+    assert done.status == "published"
+    assert done.attempts == 1
+    assert len(instagram.uploads) == 1
+    assert instagram.containers == ["container-0"]
+    assert instagram.published == ["container-0"]
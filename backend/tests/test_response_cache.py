@@ -0,0 +1,114 @@
+# tests/test_response_cache.py
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+from pydantic import BaseModel
+
+from services import response_cache as cache_module
+from services.response_cache import ResponseCache
+
+
+class Payload(BaseModel):
+    menu: str
+    tone: str = "친근"
+
+
+def _counter():
+    numbers = itertools.count()
+
+    async def create():
+        return next(numbers)
+    return create
+
+
+def test_similar_hit_fills_under_the_request_own_key():
+    cache = ResponseCache("test", similar_fields=("menu",), variants=2, similarity=0.5)
+    create = _counter()
+
+    async def scenario():
+        first = await cache.get_or_create(Payload(menu="김치 찌개"), create)
+        # 아직 variant가 덜 찬 유사 항목 → 새 응답은 "김치찌개" 자신의 키로
+        second = await cache.get_or_create(Payload(menu="김치찌개"), create)
+        return first, second
+
+    assert asyncio.run(scenario()) == (0, 1)
+    variants = {key: entry.variants for key, entry in cache._entries.items()}
+    assert sorted(variants.values()) == [[0], [1]]
+    assert cache.counters["misses"] == 2 and cache.counters["fills"] == 0
+
+
+def test_exact_key_fills_then_rotates():
+    cache = ResponseCache("test", variants=2)
+    create = _counter()
+
+    async def scenario():
+        return [await cache.get_or_create(Payload(menu="우동"), create) for _ in range(4)]
+
+    assert asyncio.run(scenario()) == [0, 1, 0, 1]
+    assert (cache.counters["misses"], cache.counters["fills"], cache.counters["exact_hits"]) == (1, 1, 2)
+
+
+def test_expiry_only_touches_the_oldest_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: now[0]))
+    cache = ResponseCache("test", ttl=10, variants=1)
+    create = _counter()
+
+    async def fill(menu: str):
+        return await cache.get_or_create(Payload(menu=menu), create)
+
+    asyncio.run(fill("우동"))
+    now[0] += 5
+    asyncio.run(fill("라멘"))
+    now[0] += 6  # 우동만 만료
+
+    assert asyncio.run(fill("라멘")) == 1  # 아직 유효 → 캐시 적중
+    assert len(cache._entries) == 1
+    assert asyncio.run(fill("우동")) == 2  # 만료돼서 새로 생성
+    assert len(cache._created) == 2
+
+
+def test_concurrent_requests_for_one_key_share_a_single_fill():
+    cache = ResponseCache("test", variants=2)
+    calls = []
+
+    async def create():
+        calls.append(len(calls))
+        await asyncio.sleep(0.01)
+        return calls[-1]
+
+    async def scenario():
+        first = await asyncio.gather(*(cache.get_or_create(Payload(menu="우동"), create) for _ in range(5)))
+        second = await asyncio.gather(*(cache.get_or_create(Payload(menu="우동"), create) for _ in range(5)))
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first == [0] * 5 and second == [1] * 5
+    assert len(calls) == 2
+    assert next(iter(cache._entries.values())).variants == [0, 1]  # variants 수를 넘지 않는다
+    assert (cache.counters["misses"], cache.counters["fills"], cache.counters["coalesced"]) == (1, 1, 8)
+    assert not cache._inflight
+
+
+def test_waiters_create_their_own_value_when_the_shared_fill_fails():
+    cache = ResponseCache("test", variants=1)
+    calls = []
+
+    async def create():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            raise RuntimeError("LLM 오류")
+        return len(calls)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_create(Payload(menu="우동"), create) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert isinstance(results[0], RuntimeError)
+    assert results[1:] == [2, 2]  # 실패 뒤 한 요청만 다시 생성하고 나머지는 그 결과를 같이 받는다
+    assert len(calls) == 2
@@ -0,0 +1,33 @@
+# tests/test_storage.py
+import io
+
+import pytest
+from PIL import Image
+
+from services.storage import MIN_WIDTH, prepare_instagram_jpeg
+
+
+def _noise_png(size: int) -> bytes:
+    # 노이즈는 JPEG으로 잘 압축되지 않아서 품질만 낮춰서는 용량을 맞출 수 없다
+    buf = io.BytesIO()
+    Image.effect_noise((size, size), 96).convert("RGB").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_shrinks_dimensions_when_quality_alone_is_not_enough():
+    data = _noise_png(1024)
+    max_bytes = 150 * 1024
+
+    media = prepare_instagram_jpeg(data, max_bytes=max_bytes)
+
+    assert len(media.data) <= max_bytes
+    assert MIN_WIDTH <= media.size[0] < 1024
+    with Image.open(io.BytesIO(media.data)) as image:
+        assert image.format == "JPEG"
+        assert image.size == media.size
+        assert image.width == image.height  # 비율 유지
+
+
+def test_raises_when_even_the_minimum_width_is_too_large():
+    with pytest.raises(ValueError, match="MB 이하로 줄일 수 없습니다"):
+        prepare_instagram_jpeg(_noise_png(1024), max_bytes=2 * 1024)
@@ -0,0 +1,53 @@
+# tests/test_telemetry.py
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import telemetry
+from telemetry import get_logger, request_scope, start_telemetry, shutdown_telemetry
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def test_import_starts_no_threads():
+    env = dict(os.environ, TRACE_EXPORT="file")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (SRC_DIR, env.get("PYTHONPATH")) if p)
+    code = "import threading, main; print(sorted(t.name for t in threading.enumerate()))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert result.stdout.strip().splitlines()[-1] == "['MainThread']"
+
+
+def test_queued_json_log_keeps_exception(monkeypatch):
+    out = io.StringIO()
+    monkeypatch.setattr(telemetry._output, "stream", out)
+    monkeypatch.setattr(telemetry._output, "formatter", telemetry._JsonFormatter())
+    log = get_logger("test")
+    start_telemetry()
+    try:
+        with request_scope("req-1"):
+            try:
+                raise ValueError("boom")
+            except ValueError:
+                log.exception("failed %s", "here")
+    finally:
+        shutdown_telemetry()
+
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    record = next(r for r in lines if r["logger"] == "app.test")
+    assert record["msg"] == "failed here"
+    assert record["request_id"] == "req-1"
+    assert "ValueError: boom" in record["exc"]
+    assert "Traceback" not in record["msg"]
+
+
+def test_shutdown_restores_direct_output():
+    start_telemetry()
+    shutdown_telemetry()
+    handlers = logging.getLogger("app").handlers
+    assert telemetry._output in handlers
+    assert not any(isinstance(h, telemetry._QueueHandler) for h in handlers)
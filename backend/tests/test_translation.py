@@ -0,0 +1,37 @@
+# tests/test_translation.py
+import json
+
+from services.translation import DictionaryBackend, TranslationService
+
+
+class _FlakyBackend:
+    name = "flaky"
+
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+    def translate_batch(self, texts: list[str]) -> list[str]:
+        self.calls.append(list(texts))
+        return [None if t == "실패" else f"en:{t}" for t in texts]
+
+
+def test_loaded_cache_is_trimmed_to_max_size(tmp_path):
+    path = tmp_path / "translations.json"
+    path.write_text(json.dumps({f"문장{i}": f"sentence {i}" for i in range(5)}, ensure_ascii=False),
+                    encoding="utf-8")
+
+    service = TranslationService(DictionaryBackend(path=None), max_size=3, cache_path=str(path))
+
+    # 파일 앞쪽(가장 오래 안 쓴 항목)부터 버린다
+    assert list(service._cache) == ["문장2", "문장3", "문장4"]
+
+
+def test_empty_results_are_not_cached(tmp_path):
+    backend = _FlakyBackend()
+    service = TranslationService(backend, cache_path=str(tmp_path / "translations.json"))
+
+    assert service.translate_batch(["실패", "안녕"]) == [None, "en:안녕"]
+    assert service.translate_batch(["실패", "안녕"]) == [None, "en:안녕"]
+
+    assert backend.calls == [["실패", "안녕"], ["실패"]]
+    assert json.loads((tmp_path / "translations.json").read_text(encoding="utf-8")) == {"안녕": "en:안녕"}